@@ -0,0 +1,106 @@
+"""Initial schema
+
+Matches what ``Base.metadata.create_all`` created at application startup
+before any of the later revisions existed. Databases created that way can
+adopt migrations with ``alembic stamp 0001`` once they have every column
+below, then run ``alembic upgrade head``.
+
+Revision ID: 0001
+Revises:
+Create Date: 2024-12-20 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0001"
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+UUID = postgresql.UUID(as_uuid=True)
+
+
+def upgrade() -> None:
+    op.create_table(
+        "users",
+        sa.Column("id", UUID, primary_key=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("github_id", sa.Integer(), nullable=False, unique=True),
+        sa.Column("username", sa.String(100), nullable=False, unique=True),
+        sa.Column("name", sa.String(200), nullable=True),
+        sa.Column("avatar_url", sa.String(500), nullable=True),
+    )
+
+    op.create_table(
+        "teams",
+        sa.Column("id", UUID, primary_key=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("name", sa.String(200), nullable=False),
+        sa.Column("slug", sa.String(200), nullable=False, unique=True),
+    )
+
+    op.create_table(
+        "memberships",
+        sa.Column("id", UUID, primary_key=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("user_id", UUID, sa.ForeignKey("users.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("team_id", UUID, sa.ForeignKey("teams.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("role", sa.Enum("owner", "admin", "member", name="teamrole"), nullable=False),
+        sa.UniqueConstraint("user_id", "team_id", name="uq_user_team"),
+    )
+
+    op.create_table(
+        "debug_sessions",
+        sa.Column("id", UUID, primary_key=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.Column("language", sa.String(50), nullable=False),
+        sa.Column("runtime_info", sa.String(200), nullable=True),
+        sa.Column("error_text", sa.Text(), nullable=False),
+        sa.Column("code_snippet", sa.Text(), nullable=True),
+        sa.Column("context_description", sa.Text(), nullable=True),
+        sa.Column(
+            "status",
+            sa.Enum("PROCESSING", "COMPLETED", "FAILED", name="sessionstatus"),
+            nullable=False,
+        ),
+        sa.Column("repro_code", sa.Text(), nullable=True),
+        sa.Column("test_code", sa.Text(), nullable=True),
+        sa.Column("explanation", sa.Text(), nullable=True),
+        sa.Column("fix_suggestion", sa.Text(), nullable=True),
+        sa.Column("llm_model", sa.String(100), nullable=True),
+        sa.Column("error_message", sa.Text(), nullable=True),
+    )
+
+    op.create_table(
+        "runs",
+        sa.Column("id", UUID, primary_key=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("completed_at", sa.DateTime(), nullable=True),
+        sa.Column("language", sa.String(50), nullable=False),
+        sa.Column("status", sa.String(32), nullable=False),
+        sa.Column("stdout", sa.Text(), nullable=True),
+        sa.Column("stderr", sa.Text(), nullable=True),
+        sa.Column("exit_code", sa.Integer(), nullable=True),
+        sa.Column("image", sa.String(200), nullable=True),
+    )
+    op.create_index("ix_runs_status", "runs", ["status"])
+    op.create_index("ix_runs_created_at", "runs", ["created_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_runs_created_at", table_name="runs")
+    op.drop_index("ix_runs_status", table_name="runs")
+    op.drop_table("runs")
+    op.drop_table("debug_sessions")
+    op.drop_table("memberships")
+    op.drop_table("teams")
+    op.drop_table("users")
+    sa.Enum(name="sessionstatus").drop(op.get_bind(), checkfirst=True)
+    sa.Enum(name="teamrole").drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,33 @@
+"""Cached generation results keyed by prompt hash
+
+Revision ID: 0001a
+Revises: 0001
+Create Date: 2024-12-20 01:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0001a"
+down_revision: Union[str, None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "generation_results",
+        sa.Column("prompt_hash", sa.String(64), primary_key=True),
+        sa.Column("result", sa.Text(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+    )
+    op.create_index("ix_generation_results_created_at", "generation_results", ["created_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_generation_results_created_at", table_name="generation_results")
+    op.drop_table("generation_results")
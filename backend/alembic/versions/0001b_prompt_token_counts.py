@@ -0,0 +1,30 @@
+"""Prompt token counts before and after compaction
+
+Revision ID: 0001b
+Revises: 0001a
+Create Date: 2024-12-20 02:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0001b"
+down_revision: Union[str, None] = "0001a"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("debug_sessions") as batch:
+        batch.add_column(sa.Column("prompt_tokens_before", sa.Integer(), nullable=True))
+        batch.add_column(sa.Column("prompt_tokens_after", sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("debug_sessions") as batch:
+        batch.drop_column("prompt_tokens_after")
+        batch.drop_column("prompt_tokens_before")
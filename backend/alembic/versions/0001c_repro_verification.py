@@ -0,0 +1,32 @@
+"""Sandbox verification results on debug sessions
+
+Revision ID: 0001c
+Revises: 0001b
+Create Date: 2024-12-20 03:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0001c"
+down_revision: Union[str, None] = "0001b"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("debug_sessions") as batch:
+        batch.add_column(sa.Column("repro_verified", sa.Boolean(), nullable=True))
+        batch.add_column(sa.Column("verification_attempts", sa.Integer(), nullable=True))
+        batch.add_column(sa.Column("time_to_verified_ms", sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("debug_sessions") as batch:
+        batch.drop_column("time_to_verified_ms")
+        batch.drop_column("verification_attempts")
+        batch.drop_column("repro_verified")
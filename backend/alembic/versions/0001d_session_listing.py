@@ -0,0 +1,37 @@
+"""Error snippet column and keyset pagination indexes for session listings
+
+Rows written before this revision keep a NULL error_snippet; listings fall
+back to a substring of error_text for them.
+
+Revision ID: 0001d
+Revises: 0001c
+Create Date: 2024-12-20 04:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0001d"
+down_revision: Union[str, None] = "0001c"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("debug_sessions") as batch:
+        batch.add_column(sa.Column("error_snippet", sa.String(100), nullable=True))
+    op.create_index("ix_debug_sessions_created_at_id", "debug_sessions", ["created_at", "id"])
+    op.create_index("ix_debug_sessions_language_created_at_id", "debug_sessions", ["language", "created_at", "id"])
+    op.create_index("ix_debug_sessions_status_created_at_id", "debug_sessions", ["status", "created_at", "id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_debug_sessions_status_created_at_id", table_name="debug_sessions")
+    op.drop_index("ix_debug_sessions_language_created_at_id", table_name="debug_sessions")
+    op.drop_index("ix_debug_sessions_created_at_id", table_name="debug_sessions")
+    with op.batch_alter_table("debug_sessions") as batch:
+        batch.drop_column("error_snippet")
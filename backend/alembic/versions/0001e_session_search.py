@@ -0,0 +1,40 @@
+"""Full-text search index on debug sessions (Postgres only)
+
+Revision ID: 0001e
+Revises: 0001d
+Create Date: 2024-12-20 05:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0001e"
+down_revision: Union[str, None] = "0001d"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Same expression as app.services.session_search; the planner only uses the
+# index when queries repeat it exactly. 0006 replaces it with a stored column.
+SEARCH_TSVECTOR = (
+    "setweight(to_tsvector('english', coalesce(error_text, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(explanation, '')), 'B') || "
+    "setweight(to_tsvector('english', coalesce(fix_suggestion, '')), 'C')"
+)
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_debug_sessions_search "
+        f"ON debug_sessions USING gin (({SEARCH_TSVECTOR}))"
+    )
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    op.execute("DROP INDEX IF EXISTS ix_debug_sessions_search")
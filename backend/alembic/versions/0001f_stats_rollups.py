@@ -0,0 +1,61 @@
+"""Run execution time and hourly/daily stats rollup tables
+
+Revision ID: 0001f
+Revises: 0001e
+Create Date: 2024-12-20 06:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0001f"
+down_revision: Union[str, None] = "0001e"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("runs") as batch:
+        batch.add_column(sa.Column("execution_time_ms", sa.Integer(), nullable=True))
+
+    op.create_table(
+        "stats_rollups",
+        sa.Column("granularity", sa.String(8), primary_key=True),
+        sa.Column("bucket_start", sa.DateTime(), primary_key=True),
+        sa.Column("kind", sa.String(16), primary_key=True),
+        sa.Column("language", sa.String(50), primary_key=True),
+        sa.Column("total", sa.Integer(), nullable=False),
+        sa.Column("ok", sa.Integer(), nullable=False),
+        sa.Column("errors", sa.Integer(), nullable=False),
+        sa.Column("timeouts", sa.Integer(), nullable=False),
+        sa.Column("runtime_count", sa.Integer(), nullable=False),
+        sa.Column("runtime_sum_ms", sa.BigInteger(), nullable=False),
+    )
+    op.create_table(
+        "stats_runtime_histogram",
+        sa.Column("granularity", sa.String(8), primary_key=True),
+        sa.Column("bucket_start", sa.DateTime(), primary_key=True),
+        sa.Column("language", sa.String(50), primary_key=True),
+        sa.Column("le_ms", sa.Integer(), primary_key=True),
+        sa.Column("count", sa.Integer(), nullable=False),
+    )
+    op.create_table(
+        "stats_error_types",
+        sa.Column("granularity", sa.String(8), primary_key=True),
+        sa.Column("bucket_start", sa.DateTime(), primary_key=True),
+        sa.Column("kind", sa.String(16), primary_key=True),
+        sa.Column("error_type", sa.String(200), primary_key=True),
+        sa.Column("count", sa.Integer(), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("stats_error_types")
+    op.drop_table("stats_runtime_histogram")
+    op.drop_table("stats_rollups")
+    with op.batch_alter_table("runs") as batch:
+        batch.drop_column("execution_time_ms")
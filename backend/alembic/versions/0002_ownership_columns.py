@@ -0,0 +1,44 @@
+"""Owner user/team columns on debug sessions and runs
+
+Revision ID: 0002
+Revises: 0001f
+Create Date: 2024-12-22 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: Union[str, None] = "0001f"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+UUID = postgresql.UUID(as_uuid=True)
+TABLES = ("debug_sessions", "runs")
+
+
+def upgrade() -> None:
+    for table in TABLES:
+        with op.batch_alter_table(table) as batch:
+            batch.add_column(sa.Column("user_id", UUID, nullable=True))
+            batch.add_column(sa.Column("team_id", UUID, nullable=True))
+            batch.create_foreign_key(f"fk_{table}_user_id_users", "users", ["user_id"], ["id"], ondelete="SET NULL")
+            batch.create_foreign_key(f"fk_{table}_team_id_teams", "teams", ["team_id"], ["id"], ondelete="SET NULL")
+        op.create_index(f"ix_{table}_team_id_created_at_id", table, ["team_id", "created_at", "id"])
+        op.create_index(f"ix_{table}_user_id_created_at_id", table, ["user_id", "created_at", "id"])
+
+
+def downgrade() -> None:
+    for table in TABLES:
+        op.drop_index(f"ix_{table}_user_id_created_at_id", table_name=table)
+        op.drop_index(f"ix_{table}_team_id_created_at_id", table_name=table)
+        with op.batch_alter_table(table) as batch:
+            batch.drop_constraint(f"fk_{table}_team_id_teams", type_="foreignkey")
+            batch.drop_constraint(f"fk_{table}_user_id_users", type_="foreignkey")
+            batch.drop_column("team_id")
+            batch.drop_column("user_id")
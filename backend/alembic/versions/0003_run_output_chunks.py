@@ -0,0 +1,46 @@
+"""Compressed run output chunks with inline previews
+
+Existing runs keep their full output inline (their *_bytes sizes stay NULL),
+so no backfill is needed.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2024-12-23 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0003"
+down_revision: Union[str, None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+UUID = postgresql.UUID(as_uuid=True)
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("runs") as batch:
+        batch.add_column(sa.Column("stdout_bytes", sa.Integer(), nullable=True))
+        batch.add_column(sa.Column("stderr_bytes", sa.Integer(), nullable=True))
+
+    op.create_table(
+        "run_output_chunks",
+        sa.Column("run_id", UUID, sa.ForeignKey("runs.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("stream", sa.String(8), primary_key=True),
+        sa.Column("chunk_index", sa.Integer(), primary_key=True),
+        sa.Column("codec", sa.String(8), nullable=False),
+        sa.Column("data", sa.LargeBinary(), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("run_output_chunks")
+    with op.batch_alter_table("runs") as batch:
+        batch.drop_column("stderr_bytes")
+        batch.drop_column("stdout_bytes")
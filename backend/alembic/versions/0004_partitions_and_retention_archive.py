@@ -0,0 +1,133 @@
+"""Retention archive; monthly partitions for runs and debug_sessions on Postgres
+
+On Postgres both tables are rebuilt as tables partitioned by month of
+created_at. Rows are copied, so the upgrade takes time proportional to the
+table sizes. Partitioned tables need the partition key in their primary key,
+so it becomes (id, created_at). A foreign key cannot point at such a table,
+so run_output_chunks loses its foreign key to runs; the retention job deletes
+chunks together with their runs. Other databases only get the archive table.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2024-12-27 00:00:00
+
+"""
+from datetime import datetime
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0004"
+down_revision: Union[str, None] = "0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+UUID = postgresql.UUID(as_uuid=True)
+MONTHS_AHEAD = 3
+
+INDEXES = {
+    "debug_sessions": [
+        ("ix_debug_sessions_created_at_id", ["created_at", "id"]),
+        ("ix_debug_sessions_language_created_at_id", ["language", "created_at", "id"]),
+        ("ix_debug_sessions_status_created_at_id", ["status", "created_at", "id"]),
+        ("ix_debug_sessions_team_id_created_at_id", ["team_id", "created_at", "id"]),
+        ("ix_debug_sessions_user_id_created_at_id", ["user_id", "created_at", "id"]),
+    ],
+    "runs": [
+        ("ix_runs_status", ["status"]),
+        ("ix_runs_created_at", ["created_at"]),
+        ("ix_runs_team_id_created_at_id", ["team_id", "created_at", "id"]),
+        ("ix_runs_user_id_created_at_id", ["user_id", "created_at", "id"]),
+    ],
+}
+
+# Same expression as 0001 and app.services.session_search
+SEARCH_TSVECTOR = (
+    "setweight(to_tsvector('english', coalesce(error_text, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(explanation, '')), 'B') || "
+    "setweight(to_tsvector('english', coalesce(fix_suggestion, '')), 'C')"
+)
+
+
+def _add_months(month: datetime, months: int) -> datetime:
+    years, index = divmod(month.month - 1 + months, 12)
+    return month.replace(year=month.year + years, month=index + 1)
+
+
+def _recreate_table(table: str, old: str, primary_key: str, partitioned: bool) -> None:
+    """Create ``table`` like ``old`` with its keys and indexes, then copy the rows of ``old`` over."""
+    op.execute(f"ALTER TABLE {table} RENAME TO {old}")
+    op.execute(f"ALTER TABLE {old} DROP CONSTRAINT {table}_pkey")
+    for name, _ in INDEXES[table]:
+        op.execute(f"DROP INDEX IF EXISTS {name}")
+    if table == "debug_sessions":
+        op.execute("DROP INDEX IF EXISTS ix_debug_sessions_search")
+
+    partition_by = " PARTITION BY RANGE (created_at)" if partitioned else ""
+    op.execute(f"CREATE TABLE {table} (LIKE {old} INCLUDING DEFAULTS){partition_by}")
+    op.execute(f"ALTER TABLE {table} ADD CONSTRAINT {table}_pkey PRIMARY KEY ({primary_key})")
+    for column, target in (("user_id", "users"), ("team_id", "teams")):
+        op.execute(f"ALTER TABLE {old} DROP CONSTRAINT IF EXISTS fk_{table}_{column}_{target}")
+        op.create_foreign_key(f"fk_{table}_{column}_{target}", table, target, [column], ["id"], ondelete="SET NULL")
+    for name, columns in INDEXES[table]:
+        op.create_index(name, table, columns)
+    if table == "debug_sessions":
+        op.execute(f"CREATE INDEX ix_debug_sessions_search ON debug_sessions USING gin (({SEARCH_TSVECTOR}))")
+
+    if partitioned:
+        first = datetime.utcnow().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        if not context.is_offline_mode():
+            oldest = op.get_bind().execute(sa.text(f"SELECT min(created_at) FROM {old}")).scalar()
+            if oldest is not None:
+                first = min(first, oldest.replace(day=1, hour=0, minute=0, second=0, microsecond=0))
+        last = _add_months(datetime.utcnow().replace(day=1, hour=0, minute=0, second=0, microsecond=0), MONTHS_AHEAD)
+        month = first
+        while month <= last:
+            op.execute(
+                f"CREATE TABLE {table}_p{month:%Y_%m} PARTITION OF {table} "
+                f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{_add_months(month, 1):%Y-%m-%d}')"
+            )
+            month = _add_months(month, 1)
+        op.execute(f"CREATE TABLE {table}_default PARTITION OF {table} DEFAULT")
+
+    op.execute(f"INSERT INTO {table} SELECT * FROM {old}")
+    op.execute(f"DROP TABLE {old} CASCADE")
+
+
+def upgrade() -> None:
+    op.create_table(
+        "retention_archive",
+        sa.Column("id", UUID, primary_key=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("table_name", sa.String(64), nullable=False),
+        sa.Column("period_start", sa.DateTime(), nullable=False),
+        sa.Column("row_count", sa.Integer(), nullable=False),
+        sa.Column("codec", sa.String(8), nullable=False),
+        sa.Column("data", sa.LargeBinary(), nullable=False),
+    )
+    op.create_index(
+        "ix_retention_archive_table_name_period_start", "retention_archive", ["table_name", "period_start"]
+    )
+
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    op.execute("ALTER TABLE run_output_chunks DROP CONSTRAINT IF EXISTS run_output_chunks_run_id_fkey")
+    for table in INDEXES:
+        _recreate_table(table, f"{table}_unpartitioned", "id, created_at", partitioned=True)
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == "postgresql":
+        for table in INDEXES:
+            _recreate_table(table, f"{table}_partitioned", "id", partitioned=False)
+        op.execute("DELETE FROM run_output_chunks WHERE run_id NOT IN (SELECT id FROM runs)")
+        op.create_foreign_key(
+            "run_output_chunks_run_id_fkey", "run_output_chunks", "runs", ["run_id"], ["id"], ondelete="CASCADE"
+        )
+
+    op.drop_index("ix_retention_archive_table_name_period_start", table_name="retention_archive")
+    op.drop_table("retention_archive")
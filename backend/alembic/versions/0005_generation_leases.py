@@ -0,0 +1,34 @@
+"""Lease rows for coalescing generations across workers
+
+Replaces the advisory lock, which kept a pooled connection and an open
+transaction for the whole LLM call.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2025-01-06 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0005"
+down_revision: Union[str, None] = "0004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "generation_leases",
+        sa.Column("prompt_hash", sa.String(64), primary_key=True),
+        sa.Column("owner", sa.String(32), nullable=False),
+        sa.Column("expires_at", sa.DateTime(), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("generation_leases")
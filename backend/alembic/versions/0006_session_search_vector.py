@@ -0,0 +1,49 @@
+"""Stored tsvector column for session search (Postgres only)
+
+The search index used to be an expression index. Matching could use it, but
+ts_rank_cd re-tokenized the three text columns for every candidate row. A
+stored generated column is computed once per write, and both the match and
+the ranking read it. Adding the column rewrites debug_sessions, so the
+upgrade takes time proportional to the table size.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2025-01-08 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0006"
+down_revision: Union[str, None] = "0005"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Same expression as 0001e and app.services.session_search
+SEARCH_TSVECTOR = (
+    "setweight(to_tsvector('english', coalesce(error_text, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(explanation, '')), 'B') || "
+    "setweight(to_tsvector('english', coalesce(fix_suggestion, '')), 'C')"
+)
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    op.execute("DROP INDEX IF EXISTS ix_debug_sessions_search")
+    op.execute(
+        "ALTER TABLE debug_sessions "
+        f"ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ({SEARCH_TSVECTOR}) STORED"
+    )
+    op.execute("CREATE INDEX ix_debug_sessions_search ON debug_sessions USING gin (search_vector)")
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    op.execute("DROP INDEX IF EXISTS ix_debug_sessions_search")
+    op.execute("ALTER TABLE debug_sessions DROP COLUMN search_vector")
+    op.execute(f"CREATE INDEX ix_debug_sessions_search ON debug_sessions USING gin (({SEARCH_TSVECTOR}))")
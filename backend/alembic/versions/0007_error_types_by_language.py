@@ -0,0 +1,65 @@
+"""Language in the error type rollups
+
+stats_error_types had no language, so /api/stats?language=... reported the
+top error types of every language. Existing rows get an empty language: they
+still count when no language is asked for. Run ``rebuild_rollups`` over the
+retained range to split them by language.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2025-01-09 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0007"
+down_revision: Union[str, None] = "0006"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _set_aside() -> None:
+    op.rename_table("stats_error_types", "stats_error_types_old")
+    if op.get_bind().dialect.name == "postgresql":
+        # Frees the index name of the primary key for the new table
+        op.execute("ALTER TABLE stats_error_types_old RENAME CONSTRAINT stats_error_types_pkey TO stats_error_types_old_pkey")
+
+
+def _create(primary_key: Sequence[str]) -> None:
+    columns = [
+        sa.Column("granularity", sa.String(8), primary_key=True),
+        sa.Column("bucket_start", sa.DateTime(), primary_key=True),
+        sa.Column("kind", sa.String(16), primary_key=True),
+        sa.Column("error_type", sa.String(200), primary_key=True),
+        sa.Column("count", sa.Integer(), nullable=False),
+    ]
+    if "language" in primary_key:
+        columns.insert(3, sa.Column("language", sa.String(50), primary_key=True))
+    op.create_table("stats_error_types", *columns)
+
+
+def upgrade() -> None:
+    _set_aside()
+    _create(["granularity", "bucket_start", "kind", "language", "error_type"])
+    op.execute(
+        "INSERT INTO stats_error_types (granularity, bucket_start, kind, language, error_type, count) "
+        "SELECT granularity, bucket_start, kind, '', error_type, count FROM stats_error_types_old"
+    )
+    op.drop_table("stats_error_types_old")
+
+
+def downgrade() -> None:
+    _set_aside()
+    _create(["granularity", "bucket_start", "kind", "error_type"])
+    # Fold the languages back together
+    op.execute(
+        "INSERT INTO stats_error_types (granularity, bucket_start, kind, error_type, count) "
+        "SELECT granularity, bucket_start, kind, error_type, sum(count) FROM stats_error_types_old "
+        "GROUP BY granularity, bucket_start, kind, error_type"
+    )
+    op.drop_table("stats_error_types_old")
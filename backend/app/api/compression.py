@@ -0,0 +1,142 @@
+"""Response compression negotiated from ``Accept-Encoding``.
+
+``CompressionMiddleware`` is a plain ASGI middleware. It encodes responses
+with brotli (``br``) when the client accepts it and the ``brotli`` package is
+installed, and with gzip otherwise. Bodies under ``COMPRESSION_MIN_SIZE``
+bytes are sent as is: for them the encoding costs more than it saves.
+Streaming responses such as ``/api/export`` are compressed chunk by chunk,
+without buffering the stream.
+
+Partial (206) and already encoded responses are left alone, so byte ranges
+of run output stay byte ranges of the stored output. A compressed
+response's ``ETag`` becomes weak, since its bytes differ from the identity
+encoding. ``If-None-Match`` compares weakly, so revalidation still works.
+"""
+import re
+import zlib
+from typing import Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config import settings
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+_COMPRESSIBLE = re.compile(r"^(text/|application/(json|x-ndjson|javascript|xml)|application/[\w.+-]+\+json)")
+_GZIP_LEVEL = 6
+_BROTLI_QUALITY = 4  # fast enough for per-request compression
+
+
+def choose_encoding(accept_encoding: str, brotli_available: bool) -> Optional[str]:
+    """Best of ``br``/``gzip`` the client accepts, or None for identity."""
+    accepted = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        quality = 1.0
+        match = re.search(r"q=([0-9.]+)", params)
+        if match:
+            try:
+                quality = float(match[1])
+            except ValueError:
+                quality = 0.0
+        accepted[name] = quality
+
+    candidates = ["br", "gzip"] if brotli_available else ["gzip"]
+    best, best_quality = None, 0.0
+    for name in candidates:
+        quality = accepted.get(name, accepted.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = name, quality
+    return best
+
+
+class _Encoder:
+    def __init__(self, encoding: str):
+        if encoding == "br":
+            self._compressor = brotli.Compressor(quality=_BROTLI_QUALITY)
+            self._compress, self._flush = self._compressor.process, self._compressor.finish
+        else:
+            self._compressor = zlib.compressobj(_GZIP_LEVEL, zlib.DEFLATED, 31)
+            self._compress, self._flush = self._compressor.compress, self._compressor.flush
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compress(data)
+
+    def finish(self) -> bytes:
+        return self._flush()
+
+
+class CompressionMiddleware:
+    def __init__(self, app: ASGIApp, minimum_size: Optional[int] = None):
+        self.app = app
+        self.minimum_size = settings.COMPRESSION_MIN_SIZE if minimum_size is None else minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""), brotli is not None)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start: Optional[Message] = None
+        encoder: Optional[_Encoder] = None
+        passthrough = False
+
+        async def send_compressed(message: Message) -> None:
+            nonlocal start, encoder, passthrough
+            if message["type"] == "http.response.start":
+                start = {**message, "headers": list(message.get("headers", []))}
+                headers = Headers(raw=start["headers"])
+                passthrough = (
+                    message["status"] in (204, 206, 304)
+                    or "content-encoding" in headers
+                    or "content-range" in headers
+                    or not _COMPRESSIBLE.match(headers.get("content-type", ""))
+                )
+                if passthrough:
+                    await send(start)
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if encoder is None:
+                headers = MutableHeaders(raw=start["headers"])
+                headers.add_vary_header("Accept-Encoding")
+                if not more_body and len(body) < self.minimum_size:
+                    passthrough = True
+                    await send(start)
+                    await send(message)
+                    return
+                encoder = _Encoder(encoding)
+                headers["Content-Encoding"] = encoding
+                etag = headers.get("etag")
+                if etag and not etag.startswith("W/"):
+                    headers["ETag"] = f"W/{etag}"
+                if more_body:
+                    del headers["Content-Length"]
+                else:
+                    body = encoder.compress(body) + encoder.finish()
+                    headers["Content-Length"] = str(len(body))
+                    await send(start)
+                    await send({"type": "http.response.body", "body": body})
+                    return
+                await send(start)
+
+            data = encoder.compress(body)
+            if not more_body:
+                data += encoder.finish()
+            await send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
@@ -0,0 +1,29 @@
+"""Sparse fieldsets: ``?fields=a,b`` selects which response fields are sent.
+
+Only the requested fields are loaded and serialized, so a client polling a
+session's ``status`` does not pay for ``repro_code`` and ``test_code``.
+"""
+from typing import Iterable, Optional, Tuple, Type
+
+from fastapi import HTTPException
+from pydantic import BaseModel
+
+
+def parse_fieldset(
+    fields: Optional[str], schema: Type[BaseModel], always: Iterable[str] = ()
+) -> Optional[Tuple[str, ...]]:
+    """Requested field names (plus ``always``) in schema order, or None for all fields.
+
+    Unknown names are rejected with 400.
+    """
+    if not fields:
+        return None
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = requested - set(schema.model_fields)
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown fields: {', '.join(sorted(unknown))}. Available: {', '.join(schema.model_fields)}",
+        )
+    requested.update(always)
+    return tuple(name for name in schema.model_fields if name in requested)
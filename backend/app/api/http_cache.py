@@ -0,0 +1,132 @@
+"""Strong ETags and a read-through cache for resources in a terminal state.
+
+A completed or failed debug session and a finished run never change again,
+so their serialized JSON is kept in a per-worker LRU keyed by resource id.
+A request whose ``If-None-Match`` matches the cached ETag gets a 304 without
+touching the database. Resources still in flight are always read from the
+database, but they still carry an ETag, so an unchanged poll returns an
+empty 304. Writers call ``response_cache.invalidate`` whenever a resource's
+status changes.
+
+``parse_byte_range`` handles ``Range`` requests for immutable bodies such as
+stored run output.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Hashable, Optional, Tuple
+
+from fastapi import Request, Response
+
+from app.config import settings
+
+
+@dataclass(frozen=True)
+class CachedBody:
+    """Serialized JSON body and its strong ETag."""
+
+    body: bytes
+    etag: str
+
+
+def make_etag(body: bytes) -> str:
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """``If-None-Match`` check (weak comparison, as RFC 9110 requires for GET)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (tag.strip() for tag in if_none_match.split(","))
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+class ResponseCache:
+    """Thread-safe LRU of serialized responses."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, CachedBody]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Optional[CachedBody]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key: Hashable, body: bytes) -> CachedBody:
+        entry = CachedBody(body, make_etag(body))
+        if self.max_entries <= 0:
+            return entry
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+response_cache = ResponseCache(settings.RESPONSE_CACHE_SIZE)
+
+
+def conditional_response(request: Request, entry: CachedBody, terminal: bool) -> Response:
+    """200 with the body, or 304 if the client already holds this version."""
+    headers = {
+        "ETag": entry.etag,
+        # Terminal resources are immutable; anything else must be revalidated
+        "Cache-Control": f"private, max-age={settings.RESPONSE_CACHE_MAX_AGE_SEC}" if terminal else "no-cache",
+    }
+    if etag_matches(request.headers.get("if-none-match"), entry.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
+
+
+class RangeNotSatisfiable(Exception):
+    """The requested byte range lies entirely outside the resource (HTTP 416)."""
+
+
+def parse_byte_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """Inclusive (start, end) of a single ``bytes=`` range, or None to send the whole body.
+
+    Multiple ranges, other units and malformed headers are ignored, which
+    RFC 9110 allows (the client then gets a plain 200).
+    """
+    if not header:
+        return None
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, sep, last = spec.strip().partition("-")
+    if not sep:
+        return None
+    try:
+        if not first:
+            suffix = int(last)
+            if suffix <= 0 or size == 0:
+                raise RangeNotSatisfiable()
+            return max(0, size - suffix), size - 1
+        start = int(first)
+        end = int(last) if last else None
+    except ValueError:
+        return None
+    if start < 0 or (end is not None and start > end):
+        return None
+    if start >= size:
+        raise RangeNotSatisfiable()
+    return start, size - 1 if end is None else min(end, size - 1)
@@ -0,0 +1,64 @@
+"""Per-route request metrics and the ``GET /metrics`` scrape endpoint."""
+import time
+from typing import Dict
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.services import metrics
+
+UNMATCHED_ROUTE = "unmatched"
+
+router = APIRouter(tags=["metrics"])
+
+
+@router.get("/metrics", include_in_schema=False)
+async def scrape_metrics():
+    """Metrics of this worker in the Prometheus text format."""
+    return PlainTextResponse(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+
+class MetricsMiddleware:
+    """Counts requests and observes their latency, labelled by route template.
+
+    The route is the template the request matched (``/api/runs/{run_id}``),
+    so the number of series does not grow with ids. Requests that match no
+    route share the ``unmatched`` label.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self._routes: Dict[object, str] = {}
+
+    def _route(self, scope: Scope) -> str:
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return UNMATCHED_ROUTE
+        route = self._routes.get(endpoint)
+        if route is None:
+            for candidate in getattr(scope.get("app"), "routes", ()):
+                self._routes.setdefault(getattr(candidate, "endpoint", None), getattr(candidate, "path", ""))
+            route = self._routes.setdefault(endpoint, getattr(endpoint, "__name__", UNMATCHED_ROUTE))
+        return route
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            method, route = scope["method"], self._route(scope)
+            metrics.http_request_duration.labels(method, route).observe(time.perf_counter() - start)
+            metrics.http_requests.labels(method, route, str(status)).inc()
@@ -0,0 +1,16 @@
+"""Ownership checks for team-scoped resources."""
+from typing import Optional
+from uuid import UUID
+from fastapi import HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.services.membership_cache import membership_cache
+
+
+async def check_team_access(db: AsyncSession, user_id: Optional[UUID], team_id: Optional[UUID]) -> None:
+    """Allow ``team_id`` only for members of that team (400 without a user, 403 for non-members)."""
+    if team_id is None:
+        return
+    if user_id is None:
+        raise HTTPException(status_code=400, detail="team_id requires user_id")
+    if not await membership_cache.is_member(db, user_id, team_id):
+        raise HTTPException(status_code=403, detail="User is not a member of this team")
@@ -0,0 +1,33 @@
+"""Keyset (cursor) pagination helpers for listings ordered by (created_at, id)."""
+import base64
+import uuid
+from datetime import datetime
+from typing import Optional, Tuple
+from fastapi import HTTPException
+from sqlalchemy import and_, or_
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(created_at: datetime, row_id: uuid.UUID) -> str:
+    """Opaque cursor pointing just past the given row."""
+    raw = f"{created_at.isoformat()}|{row_id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, uuid.UUID]:
+    """Parse a cursor produced by ``encode_cursor`` (400 if malformed)."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, row_id = base64.urlsafe_b64decode(padded).decode("utf-8").split("|", 1)
+        return datetime.fromisoformat(created_at), uuid.UUID(row_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def keyset_before(created_col, id_col, cursor: Optional[str]):
+    """WHERE clause for rows after ``cursor`` in (created_at DESC, id DESC) order."""
+    if not cursor:
+        return None
+    created_at, row_id = decode_cursor(cursor)
+    return or_(created_col < created_at, and_(created_col == created_at, id_col < row_id))
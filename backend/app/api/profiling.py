@@ -0,0 +1,312 @@
+"""On-demand statistical profiling of individual requests.
+
+``ProfilingMiddleware`` profiles a request when either of these holds:
+
+- The request sends ``X-Profile: 1`` together with ``X-Admin-Token:
+  <ADMIN_TOKEN>``. The response then carries ``X-Profile-Id``.
+- The request is picked at random with probability ``PROFILING_SAMPLE_RATE``.
+
+While a request is profiled, a sampler thread records its stack every
+``PROFILING_INTERVAL_MS``. When the request's task is running, this is the
+event-loop thread's stack. When the task is suspended, it is the chain of
+coroutines it awaits, ending in a ``(waiting)`` frame. Time spent awaiting
+the LLM or the database therefore shows up as well as CPU time. Work handed
+to ``asyncio.to_thread`` (Docker calls, output compression) appears as a
+``[thread] function`` frame.
+
+Each sample is classified by the innermost frame from a known package:
+``llm``, ``db``, ``docker`` or ``json``; the rest is ``other``. The slowest
+``PROFILING_MAX_PROFILES`` profiles are kept per worker. ``GET
+/api/admin/profiles`` lists them, and each one can be downloaded in the
+collapsed-stack format read by flamegraph.pl, speedscope and inferno.
+"""
+import asyncio
+import heapq
+import hmac
+import itertools
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config import settings
+
+PROFILE_HEADER = "X-Profile"
+PROFILE_ID_HEADER = "X-Profile-Id"
+ADMIN_TOKEN_HEADER = "X-Admin-Token"
+WAITING = "(waiting)"
+MAX_DEPTH = 128
+
+# Innermost matching frame wins; matched on the frame's module name
+CATEGORIES = [
+    ("llm", ("app.services.llm_client", "app.services.llm_cassette", "openai", "anthropic")),
+    ("docker", ("docker", "app.services.sandbox_runner")),
+    ("db", ("sqlalchemy", "aiosqlite", "psycopg", "asyncpg", "sqlite3", "app.db")),
+    ("json", ("json", "orjson", "pydantic", "pydantic_core", "fastapi.encoders")),
+]
+
+
+def admin_token_matches(token: Optional[str]) -> bool:
+    if not settings.ADMIN_TOKEN or token is None:
+        return False
+    # compare_digest rejects str with non-ASCII characters; bytes compare any token
+    return hmac.compare_digest(token.encode("utf-8"), settings.ADMIN_TOKEN.encode("utf-8"))
+
+
+def _frame_module(frame) -> str:
+    return frame.f_globals.get("__name__", "?")
+
+
+def _frame_label(frame) -> str:
+    return f"{_frame_module(frame)}:{frame.f_code.co_qualname}"
+
+
+def _thread_label(frame) -> Optional[str]:
+    """``[thread] module:function`` for an ``asyncio.to_thread`` frame."""
+    if frame.f_code.co_name != "to_thread" or _frame_module(frame) != "asyncio.threads":
+        return None
+    func = frame.f_locals.get("func")
+    if func is None:
+        return None
+    func = getattr(func, "__func__", func)
+    return f"[thread] {getattr(func, '__module__', '?')}:{getattr(func, '__qualname__', repr(func))}"
+
+
+def categorize(labels: List[str]) -> str:
+    """Category of a stack (root first), from its innermost recognized frame."""
+    for label in reversed(labels):
+        module = label.split(":", 1)[0].replace("[thread] ", "")
+        for category, prefixes in CATEGORIES:
+            if any(module == prefix or module.startswith(prefix + ".") for prefix in prefixes):
+                return category
+    return "other"
+
+
+def _running_stack(frame, root) -> List:
+    frames = []
+    while frame is not None and len(frames) < MAX_DEPTH:
+        frames.append(frame)
+        if frame is root:
+            break
+        frame = frame.f_back
+    frames.reverse()
+    return frames
+
+
+def _awaiting_stack(coro) -> List[str]:
+    labels = []
+    while coro is not None and len(labels) < MAX_DEPTH:
+        frame = getattr(coro, "cr_frame", None) or getattr(coro, "gi_frame", None) or getattr(coro, "ag_frame", None)
+        if frame is None:
+            break
+        labels.append(_thread_label(frame) or _frame_label(frame))
+        coro = getattr(coro, "cr_await", None) or getattr(coro, "gi_yieldfrom", None) or getattr(coro, "ag_await", None)
+    labels.append(WAITING)
+    return labels
+
+
+@dataclass
+class _Active:
+    task: asyncio.Task
+    loop: asyncio.AbstractEventLoop
+    thread_id: int
+    stacks: Counter = field(default_factory=Counter)
+    categories: Counter = field(default_factory=Counter)
+    samples: int = 0
+
+
+class Sampler:
+    """Background thread sampling the stacks of the requests being profiled."""
+
+    def __init__(self, interval_ms: float = 5.0):
+        self.interval_sec = max(0.001, interval_ms / 1000)
+        self._active: Dict[str, _Active] = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self, profile_id: str) -> None:
+        active = _Active(asyncio.current_task(), asyncio.get_running_loop(), threading.get_ident())
+        with self._lock:
+            self._active[profile_id] = active
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+                self._thread.start()
+        self._wake.set()
+
+    def stop(self, profile_id: str) -> Optional[_Active]:
+        with self._lock:
+            return self._active.pop(profile_id, None)
+
+    def _run(self) -> None:
+        while True:
+            with self._lock:
+                active = list(self._active.values())
+            if not active:
+                # Idle until the next profiled request; exit after a minute without one
+                woken = self._wake.wait(timeout=60)
+                self._wake.clear()
+                if not woken:
+                    with self._lock:
+                        if not self._active:
+                            self._thread = None
+                            return
+                continue
+            with self._lock:
+                frames = sys._current_frames()
+                for profile in self._active.values():
+                    try:
+                        self.sample(profile, frames)
+                    except Exception:  # a frame changed under us; skip this sample
+                        pass
+            del frames
+            time.sleep(self.interval_sec)
+
+    @staticmethod
+    def sample(profile: _Active, frames: Dict[int, object]) -> None:
+        task = profile.task
+        coro = task.get_coro() if task is not None else None
+        if coro is None or task.done():
+            return
+        if asyncio.current_task(profile.loop) is task and profile.thread_id in frames:
+            labels = [_frame_label(f) for f in _running_stack(frames[profile.thread_id], coro.cr_frame)]
+        else:
+            labels = _awaiting_stack(coro)
+        profile.stacks[";".join(labels)] += 1
+        profile.categories[categorize(labels)] += 1
+        profile.samples += 1
+
+
+@dataclass
+class Profile:
+    id: str
+    method: str
+    path: str
+    status: Optional[int]
+    started_at: datetime
+    duration_ms: float
+    forced: bool
+    samples: int
+    categories_ms: Dict[str, float]
+    stacks: Dict[str, int]
+
+    def summary(self) -> Dict:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "status": self.status,
+            "started_at": self.started_at.isoformat(),
+            "duration_ms": self.duration_ms,
+            "forced": self.forced,
+            "samples": self.samples,
+            "categories_ms": self.categories_ms,
+        }
+
+    def collapsed(self) -> str:
+        """Collapsed stacks, one ``frame;frame;frame count`` line each."""
+        return "".join(f"{stack} {count}\n" for stack, count in sorted(self.stacks.items()))
+
+
+class ProfileStore:
+    """The ``max_profiles`` slowest profiles (a bounded min-heap on duration)."""
+
+    def __init__(self, max_profiles: int = 20):
+        self.max_profiles = max(1, max_profiles)
+        self._heap: List = []
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+
+    def add(self, profile: Profile) -> bool:
+        """Keep ``profile`` if it is among the slowest; returns whether it was kept."""
+        item = (profile.duration_ms, next(self._counter), profile)
+        with self._lock:
+            if len(self._heap) < self.max_profiles:
+                heapq.heappush(self._heap, item)
+                return True
+            if item[0] <= self._heap[0][0]:
+                return False
+            heapq.heapreplace(self._heap, item)
+            return True
+
+    def list(self) -> List[Profile]:
+        with self._lock:
+            return [profile for _, _, profile in sorted(self._heap, reverse=True)]
+
+    def get(self, profile_id: str) -> Optional[Profile]:
+        with self._lock:
+            return next((profile for _, _, profile in self._heap if profile.id == profile_id), None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._heap.clear()
+
+
+sampler = Sampler(settings.PROFILING_INTERVAL_MS)
+profile_store = ProfileStore(settings.PROFILING_MAX_PROFILES)
+
+
+class ProfilingMiddleware:
+    def __init__(
+        self,
+        app: ASGIApp,
+        sample_rate: Optional[float] = None,
+        store: Optional[ProfileStore] = None,
+    ):
+        self.app = app
+        self.sample_rate = settings.PROFILING_SAMPLE_RATE if sample_rate is None else sample_rate
+        self.store = store or profile_store
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = Headers(scope=scope)
+        forced = headers.get(PROFILE_HEADER) == "1" and admin_token_matches(headers.get(ADMIN_TOKEN_HEADER))
+        if not forced and not (self.sample_rate and random.random() < self.sample_rate):
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = uuid.uuid4().hex
+        status: Optional[int] = None
+
+        async def send_with_profile_id(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if forced:
+                    MutableHeaders(scope=message).append(PROFILE_ID_HEADER, profile_id)
+            await send(message)
+
+        started_at = datetime.utcnow()
+        start = time.perf_counter()
+        sampler.start(profile_id)
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            active = sampler.stop(profile_id)
+            duration_ms = (time.perf_counter() - start) * 1000
+            if active is not None:
+                total = max(1, active.samples)
+                self.store.add(Profile(
+                    id=profile_id,
+                    method=scope["method"],
+                    path=scope["path"],
+                    status=status,
+                    started_at=started_at,
+                    duration_ms=round(duration_ms, 2),
+                    forced=forced,
+                    samples=active.samples,
+                    categories_ms={
+                        name: round(duration_ms * count / total, 2) for name, count in active.categories.most_common()
+                    },
+                    stacks=dict(active.stacks),
+                ))
@@ -0,0 +1,283 @@
+"""Cost-weighted request rate limiting.
+
+``RateLimitMiddleware`` is a plain ASGI middleware. It charges each HTTP
+request a cost by route: an LLM generation costs more than a sandbox run,
+and a sandbox run costs more than a read. The cost is taken from token
+buckets that refill continuously. Requests are limited per client IP only:
+the API has no authenticated principal to key a bucket on, and headers the
+client sets (``X-User-Id``, ``X-Team-Id``) are never used, so a client can
+neither escape its limit nor spend someone else's budget. Clients behind
+one NAT or proxy share a budget. Backends accept several buckets per
+request and admit it only if every bucket can pay, checking and charging
+them in one atomic step.
+
+Responses carry ``RateLimit-Limit``/``RateLimit-Remaining``/``RateLimit-Reset``
+and ``RateLimit-Policy`` headers for the most constrained bucket. Rejected
+requests get 429 with ``Retry-After``. ``MemoryRateLimitBackend`` limits
+per worker. ``RedisRateLimitBackend`` keeps the buckets in a Redis-protocol
+server and updates them with a Lua script, so limits hold across workers.
+"""
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# "METHOD /path" -> cost; "*" matches any method and a trailing "*" matches a path prefix.
+# RATE_LIMIT_ROUTE_COSTS entries override these.
+DEFAULT_ROUTE_COSTS: Dict[str, int] = {
+    "POST /api/debug-sessions": 20,  # LLM generation (possibly several with verify_repro)
+    "POST /api/runs": 10,  # sandbox container
+    "POST /api/sandbox/images/build": 50,
+    "GET /api/debug-sessions/search": 3,
+    "GET /api/stats": 2,
+    "GET /api/export/*": 20,  # full-table streams
+    "* /health": 0,
+    "* /metrics": 0,
+    "OPTIONS *": 0,  # CORS preflight
+}
+DEFAULT_READ_COST = 1
+DEFAULT_WRITE_COST = 2
+
+RATE_LIMIT_HEADERS = ["RateLimit-Limit", "RateLimit-Remaining", "RateLimit-Reset", "RateLimit-Policy", "Retry-After"]
+
+
+@dataclass(frozen=True)
+class Bucket:
+    """Token bucket holding up to ``capacity`` units, refilled at ``refill_per_sec``."""
+
+    key: str
+    capacity: int
+    refill_per_sec: float
+
+
+@dataclass(frozen=True)
+class Decision:
+    """Outcome of charging a request against its buckets."""
+
+    allowed: bool
+    bucket: Bucket  # the most constrained bucket, reported in headers
+    remaining: int
+    reset_sec: int  # until that bucket is full again
+    retry_after_sec: int = 0
+
+
+def _decide(buckets: Sequence[Bucket], levels: Sequence[float], cost: int, allowed: bool) -> Decision:
+    """Build a decision from bucket levels (after charging, if allowed)."""
+    tightest = min(range(len(buckets)), key=lambda i: levels[i] / buckets[i].capacity)
+    bucket, level = buckets[tightest], levels[tightest]
+    retry_after = 0
+    if not allowed:
+        retry_after = max(
+            math.ceil((min(cost, b.capacity) - lvl) / b.refill_per_sec)
+            for b, lvl in zip(buckets, levels)
+            if lvl < min(cost, b.capacity)
+        )
+    return Decision(
+        allowed=allowed,
+        bucket=bucket,
+        remaining=max(0, int(level)),
+        reset_sec=max(0, math.ceil((bucket.capacity - level) / bucket.refill_per_sec)),
+        retry_after_sec=max(1, retry_after) if not allowed else 0,
+    )
+
+
+class MemoryRateLimitBackend:
+    """Buckets in process memory; limits apply per worker.
+
+    The number of tracked keys is bounded. The least recently seen key is
+    dropped first, which only ever makes that client's limit more lenient.
+    """
+
+    def __init__(self, max_keys: int = 100_000, clock: Callable[[], float] = time.monotonic):
+        self.max_keys = max_keys
+        self._clock = clock
+        self._levels: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()  # key -> (tokens, updated_at)
+        self._lock = threading.Lock()
+
+    async def consume(self, buckets: Sequence[Bucket], cost: int) -> Decision:
+        with self._lock:
+            now = self._clock()
+            levels = []
+            for b in buckets:
+                tokens, updated = self._levels.get(b.key, (b.capacity, now))
+                levels.append(min(b.capacity, tokens + (now - updated) * b.refill_per_sec))
+            # A request costlier than a whole bucket is still admitted when the bucket is full
+            allowed = all(level >= min(cost, b.capacity) for b, level in zip(buckets, levels))
+            if allowed:
+                levels = [level - min(cost, b.capacity) for b, level in zip(buckets, levels)]
+                for b, level in zip(buckets, levels):
+                    self._levels[b.key] = (level, now)
+                    self._levels.move_to_end(b.key)
+                while len(self._levels) > self.max_keys:
+                    self._levels.popitem(last=False)
+            return _decide(buckets, levels, cost, allowed)
+
+
+# KEYS: bucket keys. ARGV: cost, now, then capacity and refill rate per key.
+# Returns {allowed, level_1, ..., level_n}; levels as strings to keep fractions.
+_CONSUME_LUA = """
+local cost = tonumber(ARGV[1])
+local now = tonumber(ARGV[2])
+local levels = {}
+local allowed = 1
+for i = 1, #KEYS do
+    local capacity = tonumber(ARGV[1 + 2 * i])
+    local rate = tonumber(ARGV[2 + 2 * i])
+    local state = redis.call('HMGET', KEYS[i], 'tokens', 'ts')
+    local tokens = tonumber(state[1]) or capacity
+    local ts = tonumber(state[2]) or now
+    tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+    levels[i] = tokens
+    if tokens < math.min(cost, capacity) then
+        allowed = 0
+    end
+end
+local result = {allowed}
+for i = 1, #KEYS do
+    local capacity = tonumber(ARGV[1 + 2 * i])
+    local rate = tonumber(ARGV[2 + 2 * i])
+    if allowed == 1 then
+        levels[i] = levels[i] - math.min(cost, capacity)
+        redis.call('HSET', KEYS[i], 'tokens', tostring(levels[i]), 'ts', tostring(now))
+        redis.call('PEXPIRE', KEYS[i], math.ceil(capacity / rate * 1000) + 1000)
+    end
+    result[i + 1] = tostring(levels[i])
+end
+return result
+"""
+
+
+class RedisRateLimitBackend:
+    """Buckets in a Redis-protocol server shared by all workers."""
+
+    def __init__(self, url: Optional[str] = None, client=None, prefix: str = "bugghost:ratelimit:"):
+        if client is None:
+            import redis.asyncio as redis  # optional dependency, only needed for RATE_LIMIT_BACKEND_URL
+
+            client = redis.from_url(url, decode_responses=True)
+        self.client = client
+        self.prefix = prefix
+        self._script = client.register_script(_CONSUME_LUA)
+
+    async def consume(self, buckets: Sequence[Bucket], cost: int) -> Decision:
+        args: List = [cost, time.time()]
+        for b in buckets:
+            args.extend([b.capacity, b.refill_per_sec])
+        result = await self._script(keys=[self.prefix + b.key for b in buckets], args=args)
+        allowed = bool(int(result[0]))
+        return _decide(buckets, [float(level) for level in result[1:]], cost, allowed)
+
+
+def parse_route_costs(costs: Dict[str, int]) -> List[Tuple[str, str, bool, int]]:
+    """Compile "METHOD /path" rules into (method, path, is_prefix, cost), most specific first."""
+    rules = []
+    for rule, cost in costs.items():
+        method, _, path = rule.strip().partition(" ")
+        path = path.strip() or "*"
+        is_prefix = path.endswith("*")
+        rules.append((method.upper(), path.rstrip("*"), is_prefix, int(cost)))
+    # Exact paths before prefixes, longer prefixes first, explicit methods before "*"
+    rules.sort(key=lambda r: (r[2], -len(r[1]), r[0] == "*"))
+    return rules
+
+
+class RateLimitMiddleware:
+    """ASGI middleware charging HTTP requests against per-client token buckets."""
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        backend=None,
+        route_costs: Optional[Dict[str, int]] = None,
+        per_minute: Optional[int] = None,
+        trust_forwarded_for: Optional[bool] = None,
+    ):
+        self.app = app
+        self.backend = backend or rate_limit_backend_from_settings()
+        self.rules = parse_route_costs({**DEFAULT_ROUTE_COSTS, **(route_costs or settings.RATE_LIMIT_ROUTE_COSTS)})
+        self.per_minute = per_minute or settings.RATE_LIMIT_PER_MINUTE
+        self.trust_forwarded_for = (
+            settings.RATE_LIMIT_TRUST_FORWARDED_FOR if trust_forwarded_for is None else trust_forwarded_for
+        )
+
+    def cost_of(self, method: str, path: str) -> int:
+        for rule_method, rule_path, is_prefix, cost in self.rules:
+            if rule_method not in ("*", method):
+                continue
+            if path == rule_path or (is_prefix and path.startswith(rule_path)):
+                return cost
+        return DEFAULT_READ_COST if method in ("GET", "HEAD") else DEFAULT_WRITE_COST
+
+    def _client_ip(self, scope: Scope, headers: Headers) -> str:
+        if self.trust_forwarded_for:
+            forwarded = headers.get("x-forwarded-for")
+            if forwarded:
+                return forwarded.split(",")[0].strip()
+        client = scope.get("client")
+        return client[0] if client else "unknown"
+
+    def buckets_for(self, scope: Scope) -> List[Bucket]:
+        ip = self._client_ip(scope, Headers(scope=scope))
+        return [Bucket(f"ip:{ip}", self.per_minute, self.per_minute / 60.0)]
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        cost = self.cost_of(scope["method"], scope["path"])
+        if cost <= 0:
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            decision = await self.backend.consume(self.buckets_for(scope), cost)
+        except Exception:
+            # A broken limiter backend must not take the API down with it
+            logger.warning("rate limit backend unavailable; admitting request", exc_info=True)
+            await self.app(scope, receive, send)
+            return
+
+        headers = rate_limit_headers(decision)
+        if not decision.allowed:
+            headers["Retry-After"] = str(decision.retry_after_sec)
+            response = JSONResponse({"detail": "Rate limit exceeded"}, status_code=429, headers=headers)
+            await response(scope, receive, send)
+            return
+
+        async def send_with_headers(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                response_headers = MutableHeaders(scope=message)
+                for name, value in headers.items():
+                    response_headers.setdefault(name, value)
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
+
+
+def rate_limit_headers(decision: Decision) -> Dict[str, str]:
+    bucket = decision.bucket
+    window = round(bucket.capacity / bucket.refill_per_sec)
+    return {
+        "RateLimit-Limit": str(bucket.capacity),
+        "RateLimit-Remaining": str(decision.remaining),
+        "RateLimit-Reset": str(decision.reset_sec),
+        "RateLimit-Policy": f"{bucket.capacity};w={window}",
+    }
+
+
+def rate_limit_backend_from_settings():
+    """Redis backend when ``RATE_LIMIT_BACKEND_URL`` is set, else per-worker memory."""
+    if settings.RATE_LIMIT_BACKEND_URL:
+        return RedisRateLimitBackend(settings.RATE_LIMIT_BACKEND_URL)
+    return MemoryRateLimitBackend()
@@ -0,0 +1,42 @@
+"""Admin endpoints: request profiles captured by ProfilingMiddleware."""
+from typing import Literal, Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.responses import PlainTextResponse
+
+from app.api.profiling import admin_token_matches, profile_store
+from app.config import settings
+
+router = APIRouter(prefix="/api/admin", tags=["admin"])
+
+
+async def require_admin(x_admin_token: Optional[str] = Header(None)) -> None:
+    if not settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not admin_token_matches(x_admin_token):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+@router.get("/profiles", dependencies=[Depends(require_admin)])
+async def list_profiles():
+    """Profiles kept by this worker, slowest first."""
+    return [profile.summary() for profile in profile_store.list()]
+
+
+@router.get("/profiles/{profile_id}", dependencies=[Depends(require_admin)])
+async def get_profile(profile_id: str, format: Literal["collapsed", "json"] = "collapsed"):
+    """One profile as collapsed stacks (``flamegraph.pl``, speedscope) or JSON."""
+    profile = profile_store.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    if format == "json":
+        return {**profile.summary(), "stacks": profile.stacks}
+    return PlainTextResponse(
+        profile.collapsed(),
+        headers={"Content-Disposition": f'attachment; filename="profile-{profile_id}.folded"'},
+    )
+
+
+@router.delete("/profiles", status_code=204, dependencies=[Depends(require_admin)])
+async def clear_profiles():
+    profile_store.clear()
@@ -1,11 +1,11 @@
 """GitHub OAuth minimal integration."""
 from fastapi import APIRouter, HTTPException, Depends
 from fastapi.responses import RedirectResponse
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.config import settings
 from app.db.session import get_db
 from app.models.user import User
-import httpx
 
 router = APIRouter(prefix="/api/auth", tags=["auth"]) 
 
@@ -26,11 +26,13 @@ async def github_login():
 
 
 @router.get("/github/callback")
-async def github_callback(code: str, db: Session = Depends(get_db)):
+async def github_callback(code: str, db: AsyncSession = Depends(get_db)):
     """Exchange code for access token and upsert user."""
     if not settings.GITHUB_CLIENT_ID or not settings.GITHUB_CLIENT_SECRET:
         raise HTTPException(status_code=500, detail="GitHub OAuth not configured")
 
+    import httpx  # only needed for the OAuth exchange; keeps worker startup lean
+
     async with httpx.AsyncClient(headers={"Accept": "application/json"}) as client:
         # Exchange code
         token_resp = await client.post(
@@ -64,18 +66,18 @@ async def github_callback(code: str, db: Session = Depends(get_db)):
             raise HTTPException(status_code=400, detail="Invalid GitHub user payload")
 
         # Upsert user
-        user = db.query(User).filter(User.github_id == gh_id).first()
+        user = (await db.execute(select(User).where(User.github_id == gh_id))).scalars().first()
         if not user:
             user = User(github_id=gh_id, username=login, name=name, avatar_url=avatar_url)
             db.add(user)
-            db.commit()
-            db.refresh(user)
+            await db.commit()
+            await db.refresh(user)
         else:
             # Update profile fields if changed
             user.username = login
             user.name = name
             user.avatar_url = avatar_url
-            db.commit()
+            await db.commit()
 
     # For MVP: return user + access_token (frontend can store). In production, issue JWT httpOnly cookie.
     return {
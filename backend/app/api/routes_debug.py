@@ -1,17 +1,30 @@
 """API routes for debug sessions."""
-from typing import List
+from typing import List, Optional
 from uuid import UUID
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.db.session import get_db
-from app.models.debug_session import DebugSession, SessionStatus
+from app.api.ownership import check_team_access
+from app.api.fieldsets import parse_fieldset
+from app.api.http_cache import CachedBody, conditional_response, make_etag, response_cache
+from app.api.pagination import NEXT_CURSOR_HEADER, encode_cursor, keyset_before
+from app.models.debug_session import DebugSession, SessionStatus, make_error_snippet, ERROR_SNIPPET_LENGTH
 from app.schemas.debug_session import (
     DebugSessionCreate,
     DebugSessionResponse,
-    DebugSessionListResponse
+    DebugSessionListResponse,
+    DebugSessionSearchResult
 )
+from app.services.circuit_breaker import CircuitOpenError
 from app.services.llm_client import LLMClient
 from app.services.repro_generator import ReproductionGenerator
+from app.services.repro_verifier import ReproVerifier
+from app.services.sandbox_runner import SandboxRunner
+from app.services.session_search import search_sessions
+from app.services.stats_rollups import record_session
+from app.services.single_flight import cross_worker_coalescer
+from app.services import tracing
 from app.config import settings
 
 router = APIRouter(prefix="/api/debug-sessions", tags=["debug-sessions"])
@@ -20,7 +33,7 @@ router = APIRouter(prefix="/api/debug-sessions", tags=["debug-sessions"])
 @router.post("", response_model=DebugSessionResponse, status_code=201)
 async def create_debug_session(
     session_data: DebugSessionCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Create a new debug session and generate reproduction.
@@ -32,50 +45,76 @@ async def create_debug_session(
     4. Returns complete session
     """
     
+    await check_team_access(db, session_data.user_id, session_data.team_id)
+    
     # Create initial session
     db_session = DebugSession(
+        user_id=session_data.user_id,
+        team_id=session_data.team_id,
         language=session_data.language,
         runtime_info=session_data.runtime_info,
         error_text=session_data.error_text,
+        error_snippet=make_error_snippet(session_data.error_text),
         code_snippet=session_data.code_snippet,
         context_description=session_data.context_description,
         status=SessionStatus.PROCESSING
     )
     
-    db.add(db_session)
-    db.commit()
-    db.refresh(db_session)
+    with tracing.span("session.insert"):
+        db.add(db_session)
+        await db.commit()
+    # No refresh: it would begin a new transaction and keep a pooled connection
+    # for the whole generation. expire_on_commit=False keeps db_session readable.
     
     try:
-        # Create LLM client
-        llm_client = LLMClient.create(
-            provider=settings.LLM_PROVIDER,
-            api_key=settings.LLM_API_KEY,
-            model=settings.LLM_MODEL
-        )
+        # Shared LLM client (primary provider plus configured fallbacks)
+        llm_client = LLMClient.from_settings()
         
         # Generate reproduction
-        generator = ReproductionGenerator(llm_client)
-        result = await generator.generate_reproduction(session_data)
+        generator = ReproductionGenerator(llm_client, coalescer=cross_worker_coalescer())
+        with tracing.span("session.generate", verify_repro=session_data.verify_repro):
+            if session_data.verify_repro:
+                verifier = ReproVerifier(
+                    generator,
+                    SandboxRunner(docker_host=settings.DOCKER_HOST),
+                    candidates=settings.REPRO_VERIFY_CANDIDATES,
+                    time_budget_sec=settings.REPRO_VERIFY_TIME_BUDGET_SEC,
+                    max_rounds=settings.REPRO_VERIFY_MAX_ROUNDS,
+                )
+                outcome = await verifier.generate_verified(session_data)
+                result = outcome.result
+                db_session.repro_verified = outcome.verified
+                db_session.verification_attempts = outcome.attempts
+                db_session.time_to_verified_ms = outcome.elapsed_ms if outcome.verified else None
+            else:
+                result = await generator.generate_reproduction(session_data)
         
         # Update session with results
         db_session.repro_code = result.repro_code
         db_session.test_code = result.test_code
         db_session.explanation = result.explanation
         db_session.fix_suggestion = result.fix_suggestion
-        db_session.llm_model = settings.LLM_MODEL
+        db_session.prompt_tokens_before = result.prompt_tokens_before
+        db_session.prompt_tokens_after = result.prompt_tokens_after
+        db_session.llm_model = result.llm_model or settings.LLM_MODEL
         db_session.status = SessionStatus.COMPLETED
-        
-        db.commit()
-        db.refresh(db_session)
+        with tracing.span("session.save"):
+            await record_session(db, db_session.language, db_session.status, db_session.error_text, db_session.created_at)
+            await db.commit()
+        response_cache.invalidate(("session", db_session.id))
+        await db.refresh(db_session)
         
     except Exception as e:
         # Mark as failed
         db_session.status = SessionStatus.FAILED
         db_session.error_message = str(e)
-        db.commit()
-        db.refresh(db_session)
+        await record_session(db, db_session.language, db_session.status, db_session.error_text, db_session.created_at)
+        await db.commit()
+        response_cache.invalidate(("session", db_session.id))
+        await db.refresh(db_session)
         
+        if isinstance(e, CircuitOpenError):
+            raise HTTPException(status_code=503, detail=f"LLM provider unavailable: {e}", headers=e.headers())
         raise HTTPException(
             status_code=500,
             detail=f"Failed to generate reproduction: {str(e)}"
@@ -84,40 +123,118 @@ async def create_debug_session(
     return db_session
 
 
+@router.get("/search", response_model=List[DebugSessionSearchResult])
+async def search_debug_sessions(
+    q: str = Query(..., min_length=1, max_length=500, description="Search terms (web search syntax on Postgres)"),
+    language: Optional[str] = None,
+    status: Optional[SessionStatus] = None,
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0, le=1000),
+    db: AsyncSession = Depends(get_db)
+):
+    """Full-text search over error text, explanation and fix suggestion."""
+    
+    hits = await search_sessions(db, q, language=language, status=status, limit=limit, offset=offset)
+    return [DebugSessionSearchResult.model_validate(hit) for hit in hits]
+
+
 @router.get("/{session_id}", response_model=DebugSessionResponse)
-async def get_debug_session(session_id: UUID, db: Session = Depends(get_db)):
-    """Get a specific debug session by ID."""
+async def get_debug_session(
+    session_id: UUID,
+    request: Request,
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return, e.g. status,explanation"),
+    db: AsyncSession = Depends(get_db)
+):
+    """Get a specific debug session by ID.
+
+    Supports ``If-None-Match``. Completed and failed sessions are served from
+    a read-through cache, so a matching conditional request skips the database.
+    With ``fields``, only those columns are loaded and returned (``id`` is
+    always included).
+    """
     
-    db_session = db.query(DebugSession).filter(DebugSession.id == session_id).first()
+    fieldset = parse_fieldset(fields, DebugSessionResponse, always=("id",))
+    key = ("session", session_id) if fieldset is None else ("session", session_id, fieldset)
+    entry = response_cache.get(key)
+    if entry is not None:
+        return conditional_response(request, entry, terminal=True)
     
-    if not db_session:
-        raise HTTPException(status_code=404, detail="Session not found")
+    if fieldset is None:
+        db_session = await db.get(DebugSession, session_id)
+        if not db_session:
+            raise HTTPException(status_code=404, detail="Session not found")
+        status = db_session.status
+        body = DebugSessionResponse.model_validate(db_session).model_dump_json().encode("utf-8")
+    else:
+        columns = {name: getattr(DebugSession, name) for name in fieldset}
+        columns.setdefault("status", DebugSession.status)
+        row = (await db.execute(select(*columns.values()).where(DebugSession.id == session_id))).first()
+        if row is None:
+            raise HTTPException(status_code=404, detail="Session not found")
+        status = row.status
+        partial = DebugSessionResponse.model_construct(**row._asdict())
+        body = partial.model_dump_json(include=set(fieldset)).encode("utf-8")
     
-    return db_session
+    terminal = status != SessionStatus.PROCESSING
+    if terminal:
+        entry = response_cache.put(key, body)
+    else:
+        entry = CachedBody(body, make_etag(body))
+    return conditional_response(request, entry, terminal=terminal)
 
 
 @router.get("", response_model=List[DebugSessionListResponse])
 async def list_debug_sessions(
-    skip: int = 0,
-    limit: int = 20,
-    db: Session = Depends(get_db)
+    response: Response,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    language: Optional[str] = None,
+    status: Optional[SessionStatus] = None,
+    skip: int = Query(0, ge=0, description="Deprecated offset pagination; use cursor"),
+    db: AsyncSession = Depends(get_db)
 ):
-    """List debug sessions with pagination."""
+    """List debug sessions, newest first, with cursor pagination.
+
+    Only the listing columns are loaded. When more rows exist, the cursor
+    for the next page is returned in the ``X-Next-Cursor`` header.
+    """
+    
+    query = select(
+        DebugSession.id,
+        DebugSession.created_at,
+        DebugSession.language,
+        # Rows written before error_snippet existed fall back to the raw text
+        func.coalesce(
+            DebugSession.error_snippet,
+            func.substr(DebugSession.error_text, 1, ERROR_SNIPPET_LENGTH),
+        ).label("error_snippet"),
+        DebugSession.status,
+    )
+    if language:
+        query = query.where(DebugSession.language == language)
+    if status:
+        query = query.where(DebugSession.status == status)
+    after = keyset_before(DebugSession.created_at, DebugSession.id, cursor)
+    if after is not None:
+        query = query.where(after)
+    elif skip:
+        query = query.offset(skip)
+    
+    rows = (await db.execute(
+        query.order_by(DebugSession.created_at.desc(), DebugSession.id.desc()).limit(limit + 1)
+    )).all()
     
-    sessions = db.query(DebugSession)\
-        .order_by(DebugSession.created_at.desc())\
-        .offset(skip)\
-        .limit(limit)\
-        .all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(rows[-1].created_at, rows[-1].id)
     
-    # Transform to list response
     return [
         DebugSessionListResponse(
-            id=session.id,
-            created_at=session.created_at,
-            language=session.language,
-            error_snippet=session.error_text.split('\n')[0][:100],
-            status=session.status
+            id=row.id,
+            created_at=row.created_at,
+            language=row.language,
+            error_snippet=make_error_snippet(row.error_snippet or ""),
+            status=row.status
         )
-        for session in sessions
+        for row in rows
     ]
@@ -0,0 +1,126 @@
+"""Streaming bulk export of debug sessions and runs.
+
+Rows are read through a server-side cursor (``yield_per``) and written to the
+response one batch at a time. Memory is bounded by ``EXPORT_BATCH_SIZE`` rows
+however large the export is, and the whole export is a single query instead
+of one per page.
+
+Formats:
+- ``ndjson``: one JSON object per row.
+- ``columnar``: one JSON object per batch, ``{"rows": n, "columns": {"id": [...], ...}}``,
+  which loads straight into a dataframe (``pd.DataFrame(chunk["columns"])``).
+"""
+import json
+from datetime import datetime
+from typing import AsyncIterator, Literal, Optional, Sequence
+
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+
+from app.config import settings
+from app.db.session import AsyncSessionLocal
+from app.models.debug_session import DebugSession, SessionStatus
+from app.models.run import Run
+from app.services.serialization import json_default
+
+router = APIRouter(prefix="/api/export", tags=["export"])
+
+ExportFormat = Literal["ndjson", "columnar"]
+
+
+def export_columns(model, fields: Optional[str]) -> list:
+    """Columns named in the comma-separated ``fields`` (all columns when empty); 400 on unknown names."""
+    columns = model.__table__.columns
+    if not fields:
+        return list(columns)
+    names = [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = [name for name in names if name not in columns]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown fields: {', '.join(unknown)}. Available: {', '.join(columns.keys())}",
+        )
+    return [columns[name] for name in dict.fromkeys(names)]
+
+
+def encode_batch(names: Sequence[str], rows: Sequence[Sequence], fmt: ExportFormat) -> bytes:
+    if fmt == "columnar":
+        chunk = {"rows": len(rows), "columns": {name: [row[i] for row in rows] for i, name in enumerate(names)}}
+        return (json.dumps(chunk, default=json_default) + "\n").encode("utf-8")
+    return "".join(
+        json.dumps(dict(zip(names, row)), default=json_default) + "\n" for row in rows
+    ).encode("utf-8")
+
+
+async def _stream_rows(model, columns: list, where: list, fmt: ExportFormat) -> AsyncIterator[bytes]:
+    names = [column.name for column in columns]
+    # Own session: it must stay open for as long as the response streams
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(
+            select(*columns)
+            .where(*where)
+            .order_by(model.created_at, model.id)
+            .execution_options(yield_per=settings.EXPORT_BATCH_SIZE)
+        )
+        async for rows in result.partitions():
+            yield encode_batch(names, rows, fmt)
+
+
+def _export(model, name: str, fields: Optional[str], where: list, fmt: ExportFormat) -> StreamingResponse:
+    columns = export_columns(model, fields)
+    suffix = "ndjson" if fmt == "ndjson" else f"{fmt}.ndjson"
+    return StreamingResponse(
+        _stream_rows(model, columns, where, fmt),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{name}-export.{suffix}"'},
+    )
+
+
+def _time_range(model, since: Optional[datetime], until: Optional[datetime]) -> list:
+    where = []
+    if since is not None:
+        where.append(model.created_at >= since)
+    if until is not None:
+        where.append(model.created_at < until)
+    return where
+
+
+@router.get("/sessions")
+async def export_sessions(
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    language: Optional[str] = None,
+    status: Optional[SessionStatus] = None,
+    fields: Optional[str] = None,
+    format: ExportFormat = "ndjson",
+):
+    """Stream debug sessions created in [since, until), oldest first."""
+    where = _time_range(DebugSession, since, until)
+    if language:
+        where.append(DebugSession.language == language)
+    if status:
+        where.append(DebugSession.status == status)
+    return _export(DebugSession, "sessions", fields, where, format)
+
+
+@router.get("/runs")
+async def export_runs(
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    language: Optional[str] = None,
+    status: Optional[str] = None,
+    fields: Optional[str] = None,
+    format: ExportFormat = "ndjson",
+):
+    """Stream runs created in [since, until), oldest first.
+
+    ``stdout``/``stderr`` hold the stored previews; full output is served by
+    ``GET /api/runs/{run_id}/output``.
+    """
+    where = _time_range(Run, since, until)
+    if language:
+        where.append(Run.language == language)
+    if status:
+        where.append(Run.status == status)
+    return _export(Run, "runs", fields, where, format)
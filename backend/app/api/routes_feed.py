@@ -0,0 +1,147 @@
+"""Membership-aware feeds of debug sessions and runs.
+
+A feed lists what a user can see: their own items plus everything shared
+with their teams, or a single team when ``team_id`` is given. Team ids come
+from the membership cache. An ``owner OR team IN (...)`` filter cannot walk
+an index in feed order, so each page is a UNION ALL of one small query per
+owner or team, each reading the first ``limit + 1`` rows from the
+``(user_id, created_at, id)`` or ``(team_id, created_at, id)`` index, and an
+outer sort of those few rows.
+"""
+from typing import List, Optional
+from uuid import UUID
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy import func, select, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.session import get_db
+from app.api.pagination import NEXT_CURSOR_HEADER, encode_cursor, keyset_before
+from app.models.debug_session import DebugSession, SessionStatus, make_error_snippet, ERROR_SNIPPET_LENGTH
+from app.models.run import Run
+from app.schemas.debug_session import DebugSessionListResponse
+from app.schemas.run import RunListResponse
+from app.services.membership_cache import membership_cache
+
+router = APIRouter(prefix="/api/feed", tags=["feed"])
+
+
+async def _scopes(db: AsyncSession, model, user_id: UUID, team_id: Optional[UUID]) -> list:
+    """One WHERE clause per owner or team whose rows of ``model`` ``user_id`` may see."""
+    team_ids = await membership_cache.team_ids(db, user_id)
+    if team_id is not None:
+        if team_id not in team_ids:
+            raise HTTPException(status_code=403, detail="User is not a member of this team")
+        return [model.team_id == team_id]
+    # The user's own rows come from the owner branch only, so none is listed twice
+    return [model.user_id == user_id] + [
+        (model.team_id == shared) & model.user_id.is_distinct_from(user_id) for shared in sorted(team_ids)
+    ]
+
+
+def _feed_page(model, columns, scopes: list, filters: list, cursor: Optional[str], limit: int):
+    """Newest ``limit + 1`` rows over all ``scopes``, each branch an index-ordered top-N."""
+    after = keyset_before(model.created_at, model.id, cursor)
+    if after is not None:
+        filters = [*filters, after]
+    branches = [
+        select(*columns).where(scope, *filters)
+        .order_by(model.created_at.desc(), model.id.desc()).limit(limit + 1)
+        for scope in scopes
+    ]
+    if len(branches) == 1:
+        return branches[0]
+    feed = union_all(*(select(branch.subquery()) for branch in branches)).subquery()
+    return select(feed).order_by(feed.c.created_at.desc(), feed.c.id.desc()).limit(limit + 1)
+
+
+@router.get("/sessions", response_model=List[DebugSessionListResponse])
+async def session_feed(
+    response: Response,
+    user_id: UUID,
+    team_id: Optional[UUID] = None,
+    language: Optional[str] = None,
+    status: Optional[SessionStatus] = None,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    """Sessions owned by the user or shared with their teams, newest first."""
+
+    columns = (
+        DebugSession.id,
+        DebugSession.created_at,
+        DebugSession.language,
+        func.coalesce(
+            DebugSession.error_snippet,
+            func.substr(DebugSession.error_text, 1, ERROR_SNIPPET_LENGTH),
+        ).label("error_snippet"),
+        DebugSession.status,
+        DebugSession.user_id,
+        DebugSession.team_id,
+    )
+    filters = []
+    if language:
+        filters.append(DebugSession.language == language)
+    if status:
+        filters.append(DebugSession.status == status)
+    scopes = await _scopes(db, DebugSession, user_id, team_id)
+
+    rows = (await db.execute(_feed_page(DebugSession, columns, scopes, filters, cursor, limit))).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(rows[-1].created_at, rows[-1].id)
+
+    return [
+        DebugSessionListResponse(
+            id=row.id,
+            created_at=row.created_at,
+            language=row.language,
+            error_snippet=make_error_snippet(row.error_snippet or ""),
+            status=row.status,
+            user_id=row.user_id,
+            team_id=row.team_id,
+        )
+        for row in rows
+    ]
+
+
+@router.get("/runs", response_model=List[RunListResponse])
+async def run_feed(
+    response: Response,
+    user_id: UUID,
+    team_id: Optional[UUID] = None,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    """Runs owned by the user or shared with their teams, newest first (without output)."""
+
+    columns = (
+        Run.id,
+        Run.created_at,
+        Run.language,
+        Run.status,
+        Run.exit_code,
+        Run.execution_time_ms,
+        Run.user_id,
+        Run.team_id,
+    )
+    scopes = await _scopes(db, Run, user_id, team_id)
+
+    rows = (await db.execute(_feed_page(Run, columns, scopes, [], cursor, limit))).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(rows[-1].created_at, rows[-1].id)
+
+    return [
+        RunListResponse(
+            run_id=str(row.id),
+            created_at=row.created_at,
+            language=row.language,
+            status=row.status,
+            exit_code=row.exit_code,
+            execution_time_ms=row.execution_time_ms,
+            user_id=row.user_id,
+            team_id=row.team_id,
+        )
+        for row in rows
+    ]
@@ -1,23 +1,34 @@
 """API routes for sandbox code execution."""
-from typing import Dict
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect, HTTPException, Depends
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, HTTPException, Depends, Request, Response
 from app.schemas.run import RunCreate, RunResponse
 from app.services.sandbox_runner import SandboxRunner
 from app.config import settings
 from datetime import datetime
 import asyncio
-from sqlalchemy.orm import Session
+from typing import Literal, Optional
+from uuid import UUID
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.db.session import get_db
+from app.api.ownership import check_team_access
+from app.api.http_cache import (
+    RangeNotSatisfiable,
+    conditional_response,
+    etag_matches,
+    parse_byte_range,
+    response_cache,
+)
 from app.models.run import Run as RunModel
+from app.services.circuit_breaker import CircuitOpenError
+from app.services.run_broker import get_run_broker, publish_finished_run
+from app.services.run_output import STREAMS, read_output_range
+from app.services.run_writer import run_writer
+from app.services import metrics, tracing
 
 router = APIRouter(prefix="/api/runs", tags=["sandbox-runs"])
 
-# In-memory run store (DB persistence can be added later)
-runs_store: Dict[str, RunResponse] = {}
-
 
 @router.post("", response_model=RunResponse, status_code=201)
-async def create_run(run_data: RunCreate, db: Session = Depends(get_db)):
+async def create_run(run_data: RunCreate, db: AsyncSession = Depends(get_db)):
     """
     Execute code in an isolated Docker sandbox.
     
@@ -27,18 +38,20 @@ async def create_run(run_data: RunCreate, db: Session = Depends(get_db)):
     - CPU and memory limits
     - Time-limited execution
     """
+    await check_team_access(db, run_data.user_id, run_data.team_id)
     try:
         # Initialize sandbox runner (connects to DinD or local Docker)
         docker_host = getattr(settings, 'DOCKER_HOST', None)
         runner = SandboxRunner(docker_host=docker_host)
         
-        # Execute code
-        result = await asyncio.to_thread(
-            runner.run_in_sandbox,
-            language=run_data.language,
-            code=run_data.code,
-            timeout_sec=run_data.timeout_sec
-        )
+        # Execute code (the worker thread inherits the span; Docker calls nest under it)
+        with tracing.span("sandbox.run", language=run_data.language):
+            result = await asyncio.to_thread(
+                runner.run_in_sandbox,
+                language=run_data.language,
+                code=run_data.code,
+                timeout_sec=run_data.timeout_sec
+            )
         
         # Create response
         run_response = RunResponse(
@@ -47,32 +60,45 @@ async def create_run(run_data: RunCreate, db: Session = Depends(get_db)):
             status=result.get("status", "completed"),
             stdout=result.get("stdout", ""),
             stderr=result.get("stderr", ""),
+            stdout_bytes=len((result.get("stdout") or "").encode("utf-8")),
+            stderr_bytes=len((result.get("stderr") or "").encode("utf-8")),
             exit_code=result.get("exit_code", 0),
             execution_time_ms=result.get("execution_time_ms"),
             image=result.get("image"),
             created_at=datetime.utcnow(),
-            completed_at=datetime.utcnow()
+            completed_at=datetime.utcnow(),
+            user_id=run_data.user_id,
+            team_id=run_data.team_id,
         )
         
-        # Store in memory (for WS demo) and persist in DB
-        runs_store[run_response.run_id] = run_response
-
-        db_run = RunModel(
-            id=run_response.run_id,
-            language=run_response.language,
-            status=run_response.status,
-            stdout=run_response.stdout,
-            stderr=run_response.stderr,
-            exit_code=run_response.exit_code,
-            image=run_response.image,
-            created_at=run_response.created_at,
-            completed_at=run_response.completed_at,
-        )
-        db.add(db_run)
-        db.commit()
+        # Publish to the run broker (visible to every worker's WS) and persist in DB
+        with tracing.span("runs.publish"):
+            await publish_finished_run(get_run_broker(), run_response)
+        response_cache.invalidate(("run", run_response.run_id))
+
+        # Group-committed with concurrent runs; returns once this run is stored.
+        # The writer stores previews inline and the full output as compressed chunks.
+        with tracing.span("runs.persist"):
+            await run_writer.persist({
+                "id": UUID(run_response.run_id),
+                "language": run_response.language,
+                "status": run_response.status,
+                "stdout": run_response.stdout,
+                "stderr": run_response.stderr,
+                "exit_code": run_response.exit_code,
+                "execution_time_ms": run_response.execution_time_ms,
+                "image": run_response.image,
+                "created_at": run_response.created_at,
+                "completed_at": run_response.completed_at,
+                "user_id": run_response.user_id,
+                "team_id": run_response.team_id,
+            })
         
         return run_response
         
+    except CircuitOpenError as e:
+        # Docker is down: fail fast instead of waiting for the daemon's timeout
+        raise HTTPException(status_code=503, detail=f"Sandbox unavailable: {e}", headers=e.headers())
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -81,70 +107,164 @@ async def create_run(run_data: RunCreate, db: Session = Depends(get_db)):
 
 
 @router.get("/{run_id}", response_model=RunResponse)
-async def get_run(run_id: str, db: Session = Depends(get_db)):
-    """Get the status and output of a specific run."""
-    # Prefer DB record; fallback to in-memory if present
-    db_run = db.query(RunModel).filter(RunModel.id == run_id).first()
+async def get_run(run_id: str, request: Request, db: AsyncSession = Depends(get_db)):
+    """Get the status and output of a specific run.
+
+    Large outputs are cut to a preview (``output_truncated``); the full
+    streams are served by ``GET /api/runs/{run_id}/output``. Runs are stored
+    once finished, so responses are cached and carry a strong ETag; a
+    matching ``If-None-Match`` gets a 304 without a database read.
+    """
+    key = ("run", run_id)
+    entry = response_cache.get(key)
+    if entry is not None:
+        return conditional_response(request, entry, terminal=True)
+
+    # Prefer DB record; fall back to the run broker
+    try:
+        db_run = await db.get(RunModel, UUID(run_id))
+    except ValueError:
+        db_run = None
     if db_run:
-        return RunResponse(
+        run = RunResponse(
             run_id=str(db_run.id),
             language=db_run.language,
             status=db_run.status,
             stdout=db_run.stdout or "",
             stderr=db_run.stderr or "",
+            stdout_bytes=db_run.stdout_bytes,
+            stderr_bytes=db_run.stderr_bytes,
+            output_truncated=any(_is_preview(db_run, stream) for stream in STREAMS),
             exit_code=db_run.exit_code or 0,
+            execution_time_ms=db_run.execution_time_ms,
             image=db_run.image,
             created_at=db_run.created_at,
             completed_at=db_run.completed_at,
+            user_id=db_run.user_id,
+            team_id=db_run.team_id,
         )
+    else:
+        run = await get_run_broker().get_run(run_id)
+    if run is None:
+        raise HTTPException(status_code=404, detail="Run not found")
+
+    entry = response_cache.put(key, run.model_dump_json().encode("utf-8"))
+    return conditional_response(request, entry, terminal=True)
+
+
+def _is_preview(db_run: RunModel, stream: str) -> bool:
+    size = getattr(db_run, f"{stream}_bytes")
+    return size is not None and len((getattr(db_run, stream) or "").encode("utf-8")) < size
 
-    run = runs_store.get(run_id)
-    if run:
-        return run
 
-    raise HTTPException(status_code=404, detail="Run not found")
+@router.get("/{run_id}/output")
+async def get_run_output(
+    run_id: str,
+    request: Request,
+    stream: Literal["stdout", "stderr"] = "stdout",
+    db: AsyncSession = Depends(get_db),
+):
+    """Full stdout or stderr of a run as UTF-8 text, with byte ``Range`` support.
+
+    ``Range: bytes=0-65535`` pages forward, ``bytes=-65536`` reads the tail.
+    Only the compressed chunks overlapping the range are read.
+    """
+    try:
+        db_run = await db.get(RunModel, UUID(run_id))
+    except ValueError:
+        db_run = None
+    inline: Optional[bytes] = None
+    if db_run is not None:
+        size = getattr(db_run, f"{stream}_bytes")
+        if size is None:
+            # Stored before chunking: the column holds the whole stream
+            inline = (getattr(db_run, stream) or "").encode("utf-8")
+    else:
+        run = await get_run_broker().get_run(run_id)
+        if run is None:
+            raise HTTPException(status_code=404, detail="Run not found")
+        inline = (getattr(run, stream) or "").encode("utf-8")
+    if inline is not None:
+        size = len(inline)
+
+    headers = {
+        "Accept-Ranges": "bytes",
+        "ETag": f'"{run_id}-{stream}-{size}"',
+        "Cache-Control": f"private, max-age={settings.RESPONSE_CACHE_MAX_AGE_SEC}",
+    }
+    if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    try:
+        byte_range = parse_byte_range(request.headers.get("range"), size)
+    except RangeNotSatisfiable:
+        return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+
+    start, end = byte_range if byte_range else (0, size - 1)
+    if size == 0:
+        body = b""
+    elif inline is not None:
+        body = inline[start:end + 1]
+    else:
+        body = await read_output_range(db, db_run.id, stream, start, end)
+    if byte_range:
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    return Response(
+        content=body,
+        status_code=206 if byte_range else 200,
+        media_type="text/plain",
+        headers=headers,
+    )
 
 
 @router.websocket("/ws/{run_id}/logs")
 async def stream_run_logs(websocket: WebSocket, run_id: str):
     """
-    Stream live logs from a running sandbox container.
+    Stream logs of a run, line by line, ending with a ``complete`` message.
     
-    Note: For async execution, this would attach to a running container.
-    Current implementation returns stored logs for completed runs.
+    Retained output is replayed first, then live output is forwarded from the
+    run broker until the run completes. With a shared broker this works no
+    matter which worker executed the run.
     """
     await websocket.accept()
+    broker = get_run_broker()
+    metrics.websocket_connections_opened.inc()
+    metrics.websocket_connections.inc()
     
     try:
-        run = runs_store.get(run_id)
-        
-        if not run:
-            await websocket.send_json({"error": "Run not found"})
-            await websocket.close()
-            return
-        
-        # Send stored logs
-        if run.stdout:
-            for line in run.stdout.split('\n'):
-                await websocket.send_json({
-                    "type": "stdout",
-                    "data": line
-                })
-                await asyncio.sleep(0.01)  # Simulate streaming
-        
-        if run.stderr:
-            for line in run.stderr.split('\n'):
-                await websocket.send_json({
-                    "type": "stderr",
-                    "data": line
-                })
-                await asyncio.sleep(0.01)
-        
-        await websocket.send_json({"type": "complete", "status": run.status})
+        # Subscribe before reading history so nothing published in between is lost
+        async with broker.subscribe(run_id) as live:
+            backlog = await broker.history(run_id)
+            if not backlog and await broker.get_run(run_id) is None:
+                await websocket.send_json({"error": "Run not found"})
+                return
+            
+            last_seq = 0
+            for event in backlog:
+                last_seq = event["seq"]
+                if await _send_log_event(websocket, event):
+                    return
+            
+            async for event in live:
+                if event["seq"] <= last_seq:
+                    continue
+                last_seq = event["seq"]
+                if await _send_log_event(websocket, event):
+                    return
         
     except WebSocketDisconnect:
         pass
     except Exception as e:
         await websocket.send_json({"error": str(e)})
     finally:
+        metrics.websocket_connections.dec()
         await websocket.close()
+
+
+async def _send_log_event(websocket: WebSocket, event: dict) -> bool:
+    """Forward one broker event; returns True once the run is complete."""
+    if event["type"] == "complete":
+        await websocket.send_json({"type": "complete", "status": event["status"]})
+        return True
+    for line in event["data"].split("\n"):
+        await websocket.send_json({"type": event["type"], "data": line})
+    return False
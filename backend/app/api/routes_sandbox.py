@@ -1,11 +1,13 @@
 from fastapi import APIRouter
-from typing import List, Optional, Dict, Any
+from typing import TYPE_CHECKING, List, Optional, Dict, Any
 from app.config import settings
 import io
 import tarfile
-import docker
 import asyncio
 
+if TYPE_CHECKING:
+    import docker
+
 
 router = APIRouter(prefix="/api/sandbox", tags=["sandbox"])
 
@@ -55,13 +57,15 @@ IMAGES = {
 
 
 def _docker_client():
-    # Connect to DinD or local Docker depending on settings
+    # Connect to DinD or local Docker depending on settings (SDK loaded on first use)
+    import docker
+
     if settings.DOCKER_HOST:
         return docker.DockerClient(base_url=settings.DOCKER_HOST)
     return docker.from_env()
 
 
-def _build_image_from_dockerfile(client: docker.DockerClient, dockerfile_text: str, tag: str) -> List[str]:
+def _build_image_from_dockerfile(client: "docker.DockerClient", dockerfile_text: str, tag: str) -> List[str]:
     # Create an in-memory tar context with a single Dockerfile
     buf = io.BytesIO()
     with tarfile.open(fileobj=buf, mode="w") as tar:
@@ -0,0 +1,42 @@
+"""Operational statistics answered from pre-aggregated rollups."""
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Literal, Optional
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.session import get_db
+from app.services.stats_rollups import query_stats
+
+router = APIRouter(prefix="/api/stats", tags=["stats"])
+
+# Bound the number of buckets a single request can touch
+MAX_RANGE = {"hour": timedelta(days=14), "day": timedelta(days=400)}
+DEFAULT_RANGE = {"hour": timedelta(hours=24), "day": timedelta(days=30)}
+
+
+def _naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Rollup buckets are naive UTC; convert timestamps that carry an offset (e.g. ``Z``)."""
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+@router.get("", response_model=Dict[str, Any])
+async def get_stats(
+    granularity: Literal["hour", "day"] = "hour",
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    language: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Runs per language, runtime p95, timeout/error rates, session outcomes
+    and top error types over time (UTC buckets).
+    """
+    until = _naive_utc(until) or datetime.utcnow()
+    since = _naive_utc(since) or until - DEFAULT_RANGE[granularity]
+    if since >= until:
+        raise HTTPException(status_code=400, detail="since must be before until")
+    if until - since > MAX_RANGE[granularity]:
+        raise HTTPException(status_code=400, detail=f"Range too large for granularity={granularity}")
+
+    return await query_stats(db, granularity, since, until, language=language)
@@ -1,12 +1,16 @@
 """Basic team collaboration endpoints."""
-from fastapi import APIRouter, HTTPException, Depends
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, HTTPException, Depends, Query, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.db.session import get_db
+from app.api.pagination import NEXT_CURSOR_HEADER, encode_cursor, keyset_before
 from app.models.team import Team, Membership, TeamRole
 from app.models.user import User
+from app.services.membership_cache import membership_cache
 from pydantic import BaseModel, Field
 from typing import Optional, List
 import re
+from uuid import UUID
 
 router = APIRouter(prefix="/api/teams", tags=["teams"]) 
 
@@ -18,64 +22,80 @@ def slugify(name: str) -> str:
 
 class TeamCreate(BaseModel):
     name: str = Field(..., min_length=2, max_length=200)
-    owner_user_id: Optional[str] = None
+    owner_user_id: Optional[UUID] = None
 
 
 class AddMember(BaseModel):
-    user_id: str
+    user_id: UUID
     role: TeamRole = TeamRole.member
 
 
 @router.post("", response_model=dict)
-def create_team(payload: TeamCreate, db: Session = Depends(get_db)):
+async def create_team(payload: TeamCreate, db: AsyncSession = Depends(get_db)):
     slug = slugify(payload.name)
-    existing = db.query(Team).filter(Team.slug == slug).first()
+    existing = (await db.execute(select(Team).where(Team.slug == slug))).scalars().first()
     if existing:
         raise HTTPException(status_code=400, detail="Team with this name already exists")
     team = Team(name=payload.name, slug=slug)
     db.add(team)
-    db.commit()
-    db.refresh(team)
+    await db.commit()
+    await db.refresh(team)
 
     if payload.owner_user_id:
         db.add(Membership(user_id=payload.owner_user_id, team_id=team.id, role=TeamRole.owner))
-        db.commit()
+        await db.commit()
+        membership_cache.invalidate(payload.owner_user_id)
 
     return {"id": str(team.id), "name": team.name, "slug": team.slug}
 
 
 @router.get("", response_model=List[dict])
-def list_teams(user_id: Optional[str] = None, db: Session = Depends(get_db)):
+async def list_teams(
+    response: Response,
+    user_id: Optional[UUID] = None,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    """List teams (optionally only a user's), newest first; next page cursor in ``X-Next-Cursor``."""
     if user_id:
-        rows = (
-            db.query(Team)
+        query = (
+            select(Team)
             .join(Membership, Membership.team_id == Team.id)
-            .filter(Membership.user_id == user_id)
-            .all()
+            .where(Membership.user_id == user_id)
         )
     else:
-        rows = db.query(Team).all()
+        query = select(Team)
+    after = keyset_before(Team.created_at, Team.id, cursor)
+    if after is not None:
+        query = query.where(after)
+    rows = (await db.execute(
+        query.order_by(Team.created_at.desc(), Team.id.desc()).limit(limit + 1)
+    )).scalars().all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(rows[-1].created_at, rows[-1].id)
     return [{"id": str(t.id), "name": t.name, "slug": t.slug} for t in rows]
 
 
 @router.post("/{team_id}/members", response_model=dict)
-def add_member(team_id: str, payload: AddMember, db: Session = Depends(get_db)):
-    team = db.query(Team).filter(Team.id == team_id).first()
+async def add_member(team_id: UUID, payload: AddMember, db: AsyncSession = Depends(get_db)):
+    team = (await db.execute(select(Team).where(Team.id == team_id))).scalars().first()
     if not team:
         raise HTTPException(status_code=404, detail="Team not found")
-    user = db.query(User).filter(User.id == payload.user_id).first()
+    user = (await db.execute(select(User).where(User.id == payload.user_id))).scalars().first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
-    existing = (
-        db.query(Membership)
-        .filter(Membership.team_id == team_id, Membership.user_id == payload.user_id)
-        .first()
-    )
+    existing = (await db.execute(
+        select(Membership)
+        .where(Membership.team_id == team_id, Membership.user_id == payload.user_id)
+    )).scalars().first()
     if existing:
         raise HTTPException(status_code=400, detail="User already a member")
 
     m = Membership(team_id=team_id, user_id=payload.user_id, role=payload.role)
     db.add(m)
-    db.commit()
-    return {"team_id": team_id, "user_id": payload.user_id, "role": m.role}
+    await db.commit()
+    membership_cache.invalidate(payload.user_id)
+    return {"team_id": str(team_id), "user_id": str(payload.user_id), "role": m.role}
@@ -2,7 +2,7 @@ import json
 from pydantic import field_validator
 """Application configuration."""
 from pydantic_settings import BaseSettings
-from typing import List, Union, Optional
+from typing import Dict, List, Union, Optional
 
 
 class Settings(BaseSettings):
@@ -15,6 +15,22 @@ class Settings(BaseSettings):
     LLM_PROVIDER: str = "openai"  # openai or anthropic
     LLM_API_KEY: str = ""  # provide via .env
     LLM_MODEL: str = "gpt-4-turbo-preview"
+    # Failover/hedging backends tried after the primary, as "provider:model"
+    # entries (e.g. "anthropic:claude-3-haiku-20240307"). Keys come from the
+    # provider-specific setting below, or LLM_API_KEY for the primary provider.
+    LLM_FALLBACK_PROVIDERS: Union[List[str], str] = []
+    OPENAI_API_KEY: str = ""
+    ANTHROPIC_API_KEY: str = ""
+    LLM_HEDGE_ENABLED: bool = True
+    LLM_HEDGE_DELAY_SEC: float = 10.0  # used until enough latency samples exist for a p95
+
+    # Record/replay of LLM completions for load tests (app.services.llm_cassette)
+    LLM_CASSETTE_MODE: str = "off"  # off, record or replay
+    LLM_CASSETTE_PATH: str = "llm_cassette.ndjson"
+    LLM_REPLAY_LATENCY_SCALE: float = 1.0  # 0.5 replays twice as fast
+    LLM_REPLAY_ERROR_RATE: float = 0.0  # fraction of replayed calls that fail
+    LLM_REPLAY_ERROR_STATUS: int = 503  # 429 also sends Retry-After
+    LLM_REPLAY_SEED: Optional[int] = None  # fixes which replayed calls fail; unset draws a new sequence per run
     
     # OAuth - GitHub
     GITHUB_CLIENT_ID: str = ""  # provide via .env
@@ -58,9 +74,137 @@ class Settings(BaseSettings):
             parts = [p.strip() for p in s.split(",") if p.strip()]
             return parts if parts else ["*"]
         return ["*"]
+
+    @field_validator("LLM_FALLBACK_PROVIDERS", mode="before")
+    @classmethod
+    def parse_fallback_providers(cls, v):
+        if not v:
+            return []
+        if isinstance(v, list):
+            return v
+        s = str(v).strip()
+        try:
+            loaded = json.loads(s)
+            if isinstance(loaded, list):
+                return loaded
+        except Exception:
+            pass
+        return [p.strip() for p in s.split(",") if p.strip()]
+
+    @field_validator("RATE_LIMIT_ROUTE_COSTS", mode="before")
+    @classmethod
+    def parse_route_costs(cls, v):
+        if not v:
+            return {}
+        if isinstance(v, dict):
+            return v
+        s = str(v).strip()
+        try:
+            loaded = json.loads(s)
+            if isinstance(loaded, dict):
+                return loaded
+        except Exception:
+            pass
+        costs = {}
+        for item in s.split(","):
+            rule, _, cost = item.rpartition("=")
+            if rule.strip():
+                costs[rule.strip()] = int(cost)
+        return costs
+
+    def provider_api_key(self, provider: str) -> str:
+        """API key for ``provider``, falling back to LLM_API_KEY for the primary."""
+        specific = {"openai": self.OPENAI_API_KEY, "anthropic": self.ANTHROPIC_API_KEY}.get(provider.lower(), "")
+        if specific:
+            return specific
+        return self.LLM_API_KEY if provider.lower() == self.LLM_PROVIDER.lower() else ""
     
-    # Optional: Rate limiting
+    # Optional: Rate limiting (LLM provider calls, per provider and worker)
     MAX_REQUESTS_PER_MINUTE: int = 10
+    MAX_TOKENS_PER_MINUTE: int = 90000  # 0 disables the token budget
+    MAX_CONCURRENT_LLM_REQUESTS: int = 4  # 0 disables the concurrency cap
+    LLM_MAX_RETRIES: int = 3  # retries on provider 429, honoring Retry-After
+
+    # Prompt compaction: token budgets for the error text and code snippet
+    PROMPT_ERROR_TOKEN_BUDGET: int = 3000
+    PROMPT_CODE_TOKEN_BUDGET: int = 2000
+    PROMPT_MAX_LIBRARY_FRAMES: int = 10
+
+    # Generate-verify loop for sessions created with verify_repro=true
+    REPRO_VERIFY_CANDIDATES: int = 3
+    REPRO_VERIFY_TIME_BUDGET_SEC: float = 60.0
+    REPRO_VERIFY_MAX_ROUNDS: int = 3
+
+    # Coalesce identical in-flight generations across workers (Postgres only)
+    LLM_COALESCE_ACROSS_WORKERS: bool = False
+    LLM_COALESCE_TTL_SEC: int = 60
+
+    # Read-through cache for completed sessions/runs (served with strong ETags)
+    RESPONSE_CACHE_SIZE: int = 2048  # entries per worker; 0 disables the cache
+    RESPONSE_CACHE_MAX_AGE_SEC: int = 3600
+
+    # Run state/log broker; set to redis://... to share runs across workers
+    RUN_BROKER_URL: Optional[str] = None
+    RUN_STATE_TTL_SEC: int = 3600
+    RUN_STATE_MAX_RUNS: int = 1000  # in-process broker only
+    RUN_LOG_MAX_EVENTS: int = 5000  # per run
+
+    # Group commit of finished runs: flush after this many rows or milliseconds
+    RUN_WRITER_MAX_BATCH: int = 200
+    RUN_WRITER_MAX_DELAY_MS: float = 5.0
+
+    # Run output is stored as compressed chunks; GET /api/runs/{id} inlines a preview
+    RUN_OUTPUT_CODEC: str = "zlib"  # or "zstd" (needs the zstandard package)
+    RUN_OUTPUT_PREVIEW_CHARS: int = 4096
+
+    # Request rate limiting: cost-weighted token buckets per client IP. Clients behind one NAT
+    # share a bucket; at 120 units/min that is 6 session creations (cost 20) per minute.
+    RATE_LIMIT_ENABLED: bool = False
+    RATE_LIMIT_PER_MINUTE: int = 120  # cost units per client IP; also the burst size
+    RATE_LIMIT_ROUTE_COSTS: Union[Dict[str, int], str] = {}  # e.g. "POST /api/runs=10,GET /api/stats=5"
+    RATE_LIMIT_BACKEND_URL: Optional[str] = None  # redis://... to share limits across workers
+    RATE_LIMIT_TRUST_FORWARDED_FOR: bool = False  # only behind a proxy that sets X-Forwarded-For
+
+    # gzip/brotli response compression, negotiated from Accept-Encoding
+    COMPRESSION_ENABLED: bool = True
+    COMPRESSION_MIN_SIZE: int = 1024  # bytes; smaller bodies are sent uncompressed
+
+    # Tracing (app.services.tracing): spans exported to a file or an OTLP/HTTP collector
+    TRACING_EXPORTER: str = "none"  # none, file or otlp
+    TRACING_FILE_PATH: str = "traces.ndjson"
+    TRACING_OTLP_ENDPOINT: str = "http://localhost:4318/v1/traces"
+    TRACING_SERVICE_NAME: str = "bug-ghost-api"
+    TRACING_SAMPLE_RATE: float = 1.0  # fraction of traces recorded
+
+    # Prometheus metrics at GET /metrics (per worker), with per-route request metrics
+    METRICS_ENABLED: bool = True
+
+    # Circuit breakers around Docker and each LLM provider: open after this many consecutive
+    # outages (connection errors, timeouts, 408/429/5xx), then probe again after the recovery time
+    CIRCUIT_BREAKER_ENABLED: bool = True
+    CIRCUIT_BREAKER_FAILURE_THRESHOLD: int = 5
+    CIRCUIT_BREAKER_RECOVERY_SEC: float = 30.0
+
+    # Admin endpoints (/api/admin) and forced profiling require X-Admin-Token: <ADMIN_TOKEN>;
+    # empty disables them
+    ADMIN_TOKEN: str = ""
+
+    # Request profiling (X-Profile: 1 with the admin token, or a random sample of requests)
+    PROFILING_SAMPLE_RATE: float = 0.0  # e.g. 0.001 profiles one request in a thousand
+    PROFILING_INTERVAL_MS: float = 5.0
+    PROFILING_MAX_PROFILES: int = 20  # slowest profiles kept per worker
+
+    # Rows fetched per server-side cursor batch by /api/export
+    EXPORT_BATCH_SIZE: int = 1000
+
+    # How long a worker may serve a user's team memberships from cache
+    MEMBERSHIP_CACHE_TTL_SEC: int = 60
+
+    # Retention (python -m app.services.retention): older rows are archived, then removed
+    RUN_RETENTION_DAYS: int = 0  # 0 keeps runs forever
+    SESSION_RETENTION_DAYS: int = 0  # 0 keeps debug sessions forever
+    RETENTION_BATCH_SIZE: int = 5000  # rows per archive entry
+    PARTITION_MONTHS_AHEAD: int = 3  # monthly partitions created in advance (Postgres)
     
     # Sandbox (Docker-in-Docker)
     DOCKER_HOST: Optional[str] = None  # e.g., tcp://dind:2375
@@ -1,25 +1,44 @@
 """Database session management."""
-from sqlalchemy import create_engine
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import declarative_base
 from app.config import settings
 
-engine = create_engine(
-    settings.DATABASE_URL,
-    pool_pre_ping=True,
-    pool_size=10,
-    max_overflow=20
+# Async drivers for each backend; psycopg 3 handles both sync and async
+_ASYNC_DRIVERS = {
+    "postgresql": "postgresql+psycopg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def async_database_url(url: str) -> str:
+    """Map a sync DATABASE_URL onto the matching async driver."""
+    parsed = make_url(url)
+    driver = _ASYNC_DRIVERS.get(parsed.get_backend_name())
+    if driver is None or parsed.drivername in ("postgresql+psycopg", "postgresql+asyncpg", "sqlite+aiosqlite"):
+        return url
+    return parsed.set(drivername=driver).render_as_string(hide_password=False)
+
+
+def _pool_options(url: str) -> dict:
+    if make_url(url).get_backend_name() == "sqlite":
+        return {}
+    return {"pool_pre_ping": True, "pool_size": 10, "max_overflow": 20}
+
+
+# Creating the engine does not connect; the schema is managed by Alembic (see alembic/)
+async_engine = create_async_engine(
+    async_database_url(settings.DATABASE_URL),
+    **_pool_options(settings.DATABASE_URL),
 )
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# expire_on_commit=False so ORM objects stay readable after commit without a reload
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
 
 Base = declarative_base()
 
 
-def get_db():
-    """Dependency for getting database sessions."""
-    db = SessionLocal()
-    try:
+async def get_db():
+    """Dependency for getting async database sessions."""
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
@@ -1,24 +1,45 @@
 """Main FastAPI application."""
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from app.config import settings
 from app.api.routes_debug import router as debug_router
 from app.api.routes_runs import router as runs_router
-from app.db.session import engine, Base
-# Ensure models are imported before create_all
-from app.models import run as _run_model  # noqa: F401
-from app.models import user as _user_model  # noqa: F401
-from app.models import team as _team_model  # noqa: F401
+from app.api.compression import CompressionMiddleware
+from app.api.metrics import MetricsMiddleware, router as metrics_router
+from app.api.profiling import PROFILE_ID_HEADER, ProfilingMiddleware
+from app.api.rate_limit import RATE_LIMIT_HEADERS, RateLimitMiddleware
+from app.services import tracing
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
+# No I/O at import time: the schema is created by `alembic upgrade head`,
+# and provider/sandbox SDKs are imported on first use.
 
 app = FastAPI(
     title="Bug Ghost AI",
     description="AI Debug Replayer - Transform errors into reproducible bug scenarios",
-    version="0.1.0"
+    version="0.1.0",
+    default_response_class=ORJSONResponse,
 )
 
+# Compression is innermost: rate-limit and CORS headers are added to the encoded response
+if settings.COMPRESSION_ENABLED:
+    app.add_middleware(CompressionMiddleware)
+
+# Profiles include compression but not requests rejected by the rate limiter
+if settings.ADMIN_TOKEN or settings.PROFILING_SAMPLE_RATE > 0:
+    app.add_middleware(ProfilingMiddleware)
+
+# Rate limiting sits inside CORS so 429 responses still carry CORS headers
+if settings.RATE_LIMIT_ENABLED:
+    app.add_middleware(RateLimitMiddleware)
+
+# Outside the rate limiter so rejected requests are counted too
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
+# Root span per request, around everything but CORS; a no-op unless TRACING_EXPORTER is set
+app.add_middleware(tracing.TracingMiddleware)
+
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
@@ -26,18 +47,57 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag", "Content-Range", "Accept-Ranges", PROFILE_ID_HEADER, *RATE_LIMIT_HEADERS],
 )
 
 # Include routers
 from app.api.routes_auth import router as auth_router
 from app.api.routes_teams import router as teams_router
 from app.api.routes_sandbox import router as sandbox_router
+from app.api.routes_stats import router as stats_router
+from app.api.routes_feed import router as feed_router
+from app.api.routes_export import router as export_router
+from app.api.routes_admin import router as admin_router
 
 app.include_router(debug_router)
 app.include_router(runs_router)
 app.include_router(auth_router)
 app.include_router(teams_router)
 app.include_router(sandbox_router)
+app.include_router(stats_router)
+app.include_router(feed_router)
+app.include_router(export_router)
+app.include_router(admin_router)
+if settings.METRICS_ENABLED:
+    app.include_router(metrics_router)
+
+
+@app.on_event("startup")
+async def start_tracing():
+    """Install the configured span exporter and trace SQL statements."""
+    if tracing.configure().enabled:
+        from app.db.session import async_engine
+
+        tracing.instrument_engine(async_engine.sync_engine)
+
+
+@app.on_event("startup")
+async def start_pool_metrics():
+    """Time database pool checkouts for /metrics."""
+    if settings.METRICS_ENABLED:
+        from app.db.session import async_engine
+        from app.services import metrics
+
+        metrics.instrument_pool(async_engine.sync_engine)
+
+
+@app.on_event("shutdown")
+async def flush_run_writer():
+    """Write runs still waiting for a group commit before the worker exits."""
+    from app.services.run_writer import run_writer
+
+    await run_writer.close()
+    tracing.tracer.shutdown()
 
 
 @app.get("/")
@@ -52,5 +112,9 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    """Health check endpoint."""
-    return {"status": "healthy"}
+    """Health check endpoint; ``degraded`` while a circuit breaker is not closed."""
+    from app.services import circuit_breaker
+
+    breakers = circuit_breaker.snapshot()
+    degraded = any(breaker["state"] != circuit_breaker.CLOSED for breaker in breakers.values())
+    return {"status": "degraded" if degraded else "healthy", "circuit_breakers": breakers}
@@ -1,4 +1,23 @@
 """Database models."""
+from app.models.archive import RetentionArchive
 from app.models.debug_session import DebugSession
+from app.models.generation_result import GenerationLease, GenerationResult
+from app.models.run import Run, RunOutputChunk
+from app.models.stats import ErrorTypeRollup, RuntimeHistogram, StatsRollup
+from app.models.team import Membership, Team
+from app.models.user import User
 
-__all__ = ["DebugSession"]
+__all__ = [
+    "DebugSession",
+    "ErrorTypeRollup",
+    "GenerationLease",
+    "GenerationResult",
+    "Membership",
+    "RetentionArchive",
+    "Run",
+    "RunOutputChunk",
+    "RuntimeHistogram",
+    "StatsRollup",
+    "Team",
+    "User",
+]
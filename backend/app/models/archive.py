@@ -0,0 +1,30 @@
+"""Compressed archive of rows removed by the retention job."""
+import uuid
+from datetime import datetime
+from sqlalchemy import Column, String, DateTime, Integer, LargeBinary, Index
+from sqlalchemy.dialects.postgresql import UUID
+from app.db.session import Base
+
+
+class RetentionArchive(Base):
+    """A batch of expired rows from one table and month, as gzip-compressed NDJSON.
+
+    ``zcat`` of ``data`` gives one JSON object per row (UUIDs and datetimes as
+    strings, binary columns base64-encoded), ready to re-import or export.
+    """
+
+    __tablename__ = "retention_archive"
+    __table_args__ = (
+        Index("ix_retention_archive_table_name_period_start", "table_name", "period_start"),
+    )
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    table_name = Column(String(64), nullable=False)
+    period_start = Column(DateTime, nullable=False)  # first day of the month the rows were created in
+    row_count = Column(Integer, nullable=False)
+    codec = Column(String(8), nullable=False)  # gzip
+    data = Column(LargeBinary, nullable=False)
+
+    def __repr__(self) -> str:
+        return f"<RetentionArchive(table={self.table_name}, period={self.period_start:%Y-%m}, rows={self.row_count})>"
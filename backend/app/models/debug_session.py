@@ -1,7 +1,7 @@
 """DebugSession database model."""
 import uuid
 from datetime import datetime
-from sqlalchemy import Column, String, Text, DateTime, Enum
+from sqlalchemy import Column, String, Text, DateTime, Enum, Integer, Boolean, Index, ForeignKey
 from sqlalchemy.dialects.postgresql import UUID
 import enum
 from app.db.session import Base
@@ -14,19 +14,43 @@ class SessionStatus(str, enum.Enum):
     FAILED = "failed"
 
 
+ERROR_SNIPPET_LENGTH = 100
+
+
+def make_error_snippet(error_text: str) -> str:
+    """First line of the error, as shown in session listings."""
+    return error_text.split("\n")[0][:ERROR_SNIPPET_LENGTH]
+
+
 class DebugSession(Base):
     """Debug session model."""
     
     __tablename__ = "debug_sessions"
+    # On Postgres the table is partitioned by month of created_at (migration 0004)
+    # and its primary key there is (id, created_at); ids stay unique.
+    __table_args__ = (
+        # Keyset pagination: ORDER BY created_at DESC, id DESC (optionally filtered)
+        Index("ix_debug_sessions_created_at_id", "created_at", "id"),
+        Index("ix_debug_sessions_language_created_at_id", "language", "created_at", "id"),
+        Index("ix_debug_sessions_status_created_at_id", "status", "created_at", "id"),
+        # Team and owner feeds
+        Index("ix_debug_sessions_team_id_created_at_id", "team_id", "created_at", "id"),
+        Index("ix_debug_sessions_user_id_created_at_id", "user_id", "created_at", "id"),
+    )
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
     
+    # Ownership (optional; anonymous sessions have neither)
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
+    team_id = Column(UUID(as_uuid=True), ForeignKey("teams.id", ondelete="SET NULL"), nullable=True)
+    
     # Input data
     language = Column(String(50), nullable=False)
     runtime_info = Column(String(200), nullable=True)
     error_text = Column(Text, nullable=False)
+    error_snippet = Column(String(ERROR_SNIPPET_LENGTH), nullable=True)  # Denormalized for listings
     code_snippet = Column(Text, nullable=True)
     context_description = Column(Text, nullable=True)
     
@@ -42,6 +66,13 @@ class DebugSession(Base):
     # Metadata
     llm_model = Column(String(100), nullable=True)
     error_message = Column(Text, nullable=True)  # For internal failures
+    prompt_tokens_before = Column(Integer, nullable=True)  # Before compaction
+    prompt_tokens_after = Column(Integer, nullable=True)  # As sent to the LLM
+
+    # Sandbox verification (only when requested)
+    repro_verified = Column(Boolean, nullable=True)
+    verification_attempts = Column(Integer, nullable=True)
+    time_to_verified_ms = Column(Integer, nullable=True)
     
     def __repr__(self):
         return f"<DebugSession(id={self.id}, language={self.language}, status={self.status})>"
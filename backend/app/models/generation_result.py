@@ -0,0 +1,30 @@
+"""Short-lived LLM generation results shared across workers."""
+from datetime import datetime
+from sqlalchemy import Column, String, Text, DateTime
+from app.db.session import Base
+
+
+class GenerationResult(Base):
+    """Result of a coalesced generation, keyed by normalized prompt hash."""
+
+    __tablename__ = "generation_results"
+
+    prompt_hash = Column(String(64), primary_key=True)
+    result = Column(Text, nullable=False)  # JSON-encoded ReproductionResult
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+    def __repr__(self) -> str:
+        return f"<GenerationResult(prompt_hash={self.prompt_hash})>"
+
+
+class GenerationLease(Base):
+    """Claim on a prompt hash by the worker currently generating it."""
+
+    __tablename__ = "generation_leases"
+
+    prompt_hash = Column(String(64), primary_key=True)
+    owner = Column(String(32), nullable=False)  # random per generation attempt
+    expires_at = Column(DateTime, nullable=False)
+
+    def __repr__(self) -> str:
+        return f"<GenerationLease(prompt_hash={self.prompt_hash}, owner={self.owner})>"
@@ -1,7 +1,7 @@
 """Run history database model."""
 import uuid
 from datetime import datetime
-from sqlalchemy import Column, String, Text, DateTime, Integer, Index
+from sqlalchemy import Column, String, Text, DateTime, Integer, Index, ForeignKey, LargeBinary
 from sqlalchemy.dialects.postgresql import UUID
 from app.db.session import Base
 
@@ -10,21 +10,47 @@ class Run(Base):
     """Represents a sandbox code execution run."""
 
     __tablename__ = "runs"
+    # On Postgres the table is partitioned by month of created_at (migration 0004)
+    # and its primary key there is (id, created_at); ids stay unique.
     __table_args__ = (
         Index("ix_runs_status", "status"),
         Index("ix_runs_created_at", "created_at"),
+        Index("ix_runs_team_id_created_at_id", "team_id", "created_at", "id"),
+        Index("ix_runs_user_id_created_at_id", "user_id", "created_at", "id"),
     )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     completed_at = Column(DateTime, nullable=True)
 
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
+    team_id = Column(UUID(as_uuid=True), ForeignKey("teams.id", ondelete="SET NULL"), nullable=True)
+
     language = Column(String(50), nullable=False)
     status = Column(String(32), nullable=False)
+    # Inline previews; the full output is in run_output_chunks. When the
+    # *_bytes sizes are NULL (runs stored before chunking), these hold everything.
     stdout = Column(Text, nullable=True)
     stderr = Column(Text, nullable=True)
+    stdout_bytes = Column(Integer, nullable=True)
+    stderr_bytes = Column(Integer, nullable=True)
     exit_code = Column(Integer, nullable=True)
+    execution_time_ms = Column(Integer, nullable=True)
     image = Column(String(200), nullable=True)
 
     def __repr__(self) -> str:
         return f"<Run(id={self.id}, language={self.language}, status={self.status})>"
+
+
+class RunOutputChunk(Base):
+    """A compressed, fixed-size slice of a run's stdout or stderr (UTF-8 bytes)."""
+
+    __tablename__ = "run_output_chunks"
+
+    # No database-level foreign key on Postgres, where runs is partitioned; the
+    # retention job removes chunks together with their runs
+    run_id = Column(UUID(as_uuid=True), ForeignKey("runs.id", ondelete="CASCADE"), primary_key=True)
+    stream = Column(String(8), primary_key=True)  # stdout | stderr
+    chunk_index = Column(Integer, primary_key=True)
+    codec = Column(String(8), nullable=False)  # zlib | zstd
+    data = Column(LargeBinary, nullable=False)
@@ -0,0 +1,54 @@
+"""Pre-aggregated hourly/daily rollups for run and session statistics."""
+from sqlalchemy import Column, String, DateTime, Integer, BigInteger
+from app.db.session import Base
+
+# Upper bounds (ms) of the runtime histogram buckets; -1 is the overflow bucket
+RUNTIME_BUCKETS_MS = (50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000, -1)
+
+
+class StatsRollup(Base):
+    """Counters per (granularity, bucket, kind, language).
+
+    ``kind`` is "run" or "session". For runs, ``ok``/``errors``/``timeouts``
+    follow the run status. For sessions, ``ok`` is completed and ``errors``
+    is failed.
+    """
+
+    __tablename__ = "stats_rollups"
+
+    granularity = Column(String(8), primary_key=True)  # hour | day
+    bucket_start = Column(DateTime, primary_key=True)
+    kind = Column(String(16), primary_key=True)
+    language = Column(String(50), primary_key=True)
+
+    total = Column(Integer, default=0, nullable=False)
+    ok = Column(Integer, default=0, nullable=False)
+    errors = Column(Integer, default=0, nullable=False)
+    timeouts = Column(Integer, default=0, nullable=False)
+    runtime_count = Column(Integer, default=0, nullable=False)
+    runtime_sum_ms = Column(BigInteger, default=0, nullable=False)
+
+
+class RuntimeHistogram(Base):
+    """Run runtime histogram per bucket and language, for percentiles."""
+
+    __tablename__ = "stats_runtime_histogram"
+
+    granularity = Column(String(8), primary_key=True)
+    bucket_start = Column(DateTime, primary_key=True)
+    language = Column(String(50), primary_key=True)
+    le_ms = Column(Integer, primary_key=True)
+    count = Column(Integer, default=0, nullable=False)
+
+
+class ErrorTypeRollup(Base):
+    """Occurrences of each exception type per bucket and language."""
+
+    __tablename__ = "stats_error_types"
+
+    granularity = Column(String(8), primary_key=True)
+    bucket_start = Column(DateTime, primary_key=True)
+    kind = Column(String(16), primary_key=True)
+    language = Column(String(50), primary_key=True)
+    error_type = Column(String(200), primary_key=True)
+    count = Column(Integer, default=0, nullable=False)
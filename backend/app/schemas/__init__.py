@@ -3,6 +3,7 @@ from app.schemas.debug_session import (
     DebugSessionCreate,
     DebugSessionResponse,
     DebugSessionListResponse,
+    DebugSessionSearchResult,
     ReproductionResult
 )
 
@@ -10,5 +11,6 @@ __all__ = [
     "DebugSessionCreate",
     "DebugSessionResponse",
     "DebugSessionListResponse",
+    "DebugSessionSearchResult",
     "ReproductionResult"
 ]
@@ -1,6 +1,6 @@
 """Pydantic schemas for debug sessions."""
 from datetime import datetime
-from typing import Optional
+from typing import Dict, Optional
 from uuid import UUID
 from pydantic import BaseModel, Field
 from app.models.debug_session import SessionStatus
@@ -14,6 +14,9 @@ class DebugSessionCreate(BaseModel):
     error_text: str = Field(..., min_length=1, description="Error message or stack trace")
     code_snippet: Optional[str] = Field(None, description="Relevant code snippet")
     context_description: Optional[str] = Field(None, description="Additional context about when the error occurs")
+    verify_repro: bool = Field(False, description="Run candidate reproductions in the sandbox and keep one that reproduces the error")
+    user_id: Optional[UUID] = Field(None, description="Owner; required when team_id is set")
+    team_id: Optional[UUID] = Field(None, description="Team the session is shared with (owner must be a member)")
 
 
 class ReproductionResult(BaseModel):
@@ -23,6 +26,9 @@ class ReproductionResult(BaseModel):
     test_code: str
     explanation: str
     fix_suggestion: str
+    prompt_tokens_before: Optional[int] = None
+    prompt_tokens_after: Optional[int] = None
+    llm_model: Optional[str] = None  # Model that answered, when known
 
 
 class DebugSessionResponse(BaseModel):
@@ -31,6 +37,8 @@ class DebugSessionResponse(BaseModel):
     id: UUID
     created_at: datetime
     updated_at: datetime
+    user_id: Optional[UUID] = None
+    team_id: Optional[UUID] = None
     
     # Input
     language: str
@@ -51,6 +59,11 @@ class DebugSessionResponse(BaseModel):
     # Metadata
     llm_model: Optional[str]
     error_message: Optional[str]
+    prompt_tokens_before: Optional[int] = None
+    prompt_tokens_after: Optional[int] = None
+    repro_verified: Optional[bool] = None
+    verification_attempts: Optional[int] = None
+    time_to_verified_ms: Optional[int] = None
     
     class Config:
         from_attributes = True
@@ -64,6 +77,23 @@ class DebugSessionListResponse(BaseModel):
     language: str
     error_snippet: str  # First line of error
     status: SessionStatus
+    user_id: Optional[UUID] = None
+    team_id: Optional[UUID] = None
+    
+    class Config:
+        from_attributes = True
+
+
+class DebugSessionSearchResult(BaseModel):
+    """A ranked full-text search hit with highlighted fragments."""
+    
+    id: UUID
+    created_at: datetime
+    language: str
+    error_snippet: str
+    status: SessionStatus
+    rank: float
+    highlights: Dict[str, str]  # field name -> fragment with <mark> tags
     
     class Config:
         from_attributes = True
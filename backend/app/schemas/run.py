@@ -2,6 +2,7 @@
 from pydantic import BaseModel, Field
 from typing import Optional
 from datetime import datetime
+from uuid import UUID
 
 
 class RunCreate(BaseModel):
@@ -9,6 +10,8 @@ class RunCreate(BaseModel):
     language: str = Field(..., description="Programming language (python, javascript, typescript, java, etc.)")
     code: str = Field(..., description="Code to execute in the sandbox")
     timeout_sec: int = Field(default=10, ge=1, le=60, description="Timeout in seconds (1-60)")
+    user_id: Optional[UUID] = Field(None, description="Owner; required when team_id is set")
+    team_id: Optional[UUID] = Field(None, description="Team the run is shared with (owner must be a member)")
 
 
 class RunResponse(BaseModel):
@@ -18,12 +21,29 @@ class RunResponse(BaseModel):
     status: str  # pending, running, completed, error, timeout
     stdout: Optional[str] = None
     stderr: Optional[str] = None
+    stdout_bytes: Optional[int] = None  # full size; stdout may be a preview
+    stderr_bytes: Optional[int] = None
+    output_truncated: bool = False  # fetch /api/runs/{id}/output for the rest
     exit_code: Optional[int] = None
     execution_time_ms: Optional[int] = None
     error: Optional[str] = None
     image: Optional[str] = None
     created_at: datetime
     completed_at: Optional[datetime] = None
+    user_id: Optional[UUID] = None
+    team_id: Optional[UUID] = None
     
     class Config:
         from_attributes = True
+
+
+class RunListResponse(BaseModel):
+    """Run summary for feeds (output omitted; fetch the run for stdout/stderr)."""
+    run_id: str
+    created_at: datetime
+    language: str
+    status: str
+    exit_code: Optional[int] = None
+    execution_time_ms: Optional[int] = None
+    user_id: Optional[UUID] = None
+    team_id: Optional[UUID] = None
@@ -0,0 +1,193 @@
+"""Circuit breakers for the Docker daemon and the LLM providers.
+
+A breaker counts consecutive outage failures of one dependency. Outages are
+errors without an HTTP status (connection refused, timeouts), 408, 429 and
+5xx. The Docker breaker counts only daemon connectivity errors and 5xx
+answers (``sandbox_runner.is_daemon_outage``). After
+``CIRCUIT_BREAKER_FAILURE_THRESHOLD`` consecutive outages the breaker
+opens. Calls then fail at once with ``CircuitOpenError`` instead of each
+waiting for its own timeout, and the API turns that error into 503 with
+``Retry-After``.
+
+After ``CIRCUIT_BREAKER_RECOVERY_SEC`` the breaker is half-open. It lets a
+single probe call through while other calls are still rejected. A
+successful probe closes the breaker, and a failed one opens it for another
+period. Any answer from the dependency counts as a success, including a
+4xx error: the dependency is up.
+
+Breakers are per worker and shared by every client of the same dependency;
+``get_circuit_breaker`` returns them by name. Their state is reported by
+``/health`` and ``/metrics``.
+"""
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, Optional
+
+from app.config import settings
+from app.services import metrics
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Gauge values of circuit_breaker_state
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+# Retry-After while a half-open probe is still in flight
+PROBE_RETRY_AFTER_SEC = 1.0
+
+
+class CircuitOpenError(Exception):
+    """The dependency's breaker is open; retry after ``retry_after`` seconds."""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"{name} is unavailable (circuit open); retry in {math.ceil(retry_after)}s")
+        self.name = name
+        self.retry_after = retry_after
+
+    def headers(self) -> Dict[str, str]:
+        return {"Retry-After": str(max(1, math.ceil(self.retry_after)))}
+
+
+def is_outage(exc: BaseException) -> bool:
+    """Whether ``exc`` means the dependency is down or overloaded rather than the request being bad."""
+    status = getattr(exc, "status_code", None)
+    return status is None or status in (408, 429) or status >= 500
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        recovery_sec: float = 30.0,
+        enabled: bool = True,
+        is_failure: Callable[[BaseException], bool] = is_outage,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.recovery_sec = recovery_sec
+        self.enabled = enabled
+        self.is_failure = is_failure
+        self.clock = clock
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.rejected = 0
+        self._probing = False
+        self._lock = threading.Lock()
+        self._state_gauge = metrics.circuit_breaker_state.labels(name)
+        self._state_gauge.set(_STATE_VALUES[CLOSED])
+
+    def _set_state(self, state: str) -> None:
+        self.state = state
+        self._state_gauge.set(_STATE_VALUES[state])
+
+    def retry_after(self) -> float:
+        if self.state == OPEN:
+            return max(0.0, self.recovery_sec - (self.clock() - self.opened_at))
+        return PROBE_RETRY_AFTER_SEC if self.state == HALF_OPEN else 0.0
+
+    def before_call(self) -> bool:
+        """Admit a call, or raise ``CircuitOpenError``; returns whether the call is the half-open probe."""
+        with self._lock:
+            if self.state == CLOSED:
+                return False
+            if self.state == OPEN and self.clock() - self.opened_at >= self.recovery_sec:
+                self._set_state(HALF_OPEN)
+            if self.state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            self.rejected += 1
+            retry_after = self.retry_after()
+        metrics.circuit_breaker_rejections.labels(self.name).inc()
+        raise CircuitOpenError(self.name, retry_after)
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.consecutive_failures = 0
+            self._probing = False
+            if self.state != CLOSED:
+                self._set_state(CLOSED)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.consecutive_failures += 1
+            self._probing = False
+            tripped = self.state == CLOSED and self.consecutive_failures >= self.failure_threshold
+            if tripped or self.state == HALF_OPEN:
+                self.opened_at = self.clock()
+                self._set_state(OPEN)
+
+    @contextmanager
+    def guard(self) -> Iterator[None]:
+        """Run the block as one call to the dependency (sync or async code)."""
+        if not self.enabled:
+            yield
+            return
+        probe = self.before_call()
+        try:
+            yield
+        except Exception as exc:
+            if self.is_failure(exc):
+                self.record_failure()
+            else:
+                self.record_success()
+            raise
+        except BaseException:
+            # Cancelled (e.g. a losing hedged request): no verdict, free the probe slot
+            if probe:
+                with self._lock:
+                    self._probing = False
+            raise
+        self.record_success()
+
+    def snapshot(self) -> Dict[str, object]:
+        with self._lock:
+            snapshot = {
+                "state": self.state,
+                "consecutive_failures": self.consecutive_failures,
+                "rejected": self.rejected,
+            }
+            if self.state != CLOSED:
+                snapshot["retry_after_sec"] = round(self.retry_after(), 1)
+            return snapshot
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(name: str, is_failure: Callable[[BaseException], bool] = is_outage) -> CircuitBreaker:
+    """Return the process-wide breaker for ``name``, creating it on first use.
+
+    ``is_failure`` only applies when the breaker is created, so every caller
+    of one name should pass the same predicate.
+    """
+    with _breakers_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            breaker = CircuitBreaker(
+                name,
+                failure_threshold=settings.CIRCUIT_BREAKER_FAILURE_THRESHOLD,
+                recovery_sec=settings.CIRCUIT_BREAKER_RECOVERY_SEC,
+                enabled=settings.CIRCUIT_BREAKER_ENABLED,
+                is_failure=is_failure,
+            )
+            _breakers[name] = breaker
+        return breaker
+
+
+def snapshot() -> Dict[str, Dict[str, object]]:
+    """State of every breaker created in this worker, for ``/health``."""
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return {breaker.name: breaker.snapshot() for breaker in breakers}
+
+
+def is_available(client: object) -> bool:
+    """False while the breaker of ``client`` (if it has one) is open and not yet due for a probe."""
+    breaker: Optional[CircuitBreaker] = getattr(client, "breaker", None)
+    return breaker is None or breaker.state != OPEN or breaker.retry_after() <= 0
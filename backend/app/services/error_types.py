@@ -0,0 +1,21 @@
+"""Extraction of exception type names from stack traces and program output."""
+import re
+from typing import Optional, Set
+
+# Python/JS/Java style names: KeyError, TypeError, java.lang.NullPointerException, SystemExit
+_EXCEPTION_NAME = re.compile(r"\b((?:[a-z_$][\w$]*\.)*[A-Z][\w$]*(?:Error|Exception|Exit|Interrupt))\b")
+
+
+def exception_types(text: Optional[str]) -> Set[str]:
+    """Exception type names (without package) mentioned in ``text``."""
+    return {name.rsplit(".", 1)[-1] for name in _EXCEPTION_NAME.findall(text or "")}
+
+
+def primary_exception_type(text: Optional[str]) -> Optional[str]:
+    """The exception that terminated the program, if one is named.
+
+    Python prints the final exception last; JVM and Node print it first but
+    usually do not repeat other names after it, so the last name wins.
+    """
+    names = _EXCEPTION_NAME.findall(text or "")
+    return names[-1].rsplit(".", 1)[-1] if names else None
@@ -0,0 +1,254 @@
+"""Record/replay LLM client for deterministic performance testing.
+
+``LLM_CASSETTE_MODE=record`` wraps the configured provider client. Every
+completion is appended to the cassette (``LLM_CASSETTE_PATH``) with its
+latency, whether it succeeded or failed. ``LLM_CASSETTE_MODE=replay`` serves
+completions from the cassette without network access:
+
+- A prompt that was recorded gets its recorded response. Any other prompt
+  gets a recorded entry chosen deterministically from the prompt, so load
+  tests with varied inputs still see the recorded mix of responses.
+- The call takes the entry's recorded latency, multiplied by
+  ``LLM_REPLAY_LATENCY_SCALE``. The latency distribution of the cassette is
+  therefore preserved.
+- ``stream_completion`` yields the response token by token. The first token
+  arrives at the recorded (or estimated) time to first token, and the rest
+  are spread over the remaining latency.
+- Recorded failures are raised again. ``LLM_REPLAY_ERROR_RATE`` injects
+  additional errors with status ``LLM_REPLAY_ERROR_STATUS``; a 429 carries a
+  ``Retry-After`` header like a provider's.
+
+The cassette is NDJSON, one entry per line. Prompts are stored only as a
+hash and a token estimate; responses are stored verbatim.
+"""
+import asyncio
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from pathlib import Path
+from typing import AsyncIterator, Dict, List, Optional
+
+from app.services import metrics
+from app.services.llm_client import BaseLLMClient, last_model_used, set_model_used
+from app.services.rate_limiter import estimate_tokens
+
+FIRST_TOKEN_FRACTION = 0.2  # time to first token when only the total latency was recorded
+INJECTED_RETRY_AFTER_SEC = 1
+
+_TOKEN = re.compile(r"\S+\s*|\s+")
+
+
+def prompt_key(prompt: str, system_prompt: Optional[str] = None) -> str:
+    digest = hashlib.sha256()
+    digest.update((system_prompt or "").encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(prompt.encode("utf-8"))
+    return digest.hexdigest()
+
+
+def split_tokens(text: str) -> List[str]:
+    """Word-sized pieces that join back to ``text``."""
+    return _TOKEN.findall(text)
+
+
+class _Headers(dict):
+    def get(self, key, default=None):
+        return super().get(key.lower(), default)
+
+
+class _Response:
+    def __init__(self, headers: Dict[str, str]):
+        self.headers = _Headers({name.lower(): value for name, value in headers.items()})
+
+
+class ReplayedLLMError(Exception):
+    """A recorded or injected provider failure.
+
+    Carries ``status_code`` and ``response.headers`` like the provider SDK
+    errors, so retry and failover code treats it the same way.
+    """
+
+    def __init__(self, message: str, status_code: Optional[int] = None, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.response = _Response({"retry-after": str(retry_after)} if retry_after is not None else {})
+
+
+class CassetteMiss(LookupError):
+    """The prompt is not in the cassette and strict matching is on."""
+
+
+class RecordingLLMClient(BaseLLMClient):
+    """Passes completions through to ``client`` and appends them to a cassette."""
+
+    def __init__(self, client: BaseLLMClient, path: str):
+        self.client = client
+        self.model = getattr(client, "model", None)
+        self.path = Path(path)
+        self._lock = threading.Lock()
+
+    def _append(self, entry: Dict) -> None:
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with self.path.open("a", encoding="utf-8") as cassette:
+                cassette.write(line)
+
+    def _entry(self, prompt: str, system_prompt: Optional[str], latency: float) -> Dict:
+        return {
+            "key": prompt_key(prompt, system_prompt),
+            "prompt_tokens": estimate_tokens(prompt, system_prompt),
+            "model": last_model_used() or self.model,
+            "latency_ms": round(latency * 1000, 1),
+            "recorded_at": time.time(),
+        }
+
+    async def _record_error(self, prompt: str, system_prompt: Optional[str], start: float, exc: Exception) -> None:
+        entry = self._entry(prompt, system_prompt, time.monotonic() - start)
+        entry["error"] = {
+            "type": type(exc).__name__,
+            "message": str(exc)[:500],
+            "status_code": getattr(exc, "status_code", None),
+        }
+        await asyncio.to_thread(self._append, entry)
+
+    async def generate_completion(self, prompt: str, system_prompt: Optional[str] = None) -> str:
+        start = time.monotonic()
+        try:
+            response = await self.client.generate_completion(prompt, system_prompt)
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            await self._record_error(prompt, system_prompt, start, exc)
+            raise
+        entry = self._entry(prompt, system_prompt, time.monotonic() - start)
+        entry["response"] = response
+        await asyncio.to_thread(self._append, entry)
+        return response
+
+    async def stream_completion(self, prompt: str, system_prompt: Optional[str] = None) -> AsyncIterator[str]:
+        start = time.monotonic()
+        first_token: Optional[float] = None
+        pieces = []
+        try:
+            async for piece in self.client.stream_completion(prompt, system_prompt):
+                if first_token is None:
+                    first_token = time.monotonic() - start
+                pieces.append(piece)
+                yield piece
+        except Exception as exc:
+            await self._record_error(prompt, system_prompt, start, exc)
+            raise
+        entry = self._entry(prompt, system_prompt, time.monotonic() - start)
+        entry["response"] = "".join(pieces)
+        if first_token is not None:
+            entry["first_token_ms"] = round(first_token * 1000, 1)
+        await asyncio.to_thread(self._append, entry)
+
+
+class ReplayLLMClient(BaseLLMClient):
+    """Serves completions recorded by ``RecordingLLMClient``, offline."""
+
+    def __init__(
+        self,
+        entries: List[Dict],
+        latency_scale: float = 1.0,
+        error_rate: float = 0.0,
+        error_status: int = 503,
+        strict: bool = False,
+        seed: Optional[int] = None,
+    ):
+        if not entries:
+            raise ValueError("the cassette has no entries")
+        self.entries = entries
+        self.by_key: Dict[str, List[Dict]] = {}
+        for entry in entries:
+            self.by_key.setdefault(entry["key"], []).append(entry)
+        self.latency_scale = max(0.0, latency_scale)
+        self.error_rate = min(1.0, max(0.0, error_rate))
+        self.error_status = error_status
+        self.strict = strict
+        self.model = next((entry["model"] for entry in entries if entry.get("model")), "replay")
+        self._rng = random.Random(seed)
+        self._replays: Dict[str, int] = {}
+        self.calls = 0
+        self.injected_errors = 0
+
+    @classmethod
+    def from_file(cls, path: str, **options) -> "ReplayLLMClient":
+        with open(path, encoding="utf-8") as cassette:
+            entries = [json.loads(line) for line in cassette if line.strip()]
+        return cls(entries, **options)
+
+    def _pick(self, prompt: str, system_prompt: Optional[str]) -> Dict:
+        key = prompt_key(prompt, system_prompt)
+        recorded = self.by_key.get(key)
+        if recorded:
+            # Repeated prompts cycle through their recordings in order
+            index = self._replays.get(key, 0)
+            self._replays[key] = index + 1
+            return recorded[index % len(recorded)]
+        if self.strict:
+            raise CassetteMiss(f"prompt {key[:12]} is not in the cassette")
+        return self.entries[int(key[:8], 16) % len(self.entries)]
+
+    def _timing(self, entry: Dict) -> tuple:
+        latency = entry.get("latency_ms", 0.0) / 1000 * self.latency_scale
+        first_token = entry.get("first_token_ms")
+        first_token = first_token / 1000 * self.latency_scale if first_token is not None else latency * FIRST_TOKEN_FRACTION
+        return latency, min(first_token, latency)
+
+    def _error(self, entry: Dict) -> Optional[ReplayedLLMError]:
+        self.calls += 1
+        if self.error_rate and self._rng.random() < self.error_rate:
+            self.injected_errors += 1
+            retry_after = INJECTED_RETRY_AFTER_SEC if self.error_status == 429 else None
+            return ReplayedLLMError(
+                f"Injected error (status {self.error_status})", self.error_status, retry_after
+            )
+        error = entry.get("error")
+        if error:
+            return ReplayedLLMError(f"{error.get('type')}: {error.get('message')}", error.get("status_code"))
+        return None
+
+    async def generate_completion(self, prompt: str, system_prompt: Optional[str] = None) -> str:
+        entry = self._pick(prompt, system_prompt)
+        latency, first_token = self._timing(entry)
+        error = self._error(entry)
+        model = entry.get("model") or self.model
+        if error is not None:
+            await asyncio.sleep(first_token)
+            metrics.observe_llm("replay", model, first_token, "error")
+            raise error
+        await asyncio.sleep(latency)
+        set_model_used(model)
+        metrics.observe_llm(
+            "replay", model, latency, "ok", entry.get("prompt_tokens"), estimate_tokens(entry["response"])
+        )
+        return entry["response"]
+
+    async def stream_completion(self, prompt: str, system_prompt: Optional[str] = None) -> AsyncIterator[str]:
+        entry = self._pick(prompt, system_prompt)
+        latency, first_token = self._timing(entry)
+        error = self._error(entry)
+        await asyncio.sleep(first_token)
+        if error is not None:
+            raise error
+        tokens = split_tokens(entry["response"])
+        gap = (latency - first_token) / max(1, len(tokens) - 1)
+        set_model_used(entry.get("model") or self.model)
+        for index, token in enumerate(tokens):
+            if index:
+                await asyncio.sleep(gap)
+            yield token
+
+    def snapshot(self) -> Dict[str, float]:
+        return {
+            "entries": len(self.entries),
+            "calls": self.calls,
+            "injected_errors": self.injected_errors,
+            "latency_scale": self.latency_scale,
+        }
@@ -1,9 +1,45 @@
 """Generic LLM client supporting multiple providers."""
+import asyncio
 import json
+import time
 from abc import ABC, abstractmethod
-from typing import Optional
-from openai import AsyncOpenAI
-from anthropic import AsyncAnthropic
+from collections import deque
+from contextvars import ContextVar
+from typing import AsyncIterator, Deque, Dict, List, Optional, Tuple
+from app.services.circuit_breaker import get_circuit_breaker, is_available
+from app.services.rate_limiter import estimate_tokens, get_rate_limiter
+from app.services import metrics, tracing
+
+MAX_COMPLETION_TOKENS = 4000
+
+# Model that served the most recent completion in the current request/task
+_model_used: ContextVar[Optional[str]] = ContextVar("llm_model_used", default=None)
+
+
+def last_model_used() -> Optional[str]:
+    """Return the model that answered the last completion in this context."""
+    return _model_used.get()
+
+
+def set_model_used(model: Optional[str]) -> None:
+    """Record the model that answered a completion, for ``last_model_used``."""
+    _model_used.set(model)
+
+
+async def _observed(provider: str, model: str, call, usage_of):
+    """Await ``call()``, recording its latency and token usage in the LLM metrics."""
+    start = time.perf_counter()
+    try:
+        response = await call()
+    except asyncio.CancelledError:
+        # Hedged requests that lost the race
+        metrics.observe_llm(provider, model, time.perf_counter() - start, "cancelled")
+        raise
+    except Exception:
+        metrics.observe_llm(provider, model, time.perf_counter() - start, "error")
+        raise
+    metrics.observe_llm(provider, model, time.perf_counter() - start, "ok", *usage_of(response))
+    return response
 
 
 class BaseLLMClient(ABC):
@@ -14,13 +50,23 @@ class BaseLLMClient(ABC):
         """Generate a completion from the LLM."""
         pass
 
+    async def stream_completion(self, prompt: str, system_prompt: Optional[str] = None) -> AsyncIterator[str]:
+        """Yield the completion in pieces; by default the whole completion at once."""
+        yield await self.generate_completion(prompt, system_prompt)
+
 
 class OpenAIClient(BaseLLMClient):
     """OpenAI client implementation."""
     
     def __init__(self, api_key: str, model: str):
-        self.client = AsyncOpenAI(api_key=api_key)
+        # SDK imported on first use to keep worker startup fast
+        from openai import AsyncOpenAI
+
+        # Retries go through the shared rate limiter so they respect its budget
+        self.client = AsyncOpenAI(api_key=api_key, max_retries=0)
         self.model = model
+        self.rate_limiter = get_rate_limiter("openai")
+        self.breaker = get_circuit_breaker(f"llm:openai:{model}")
     
     async def generate_completion(self, prompt: str, system_prompt: Optional[str] = None) -> str:
         """Generate completion using OpenAI."""
@@ -31,12 +77,28 @@ class OpenAIClient(BaseLLMClient):
         
         messages.append({"role": "user", "content": prompt})
         
-        response = await self.client.chat.completions.create(
-            model=self.model,
-            messages=messages,
-            temperature=0.7,
-            max_tokens=4000
-        )
+        async def _send():
+            # Inside the limiter, so the span excludes time queued for a slot
+            with tracing.span("llm.request", provider="openai", model=self.model):
+                return await _observed(
+                    "openai",
+                    self.model,
+                    lambda: self.client.chat.completions.create(
+                        model=self.model,
+                        messages=messages,
+                        temperature=0.7,
+                        max_tokens=MAX_COMPLETION_TOKENS
+                    ),
+                    lambda r: (r.usage.prompt_tokens, r.usage.completion_tokens) if r.usage else (None, None),
+                )
+
+        # Outside the limiter: while the breaker is open, calls are rejected without queueing
+        with self.breaker.guard():
+            response = await self.rate_limiter.run(
+                _send,
+                estimated_tokens=estimate_tokens(prompt, system_prompt) + MAX_COMPLETION_TOKENS,
+                usage_of=lambda r: r.usage.total_tokens if r.usage else None,
+            )
         
         return response.choices[0].message.content
 
@@ -45,25 +107,45 @@ class AnthropicClient(BaseLLMClient):
     """Anthropic Claude client implementation."""
     
     def __init__(self, api_key: str, model: str):
-        self.client = AsyncAnthropic(api_key=api_key)
+        from anthropic import AsyncAnthropic
+
+        self.client = AsyncAnthropic(api_key=api_key, max_retries=0)
         self.model = model
+        self.rate_limiter = get_rate_limiter("anthropic")
+        self.breaker = get_circuit_breaker(f"llm:anthropic:{model}")
     
     async def generate_completion(self, prompt: str, system_prompt: Optional[str] = None) -> str:
         """Generate completion using Anthropic."""
-        message = await self.client.messages.create(
-            model=self.model,
-            max_tokens=4000,
-            system=system_prompt or "",
-            messages=[
-                {"role": "user", "content": prompt}
-            ]
-        )
+        async def _send():
+            with tracing.span("llm.request", provider="anthropic", model=self.model):
+                return await _observed(
+                    "anthropic",
+                    self.model,
+                    lambda: self.client.messages.create(
+                        model=self.model,
+                        max_tokens=MAX_COMPLETION_TOKENS,
+                        system=system_prompt or "",
+                        messages=[
+                            {"role": "user", "content": prompt}
+                        ]
+                    ),
+                    lambda m: (m.usage.input_tokens, m.usage.output_tokens),
+                )
+
+        with self.breaker.guard():
+            message = await self.rate_limiter.run(
+                _send,
+                estimated_tokens=estimate_tokens(prompt, system_prompt) + MAX_COMPLETION_TOKENS,
+                usage_of=lambda m: m.usage.input_tokens + m.usage.output_tokens,
+            )
         
         return message.content[0].text
 
 
 class LLMClient:
     """Factory for creating LLM clients."""
+
+    _from_settings: Optional[BaseLLMClient] = None
     
     @staticmethod
     def create(provider: str, api_key: str, model: str) -> BaseLLMClient:
@@ -78,6 +160,55 @@ class LLMClient:
         # Unknown provider -> dummy
         return DummyLLMClient()
 
+    @staticmethod
+    def from_settings() -> BaseLLMClient:
+        """Process-wide client for the configured primary provider and fallbacks.
+
+        With ``LLM_FALLBACK_PROVIDERS`` set this is a ``FailoverLLMClient``;
+        it is cached so routing statistics survive across requests.
+        ``LLM_CASSETTE_MODE`` records it to, or replaces it with, a cassette
+        (see ``app.services.llm_cassette``).
+        """
+        if LLMClient._from_settings is None:
+            from app.config import settings
+
+            if settings.LLM_CASSETTE_MODE == "replay":
+                from app.services.llm_cassette import ReplayLLMClient
+
+                LLMClient._from_settings = ReplayLLMClient.from_file(
+                    settings.LLM_CASSETTE_PATH,
+                    latency_scale=settings.LLM_REPLAY_LATENCY_SCALE,
+                    error_rate=settings.LLM_REPLAY_ERROR_RATE,
+                    error_status=settings.LLM_REPLAY_ERROR_STATUS,
+                    seed=settings.LLM_REPLAY_SEED,
+                )
+                return LLMClient._from_settings
+
+            primary = LLMClient.create(settings.LLM_PROVIDER, settings.LLM_API_KEY, settings.LLM_MODEL)
+            backends: List[Tuple[str, BaseLLMClient]] = [
+                (f"{settings.LLM_PROVIDER.lower()}:{settings.LLM_MODEL}", primary)
+            ]
+            for entry in settings.LLM_FALLBACK_PROVIDERS:
+                provider, _, model = entry.partition(":")
+                provider = provider.strip().lower()
+                api_key = settings.provider_api_key(provider)
+                if not api_key or not model:
+                    continue
+                backends.append((f"{provider}:{model.strip()}", LLMClient.create(provider, api_key, model.strip())))
+            if len(backends) == 1 or isinstance(primary, DummyLLMClient):
+                LLMClient._from_settings = primary
+            else:
+                LLMClient._from_settings = FailoverLLMClient(
+                    backends,
+                    hedge=settings.LLM_HEDGE_ENABLED,
+                    default_hedge_delay=settings.LLM_HEDGE_DELAY_SEC,
+                )
+            if settings.LLM_CASSETTE_MODE == "record":
+                from app.services.llm_cassette import RecordingLLMClient
+
+                LLMClient._from_settings = RecordingLLMClient(LLMClient._from_settings, settings.LLM_CASSETTE_PATH)
+        return LLMClient._from_settings
+
 
 class DummyLLMClient(BaseLLMClient):
     """Deterministic offline LLM fallback for local development.
@@ -116,3 +247,151 @@ class DummyLLMClient(BaseLLMClient):
             "explanation": explanation,
             "fix_suggestion": fix
         })
+
+
+class BackendStats:
+    """Rolling latency window and error-rate EWMA for one backend."""
+
+    def __init__(self, window: int = 200, alpha: float = 0.2):
+        self.latencies: Deque[float] = deque(maxlen=window)
+        self.alpha = alpha
+        self.error_rate = 0.0
+        self.wins = 0
+        self.failures = 0
+
+    def record(self, latency: float, ok: bool) -> None:
+        if ok:
+            self.latencies.append(latency)
+        else:
+            self.failures += 1
+        self.error_rate += self.alpha * ((0.0 if ok else 1.0) - self.error_rate)
+
+    def record_cancelled(self, elapsed: float) -> None:
+        """A call cancelled after ``elapsed`` seconds: its latency was at least that long."""
+        self.latencies.append(elapsed)
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class FailoverLLMClient(BaseLLMClient):
+    """Routes completions across several backends with hedging and failover.
+
+    Backends are ranked by error rate and observed p95 latency; backends whose
+    circuit breaker is open go last. The best one
+    is called first; if it has not answered after its p95 latency, a hedged
+    request goes to the next backend and whichever finishes first wins. A
+    backend that fails is replaced by the next one immediately. Losing
+    requests are cancelled.
+    """
+
+    def __init__(
+        self,
+        backends: List[Tuple[str, BaseLLMClient]],
+        hedge: bool = True,
+        max_hedges: int = 1,
+        default_hedge_delay: float = 10.0,
+        min_hedge_delay: float = 0.5,
+        min_samples: int = 20,
+        unhealthy_error_rate: float = 0.5,
+    ):
+        if not backends:
+            raise ValueError("FailoverLLMClient needs at least one backend")
+        self.backends = backends
+        self.stats: Dict[str, BackendStats] = {name: BackendStats() for name, _ in backends}
+        self.hedge = hedge
+        self.max_hedges = max_hedges
+        self.default_hedge_delay = default_hedge_delay
+        self.min_hedge_delay = min_hedge_delay
+        self.min_samples = min_samples
+        self.unhealthy_error_rate = unhealthy_error_rate
+
+    def ranked(self) -> List[Tuple[str, BaseLLMClient]]:
+        """Backends in the order they should be tried."""
+        def key(item: Tuple[int, Tuple[str, BaseLLMClient]]):
+            index, (name, client) = item
+            stats = self.stats[name]
+            p95 = stats.percentile(0.95) if len(stats.latencies) >= self.min_samples else None
+            unhealthy = stats.error_rate >= self.unhealthy_error_rate or not is_available(client)
+            return (unhealthy, p95 if p95 is not None else float("inf"), index)
+
+        return [backend for _, backend in sorted(enumerate(self.backends), key=key)]
+
+    def hedge_delay(self, name: str) -> float:
+        """Seconds to wait on ``name`` before sending a hedged request."""
+        stats = self.stats[name]
+        if len(stats.latencies) < self.min_samples:
+            return self.default_hedge_delay
+        return max(self.min_hedge_delay, stats.percentile(0.95))
+
+    async def _timed(self, name: str, client: BaseLLMClient, prompt: str, system_prompt: Optional[str]) -> str:
+        start = time.monotonic()
+        try:
+            with tracing.span("llm.backend", backend=name):
+                result = await client.generate_completion(prompt, system_prompt)
+        except asyncio.CancelledError:
+            # A losing hedge: without this lower bound a slow backend's p95 would
+            # only ever see its fast answers and it would keep being ranked first
+            self.stats[name].record_cancelled(time.monotonic() - start)
+            raise
+        except Exception:
+            self.stats[name].record(time.monotonic() - start, ok=False)
+            raise
+        self.stats[name].record(time.monotonic() - start, ok=True)
+        return result
+
+    async def generate_completion(self, prompt: str, system_prompt: Optional[str] = None) -> str:
+        """Generate a completion from whichever backend answers first."""
+        order = self.ranked()
+        pending: Dict[asyncio.Task, Tuple[str, BaseLLMClient]] = {}
+        next_index = 0
+        hedges = 0
+        last_error: Optional[BaseException] = None
+
+        def launch() -> str:
+            nonlocal next_index
+            name, client = order[next_index]
+            next_index += 1
+            task = asyncio.create_task(self._timed(name, client, prompt, system_prompt))
+            pending[task] = (name, client)
+            return name
+
+        current = launch()
+        try:
+            while pending:
+                can_hedge = self.hedge and hedges < self.max_hedges and next_index < len(order)
+                timeout = self.hedge_delay(current) if can_hedge else None
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    hedges += 1
+                    current = launch()
+                    continue
+                for task in done:
+                    name, client = pending.pop(task)
+                    if task.exception() is None:
+                        self.stats[name].wins += 1
+                        set_model_used(getattr(client, "model", None))
+                        return task.result()
+                    last_error = task.exception()
+                if not pending and next_index < len(order):
+                    current = launch()
+        finally:
+            for task in pending:
+                task.cancel()
+        raise last_error or RuntimeError("No LLM backend available")
+
+    def snapshot(self) -> Dict[str, Dict[str, Optional[float]]]:
+        """Per-backend routing statistics, for health/metrics endpoints."""
+        return {
+            name: {
+                "p50_sec": stats.percentile(0.5),
+                "p95_sec": stats.percentile(0.95),
+                "error_rate": round(stats.error_rate, 4),
+                "wins": stats.wins,
+                "failures": stats.failures,
+            }
+            for name, stats in self.stats.items()
+        }
@@ -0,0 +1,66 @@
+"""Cached user -> team memberships for feed and ownership checks.
+
+Each feed page and each team-owned create needs the caller's team ids. The
+cache keeps them per user for ``ttl_sec``, so a feed page costs one indexed
+query instead of a membership join per request. Membership changes made
+through this worker invalidate the entry at once; other workers see them
+once the TTL expires.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, FrozenSet, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.models.team import Membership
+
+
+class MembershipCache:
+    """TTL + LRU cache of the team ids each user belongs to."""
+
+    def __init__(self, ttl_sec: float = 60.0, max_users: int = 10_000, clock: Callable[[], float] = time.monotonic):
+        self.ttl_sec = ttl_sec
+        self.max_users = max_users
+        self._clock = clock
+        self._entries: "OrderedDict[UUID, Tuple[float, FrozenSet[UUID]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _cached(self, user_id: UUID) -> Optional[FrozenSet[UUID]]:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            expires_at, team_ids = entry
+            if expires_at <= self._clock():
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return team_ids
+
+    async def team_ids(self, db: AsyncSession, user_id: UUID) -> FrozenSet[UUID]:
+        """Teams ``user_id`` belongs to (served from cache when fresh)."""
+        team_ids = self._cached(user_id)
+        if team_ids is not None:
+            return team_ids
+        rows = await db.execute(select(Membership.team_id).where(Membership.user_id == user_id))
+        team_ids = frozenset(rows.scalars().all())
+        with self._lock:
+            self._entries[user_id] = (self._clock() + self.ttl_sec, team_ids)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_users:
+                self._entries.popitem(last=False)
+        return team_ids
+
+    async def is_member(self, db: AsyncSession, user_id: UUID, team_id: UUID) -> bool:
+        return team_id in await self.team_ids(db, user_id)
+
+    def invalidate(self, user_id: UUID) -> None:
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+
+membership_cache = MembershipCache(ttl_sec=settings.MEMBERSHIP_CACHE_TTL_SEC)
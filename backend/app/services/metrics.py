@@ -0,0 +1,292 @@
+"""Prometheus metrics for the hot paths, served at ``GET /metrics``.
+
+Counters, gauges and histograms are kept in this process and rendered in the
+Prometheus text format (version 0.0.4) on scrape. Each uvicorn worker has its
+own registry, so scrape each worker or aggregate with ``sum by``.
+
+Updating a metric is a dict lookup for the label values plus an addition
+under a per-series lock. Histograms find their bucket by bisection and keep
+per-bucket counts; the cumulative counts are added up only when scraped.
+``benchmarks/bench_metrics.py`` measures the cost.
+"""
+import math
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4"  # the response adds "; charset=utf-8"
+
+# Seconds; request and container steps span milliseconds to the sandbox timeout
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+LLM_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+POOL_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _CounterValue:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+
+class _GaugeValue(_CounterValue):
+    __slots__ = ()
+
+    def dec(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+class _HistogramValue:
+    __slots__ = ("bounds", "counts", "sum", "_lock")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # the last slot is +Inf
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    @contextmanager
+    def time(self) -> Iterator[None]:
+        """Observe the duration of the block in seconds, whether or not it raises."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+
+class _Metric:
+    type = ""
+    _value_class: type = _CounterValue
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), registry: Optional["Registry"] = None):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._series: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._series[()] = self._new_value()
+        (REGISTRY if registry is None else registry).register(self)
+
+    def _new_value(self):
+        return self._value_class()
+
+    def labels(self, *values: str):
+        """The series for these label values (created on first use)."""
+        series = self._series.get(values)
+        if series is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} takes labels {self.labelnames}, got {values}")
+            with self._lock:
+                series = self._series.setdefault(tuple(str(value) for value in values), self._new_value())
+        return series
+
+    def _samples(self) -> List[str]:
+        return [
+            f"{self.name}{_labels(self.labelnames, values)} {_format_value(series.value)}"
+            for values, series in list(self._series.items())
+        ]
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}", *self._samples()]
+        return "\n".join(lines) + "\n"
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._series[()].inc(amount)
+
+
+class Gauge(_Metric):
+    type = "gauge"
+    _value_class = _GaugeValue
+
+    def __init__(self, *args, **kwargs):
+        self._function: Optional[Callable[[], Optional[float]]] = None
+        super().__init__(*args, **kwargs)
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._series[()].inc(amount)
+
+    def dec(self, amount: float = 1.0) -> None:
+        self._series[()].dec(amount)
+
+    def set(self, value: float) -> None:
+        self._series[()].set(value)
+
+    def set_function(self, function: Callable[[], Optional[float]]) -> None:
+        """Read the value from ``function`` at scrape time (``None`` omits the sample)."""
+        self._function = function
+
+    def _samples(self) -> List[str]:
+        if self._function is None:
+            return super()._samples()
+        try:
+            value = self._function()
+        except Exception:
+            value = None
+        return [] if value is None else [f"{self.name} {_format_value(float(value))}"]
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS,
+                 registry: Optional["Registry"] = None):
+        self.buckets = tuple(sorted(float(bound) for bound in buckets if bound != math.inf))
+        super().__init__(name, help, labelnames, registry)
+
+    def _new_value(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self._series[()].observe(value)
+
+    def time(self):
+        return self._series[()].time()
+
+    def _samples(self) -> List[str]:
+        lines = []
+        for values, series in list(self._series.items()):
+            with series._lock:
+                counts = list(series.counts)
+                total = series.sum
+            cumulative = 0
+            for bound, count in zip((*self.buckets, math.inf), counts):
+                cumulative += count
+                le = 'le="' + _format_value(bound) + '"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, values, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, values)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, values)} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> None:
+        if metric.name in self._metrics:
+            raise ValueError(f"metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+
+    def render(self) -> str:
+        return "".join(metric.render() for metric in self._metrics.values())
+
+
+REGISTRY = Registry()
+
+
+def render() -> str:
+    return REGISTRY.render()
+
+
+# HTTP (see app.api.metrics.MetricsMiddleware)
+http_requests = Counter(
+    "http_requests_total", "HTTP requests by route and status code.", ("method", "route", "status"))
+http_request_duration = Histogram(
+    "http_request_duration_seconds", "HTTP request latency until the response is sent.", ("method", "route"))
+websocket_connections = Gauge("websocket_connections", "Open run-log WebSocket connections.")
+websocket_connections_opened = Counter("websocket_connections_opened_total", "Run-log WebSocket connections accepted.")
+
+# LLM providers
+llm_request_duration = Histogram(
+    "llm_request_duration_seconds", "LLM provider call latency.", ("provider", "model", "outcome"), LLM_BUCKETS)
+llm_tokens = Counter("llm_tokens_total", "Tokens reported by LLM providers.", ("provider", "model", "kind"))
+repro_parse_failures = Counter(
+    "repro_parse_failures_total", "LLM answers that were not valid JSON in generate_reproduction.")
+
+# Sandbox
+sandbox_runs = Counter("sandbox_runs_total", "Sandbox runs by language and final status.", ("language", "status"))
+container_step_duration = Histogram(
+    "sandbox_container_step_duration_seconds", "Time spent in each Docker container lifecycle step.", ("step",))
+
+# Circuit breakers (app.services.circuit_breaker)
+circuit_breaker_state = Gauge(
+    "circuit_breaker_state", "Circuit breaker state: 0 closed, 1 half-open, 2 open.", ("name",))
+circuit_breaker_rejections = Counter(
+    "circuit_breaker_rejections_total", "Calls rejected by an open circuit breaker.", ("name",))
+
+# Database
+db_pool_checkout_wait = Histogram(
+    "db_pool_checkout_wait_seconds", "Time to check a connection out of the database pool.", buckets=POOL_BUCKETS)
+db_pool_checked_out = Gauge("db_pool_checked_out", "Database connections currently checked out of the pool.")
+
+
+def observe_llm(
+    provider: str,
+    model: Optional[str],
+    seconds: float,
+    outcome: str = "ok",
+    prompt_tokens: Optional[int] = None,
+    completion_tokens: Optional[int] = None,
+) -> None:
+    """Record one LLM call: latency by outcome and, when the provider reports usage, tokens."""
+    model = model or "unknown"
+    llm_request_duration.labels(provider, model, outcome).observe(seconds)
+    if prompt_tokens:
+        llm_tokens.labels(provider, model, "prompt").inc(prompt_tokens)
+    if completion_tokens:
+        llm_tokens.labels(provider, model, "completion").inc(completion_tokens)
+
+
+def instrument_pool(engine) -> None:
+    """Time pool checkouts of a (sync) SQLAlchemy ``Engine``; safe to call more than once.
+
+    Every ``Connection`` gets its DBAPI connection from ``Engine.raw_connection``,
+    so wrapping it measures the wait for a free connection (including opening
+    a new one) without touching the query path.
+    """
+    if getattr(engine, "_metered", False):
+        return
+    raw_connection = engine.raw_connection
+
+    def timed_raw_connection():
+        start = time.perf_counter()
+        try:
+            return raw_connection()
+        finally:
+            db_pool_checkout_wait.observe(time.perf_counter() - start)
+
+    engine.raw_connection = timed_raw_connection
+    engine._metered = True
+    db_pool_checked_out.set_function(lambda: engine.pool.checkedout() if hasattr(engine.pool, "checkedout") else None)
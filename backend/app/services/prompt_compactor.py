@@ -0,0 +1,223 @@
+"""Compaction of stack traces and logs before they are sent to the LLM.
+
+Deep recursion traces and noisy logs cost input tokens and latency without
+helping the model. ``compact_error_text`` collapses repeated frames, drops
+library/stdlib frames past a limit, dedupes log lines and, if the text is
+still over budget, keeps head and tail context around a truncation marker.
+"""
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+
+@lru_cache(maxsize=None)
+def _encoding():
+    """tiktoken's cl100k_base encoding, or None without tiktoken.
+
+    Loaded on first use rather than at import: importing tiktoken is slow and
+    ``get_encoding`` may download the BPE file.
+    """
+    try:  # Optional: exact counts for OpenAI-style tokenizers
+        import tiktoken
+
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:  # pragma: no cover - depends on environment
+        return None
+
+
+def count_tokens(text: Optional[str]) -> int:
+    """Token count using tiktoken when available, else a ~4 chars/token estimate."""
+    if not text:
+        return 0
+    encoding = _encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return len(text) // 4 + 1
+
+
+# Stack frame lines for Python, JS/TS (V8) and Java/Kotlin traces
+_FRAME_PATTERNS = [
+    re.compile(r'^\s*File "(?P<path>[^"]+)", line \d+'),
+    re.compile(r"^\s*at (?:.+? \()?(?P<path>(?:node:|file:|/|[A-Za-z]:\\|\w).*?)(?::\d+){1,2}\)?\s*$"),
+    re.compile(r"^\s*at (?P<path>[\w$.]+)\(.*\)\s*$"),
+]
+
+_LIBRARY_MARKERS = (
+    "site-packages", "dist-packages", "/lib/python", "<frozen", "node_modules",
+    "node:internal", "java.", "javax.", "sun.", "jdk.internal", "kotlin.",
+    "org.springframework.", "org.junit.",
+)
+
+# Trace structure lines that must survive deduplication
+_STRUCTURAL = ("Traceback", "During handling", "The above exception", "Caused by")
+
+_VOLATILE = re.compile(r"\d{4}-\d{2}-\d{2}[T ][\d:.,]+Z?|0x[0-9a-fA-F]+|\b\d+\b")
+
+
+@dataclass
+class _Line:
+    text: str
+    frame_path: Optional[str] = None
+
+    @property
+    def is_frame(self) -> bool:
+        return self.frame_path is not None
+
+    @property
+    def is_library(self) -> bool:
+        return self.frame_path is not None and any(m in self.frame_path for m in _LIBRARY_MARKERS)
+
+
+def _classify(lines: List[str]) -> List[List[_Line]]:
+    """Group lines into units: a frame plus its indented source line, or one log line."""
+    units: List[List[_Line]] = []
+    for text in lines:
+        path = None
+        for pattern in _FRAME_PATTERNS:
+            match = pattern.match(text)
+            if match:
+                path = match.group("path")
+                break
+        if path is not None:
+            units.append([_Line(text, path)])
+        elif units and units[-1][0].is_frame and len(units[-1]) == 1 and text.startswith("    ") \
+                and units[-1][0].text.lstrip().startswith("File "):
+            # Python prints the offending source line under each frame
+            units[-1].append(_Line(text))
+        else:
+            units.append([_Line(text)])
+    return units
+
+
+def _key(unit: List[_Line]) -> Tuple[str, ...]:
+    return tuple(line.text for line in unit)
+
+
+def _collapse_repeats(units: List[List[_Line]], max_period: int = 8) -> List[List[_Line]]:
+    """Collapse consecutive repetitions of the same frame sequence (recursion)."""
+    out: List[List[_Line]] = []
+    i = 0
+    while i < len(units):
+        collapsed = False
+        for period in range(1, max_period + 1):
+            block = [_key(u) for u in units[i:i + period]]
+            if len(block) < period or not units[i][0].is_frame:
+                break
+            repeats = 1
+            while [_key(u) for u in units[i + repeats * period:i + (repeats + 1) * period]] == block:
+                repeats += 1
+            if repeats >= 3:
+                out.extend(units[i:i + period])
+                label = "frame" if period == 1 else f"{period} frames"
+                out.append([_Line(f"  [... previous {label} repeated {repeats - 1} more times ...]")])
+                i += repeats * period
+                collapsed = True
+                break
+        if not collapsed:
+            out.append(units[i])
+            i += 1
+    return out
+
+
+def _omitted(count: int) -> List[_Line]:
+    return [_Line(f"  [... {count} library frame{'s' if count != 1 else ''} omitted ...]")]
+
+
+def _drop_library_frames(units: List[List[_Line]], max_library_frames: int) -> List[List[_Line]]:
+    """Keep at most ``max_library_frames`` library frames; summarize the rest."""
+    out: List[List[_Line]] = []
+    kept = 0
+    dropped = 0
+    for unit in units:
+        if unit[0].is_library:
+            if kept < max_library_frames:
+                kept += 1
+            else:
+                dropped += 1
+                continue
+        if dropped:
+            out.append(_omitted(dropped))
+            dropped = 0
+        out.append(unit)
+    if dropped:
+        out.append(_omitted(dropped))
+    return out
+
+
+def _dedupe_log_lines(units: List[List[_Line]]) -> List[List[_Line]]:
+    """Drop repeated log lines that differ only in timestamps/ids/numbers."""
+    out: List[List[_Line]] = []
+    seen = set()
+    run_key = None
+    run_count = 0
+    for unit in units:
+        line = unit[0]
+        if line.is_frame or not line.text.strip() or len(unit) > 1 or line.text.lstrip().startswith(_STRUCTURAL):
+            if run_count:
+                out.append([_Line(f"[previous line repeated {run_count} more times]")])
+            run_key, run_count = None, 0
+            out.append(unit)
+            continue
+        norm = _VOLATILE.sub("#", line.text.strip())
+        if norm == run_key:
+            run_count += 1
+            continue
+        if run_count:
+            out.append([_Line(f"[previous line repeated {run_count} more times]")])
+        run_key, run_count = norm, 0
+        if norm in seen:
+            continue
+        seen.add(norm)
+        out.append(unit)
+    if run_count:
+        out.append([_Line(f"[previous line repeated {run_count} more times]")])
+    return out
+
+
+def truncate_to_budget(text: str, token_budget: int, head_ratio: float = 0.3) -> str:
+    """Keep head and tail lines of ``text`` so it fits ``token_budget`` tokens."""
+    if token_budget <= 0 or count_tokens(text) <= token_budget:
+        return text
+    lines = text.split("\n")
+    head_budget = int(token_budget * head_ratio)
+    tail_budget = token_budget - head_budget
+
+    head: List[str] = []
+    used = 0
+    for line in lines:
+        cost = count_tokens(line) + 1
+        if used + cost > head_budget:
+            break
+        head.append(line)
+        used += cost
+
+    tail: List[str] = []
+    used = 0
+    for line in reversed(lines[len(head):]):
+        cost = count_tokens(line) + 1
+        if used + cost > tail_budget:
+            break
+        tail.append(line)
+        used += cost
+    tail.reverse()
+
+    omitted = len(lines) - len(head) - len(tail)
+    if omitted <= 0:
+        return text
+    if not head and not tail:
+        # A single enormous line: fall back to characters
+        chars = token_budget * 4
+        return f"{text[:int(chars * head_ratio)]}\n[... truncated ...]\n{text[-int(chars * (1 - head_ratio)):]}"
+    return "\n".join(head + [f"[... {omitted} lines truncated ...]"] + tail)
+
+
+def compact_error_text(text: str, token_budget: int, max_library_frames: int = 10) -> str:
+    """Compact a stack trace/log so it fits ``token_budget`` tokens."""
+    units = _classify(text.split("\n"))
+    units = _collapse_repeats(units)
+    units = _drop_library_frames(units, max_library_frames)
+    units = _dedupe_log_lines(units)
+    compacted = "\n".join(line.text for unit in units for line in unit)
+    # Head ratio favors the tail, where Python puts the exception message
+    return truncate_to_budget(compacted, token_budget, head_ratio=0.4)
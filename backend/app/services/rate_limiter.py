@@ -0,0 +1,191 @@
+"""Provider-aware rate limiting and concurrency control for LLM calls.
+
+Each provider gets a limiter with two token buckets (requests/min and
+tokens/min) plus a concurrency semaphore. Buckets use virtual scheduling:
+a caller reserves its cost up front, possibly driving the bucket into debt,
+and then sleeps until the debt is repaid. Later callers inherit a larger
+debt, so excess calls are queued in arrival order instead of failing.
+"""
+import asyncio
+import email.utils
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from app.config import settings
+
+
+def estimate_tokens(*texts: Optional[str]) -> int:
+    """Cheap token estimate (~4 characters per token) for budgeting."""
+    return sum(len(t) // 4 + 1 for t in texts if t)
+
+
+def retry_after_seconds(exc: BaseException) -> Optional[float]:
+    """Extract a Retry-After delay from a provider SDK exception, if any."""
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return max(0.0, float(value) / 1000.0)
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        parsed = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, parsed.timestamp() - time.time())
+
+
+def is_rate_limit_error(exc: BaseException) -> bool:
+    """True for HTTP 429 errors raised by the OpenAI/Anthropic SDKs."""
+    return getattr(exc, "status_code", None) == 429
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at ``rate_per_minute``."""
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = float(capacity if capacity is not None else rate_per_minute)
+        self._clock = clock
+        self._tokens = self.capacity
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        elapsed = max(0.0, now - self._updated)
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+        self._updated = now
+
+    def reserve(self, amount: float) -> float:
+        """Take ``amount`` tokens and return how long the caller must wait."""
+        # A single request larger than the bucket would otherwise wait forever
+        amount = min(amount, self.capacity)
+        with self._lock:
+            self._refill(self._clock())
+            self._tokens -= amount
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def adjust(self, delta: float) -> None:
+        """Charge (positive) or refund (negative) tokens after the fact."""
+        with self._lock:
+            self._refill(self._clock())
+            self._tokens = min(self.capacity, self._tokens - delta)
+
+
+class ProviderRateLimiter:
+    """Requests/min + tokens/min buckets and a concurrency cap for one provider."""
+
+    def __init__(
+        self,
+        requests_per_minute: int,
+        tokens_per_minute: int = 0,
+        max_concurrency: int = 0,
+        max_retries: int = 3,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], Awaitable[Any]] = asyncio.sleep,
+    ):
+        self.requests = TokenBucket(requests_per_minute, clock=clock) if requests_per_minute > 0 else None
+        self.tokens = TokenBucket(tokens_per_minute, clock=clock) if tokens_per_minute > 0 else None
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self._clock = clock
+        self._sleep = sleep
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+        # asyncio primitives are bound to a loop; recreate if the loop changes
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._semaphore_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _get_semaphore(self) -> Optional[asyncio.Semaphore]:
+        if self.max_concurrency <= 0:
+            return None
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._semaphore_loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._semaphore_loop = loop
+        return self._semaphore
+
+    def pause(self, seconds: float) -> None:
+        """Hold back every queued call for ``seconds`` (provider Retry-After)."""
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, self._clock() + seconds)
+
+    async def acquire(self, estimated_tokens: int = 0) -> None:
+        """Wait for a request slot and enough token budget."""
+        wait = self.requests.reserve(1) if self.requests else 0.0
+        if self.tokens and estimated_tokens:
+            wait = max(wait, self.tokens.reserve(estimated_tokens))
+        with self._lock:
+            wait = max(wait, self._blocked_until - self._clock())
+        if wait > 0:
+            await self._sleep(wait)
+
+    def record_usage(self, estimated_tokens: int, actual_tokens: Optional[int]) -> None:
+        """Reconcile the token bucket with the usage reported by the provider."""
+        if self.tokens and actual_tokens is not None:
+            self.tokens.adjust(actual_tokens - min(estimated_tokens, self.tokens.capacity))
+
+    async def run(
+        self,
+        send: Callable[[], Awaitable[Any]],
+        estimated_tokens: int = 0,
+        usage_of: Optional[Callable[[Any], Optional[int]]] = None,
+    ) -> Any:
+        """Run ``send`` under the limits, retrying 429s after Retry-After."""
+        attempt = 0
+        while True:
+            await self.acquire(estimated_tokens)
+            semaphore = self._get_semaphore()
+            try:
+                if semaphore is not None:
+                    async with semaphore:
+                        result = await send()
+                else:
+                    result = await send()
+            except Exception as exc:
+                if not is_rate_limit_error(exc) or attempt >= self.max_retries:
+                    raise
+                attempt += 1
+                delay = retry_after_seconds(exc)
+                self.pause(delay if delay is not None else min(2.0 ** attempt, 30.0))
+                continue
+            if usage_of is not None:
+                try:
+                    self.record_usage(estimated_tokens, usage_of(result))
+                except Exception:
+                    pass
+            return result
+
+
+_limiters: Dict[str, ProviderRateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(provider: str) -> ProviderRateLimiter:
+    """Return the process-wide limiter for ``provider``, creating it on first use."""
+    key = provider.lower()
+    with _limiters_lock:
+        limiter = _limiters.get(key)
+        if limiter is None:
+            limiter = ProviderRateLimiter(
+                requests_per_minute=settings.MAX_REQUESTS_PER_MINUTE,
+                tokens_per_minute=settings.MAX_TOKENS_PER_MINUTE,
+                max_concurrency=settings.MAX_CONCURRENT_LLM_REQUESTS,
+                max_retries=settings.LLM_MAX_RETRIES,
+            )
+            _limiters[key] = limiter
+        return limiter
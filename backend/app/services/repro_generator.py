@@ -2,17 +2,55 @@
 import json
 from typing import Optional
 from app.schemas.debug_session import DebugSessionCreate, ReproductionResult
-from app.services.llm_client import BaseLLMClient
+from app.config import settings
+from app.services.circuit_breaker import CircuitOpenError
+from app.services.llm_client import BaseLLMClient, last_model_used
+from app.services.prompt_compactor import compact_error_text, count_tokens, truncate_to_budget
+from app.services.single_flight import LeaseCoalescer, SingleFlight, prompt_key
+from app.services import metrics, tracing
+
+# Shared by all generators in this worker so identical prompts coalesce
+_generation_flight = SingleFlight()
 
 
 class ReproductionGenerator:
     """Generates bug reproductions using an LLM."""
     
-    def __init__(self, llm_client: BaseLLMClient):
+    def __init__(
+        self,
+        llm_client: BaseLLMClient,
+        coalescer: Optional[LeaseCoalescer] = None,
+        error_token_budget: Optional[int] = None,
+        code_token_budget: Optional[int] = None,
+        max_library_frames: Optional[int] = None,
+    ):
         self.llm_client = llm_client
+        self.coalescer = coalescer
+        self.error_token_budget = settings.PROMPT_ERROR_TOKEN_BUDGET if error_token_budget is None else error_token_budget
+        self.code_token_budget = settings.PROMPT_CODE_TOKEN_BUDGET if code_token_budget is None else code_token_budget
+        self.max_library_frames = (
+            settings.PROMPT_MAX_LIBRARY_FRAMES if max_library_frames is None else max_library_frames
+        )
     
-    def _build_prompt(self, session_data: DebugSessionCreate) -> tuple[str, str]:
-        """Build the prompt for LLM."""
+    def _build_prompt(
+        self,
+        session_data: DebugSessionCreate,
+        compact: bool = True,
+        feedback: Optional[str] = None,
+        variant: int = 0,
+    ) -> tuple[str, str]:
+        """Build the prompt for LLM, compacting the error text and code snippet.
+
+        ``feedback`` carries sandbox output from earlier attempts that did not
+        reproduce the error; ``variant`` asks for a distinct candidate.
+        """
+
+        error_text = session_data.error_text
+        code_snippet = session_data.code_snippet
+        if compact:
+            error_text = compact_error_text(error_text, self.error_token_budget, self.max_library_frames)
+            if code_snippet:
+                code_snippet = truncate_to_budget(code_snippet, self.code_token_budget)
         
         system_prompt = """You are an expert debugging assistant. Your task is to analyze errors and generate:
 1. A minimal reproduction script
@@ -38,12 +76,12 @@ The test should use appropriate testing frameworks (Jest for JS/TS, pytest for P
 
 **Error:**
 ```
-{session_data.error_text}
+{error_text}
 ```
 
 **Code Snippet:**
 ```
-{session_data.code_snippet or 'Not provided'}
+{code_snippet or 'Not provided'}
 ```
 
 **Context:**
@@ -52,39 +90,94 @@ The test should use appropriate testing frameworks (Jest for JS/TS, pytest for P
 Generate a minimal reproduction, test, explanation, and fix suggestion.
 Respond with ONLY the JSON object, no markdown formatting."""
 
+        if feedback:
+            user_prompt += f"""
+
+**Previous attempts did not reproduce the error when run in the sandbox:**
+```
+{feedback}
+```
+The reproduction must be a standalone program that raises the same error when executed."""
+        if variant:
+            user_prompt += f"\n\n(Candidate #{variant + 1}: try a different way of triggering the error than the obvious one.)"
+
         return system_prompt, user_prompt
     
-    async def generate_reproduction(self, session_data: DebugSessionCreate) -> ReproductionResult:
-        """Generate a reproduction using the LLM."""
+    async def generate_reproduction(
+        self,
+        session_data: DebugSessionCreate,
+        feedback: Optional[str] = None,
+        variant: int = 0,
+    ) -> ReproductionResult:
+        """Generate a reproduction using the LLM.
+
+        Concurrent calls with the same normalized prompt share one LLM call.
+        """
         
-        system_prompt, user_prompt = self._build_prompt(session_data)
+        with tracing.span("repro.build_prompt", variant=variant) as span:
+            system_prompt, user_prompt = self._build_prompt(session_data, feedback=feedback, variant=variant)
+            tokens_after = count_tokens(system_prompt) + count_tokens(user_prompt)
+            tokens_before = count_tokens(system_prompt) + count_tokens(
+                self._build_prompt(session_data, compact=False, feedback=feedback, variant=variant)[1]
+            )
+            if span is not None:
+                span.set(prompt_tokens_before=tokens_before, prompt_tokens_after=tokens_after)
+        key = prompt_key(
+            type(self.llm_client).__name__,
+            str(getattr(self.llm_client, "model", "")),
+            system_prompt,
+            user_prompt,
+        )
+
+        async def _leader() -> ReproductionResult:
+            if self.coalescer is None or not self.coalescer.enabled:
+                return await self._generate(system_prompt, user_prompt)
+
+            async def _generate_dict() -> dict:
+                return (await self._generate(system_prompt, user_prompt)).model_dump()
+
+            return ReproductionResult(**await self.coalescer.do(key, _generate_dict))
+
+        result = await _generation_flight.do(key, _leader)
+        # Followers may share the leader's result object; counts are per request
+        return result.model_copy(update={
+            "prompt_tokens_before": tokens_before,
+            "prompt_tokens_after": tokens_after,
+        })
+
+    async def _generate(self, system_prompt: str, user_prompt: str) -> ReproductionResult:
+        """Call the LLM and parse its JSON answer."""
         
         try:
             # Get response from LLM
-            response = await self.llm_client.generate_completion(user_prompt, system_prompt)
-            
-            # Clean response (remove markdown code blocks if present)
-            response = response.strip()
-            if response.startswith("```json"):
-                response = response[7:]
-            if response.startswith("```"):
-                response = response[3:]
-            if response.endswith("```"):
-                response = response[:-3]
-            response = response.strip()
+            with tracing.span("llm.completion", client=type(self.llm_client).__name__):
+                response = await self.llm_client.generate_completion(user_prompt, system_prompt)
             
-            # Parse JSON
-            result_dict = json.loads(response)
+            with tracing.span("repro.parse", response_chars=len(response)):
+                # Clean response (remove markdown code blocks if present)
+                response = response.strip()
+                if response.startswith("```json"):
+                    response = response[7:]
+                if response.startswith("```"):
+                    response = response[3:]
+                if response.endswith("```"):
+                    response = response[:-3]
+                response = response.strip()
+                
+                # Parse JSON
+                result_dict = json.loads(response)
             
             # Validate and create result
             return ReproductionResult(
                 repro_code=result_dict.get("repro_code", ""),
                 test_code=result_dict.get("test_code", ""),
                 explanation=result_dict.get("explanation", ""),
-                fix_suggestion=result_dict.get("fix_suggestion", "")
+                fix_suggestion=result_dict.get("fix_suggestion", ""),
+                llm_model=last_model_used(),
             )
             
         except json.JSONDecodeError as e:
+            metrics.repro_parse_failures.inc()
             # Fallback: try to extract information manually
             return ReproductionResult(
                 repro_code="// Error: Could not parse LLM response",
@@ -92,5 +185,7 @@ Respond with ONLY the JSON object, no markdown formatting."""
                 explanation=f"Failed to parse LLM response: {str(e)}\n\nRaw response:\n{response[:500]}",
                 fix_suggestion="Please try again or provide more context."
             )
+        except CircuitOpenError:
+            raise
         except Exception as e:
             raise Exception(f"Error generating reproduction: {str(e)}")
@@ -0,0 +1,135 @@
+"""Generate-verify loop for reproductions.
+
+Asks the LLM for several candidate reproductions concurrently, runs each in
+the sandbox as soon as it arrives and accepts the first whose output shows
+the original error. If no candidate matches, the next round is prompted
+with the sandbox output, until the time budget runs out.
+"""
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import List, Optional, Set, Tuple
+
+from app.schemas.debug_session import DebugSessionCreate, ReproductionResult
+from app.services.error_types import exception_types
+from app.services.repro_generator import ReproductionGenerator
+from app.services.sandbox_runner import SandboxRunner
+
+# Languages the sandbox has images for
+VERIFIABLE_LANGUAGES = {"python", "node", "javascript", "typescript", "java"}
+
+
+def output_matches(signature: Set[str], run: dict) -> bool:
+    """True if a sandbox run raised one of the signature's exception types."""
+    if not signature or run.get("exit_code", 0) == 0:
+        return False
+    output = f"{run.get('stderr', '')}\n{run.get('stdout', '')}"
+    return bool(signature & exception_types(output))
+
+
+@dataclass
+class VerificationOutcome:
+    """Best reproduction found and how verification went."""
+
+    result: ReproductionResult
+    verified: bool
+    attempts: int
+    elapsed_ms: int
+    run: Optional[dict] = None
+
+
+class ReproVerifier:
+    """Orchestrates parallel candidate generation and sandbox verification."""
+
+    def __init__(
+        self,
+        generator: ReproductionGenerator,
+        runner: SandboxRunner,
+        candidates: int = 3,
+        time_budget_sec: float = 60.0,
+        max_rounds: int = 3,
+        run_timeout_sec: int = 10,
+    ):
+        self.generator = generator
+        self.runner = runner
+        self.candidates = max(1, candidates)
+        self.time_budget_sec = time_budget_sec
+        self.max_rounds = max(1, max_rounds)
+        self.run_timeout_sec = run_timeout_sec
+
+    async def _attempt(
+        self, session_data: DebugSessionCreate, variant: int, feedback: Optional[str]
+    ) -> Tuple[ReproductionResult, Optional[dict]]:
+        result = await self.generator.generate_reproduction(session_data, feedback=feedback, variant=variant)
+        try:
+            run = await asyncio.to_thread(
+                self.runner.run_in_sandbox,
+                language=session_data.language,
+                code=result.repro_code,
+                timeout_sec=self.run_timeout_sec,
+            )
+        except Exception as e:
+            # Sandbox unavailable: keep the candidate, report it as unverified
+            run = {"stdout": "", "stderr": f"Sandbox execution failed: {e}", "exit_code": -1, "status": "error"}
+        return result, run
+
+    @staticmethod
+    def _feedback(runs: List[dict], limit: int = 1500) -> str:
+        parts = []
+        for i, run in enumerate(runs[:3], 1):
+            output = (run.get("stderr") or run.get("stdout") or "(no output)").strip()
+            parts.append(f"Attempt {i} (exit code {run.get('exit_code')}):\n{output[-limit:]}")
+        return "\n\n".join(parts)
+
+    async def generate_verified(self, session_data: DebugSessionCreate) -> VerificationOutcome:
+        """Return the first candidate that reproduces the error, or the best effort."""
+        start = time.monotonic()
+        deadline = start + self.time_budget_sec
+        signature = exception_types(session_data.error_text)
+        best: Optional[ReproductionResult] = None
+        best_run: Optional[dict] = None
+        attempts = 0
+        feedback: Optional[str] = None
+
+        def elapsed_ms() -> int:
+            return int((time.monotonic() - start) * 1000)
+
+        if not signature or session_data.language.lower() not in VERIFIABLE_LANGUAGES:
+            result = await self.generator.generate_reproduction(session_data)
+            return VerificationOutcome(result, verified=False, attempts=1, elapsed_ms=elapsed_ms())
+
+        for _ in range(self.max_rounds):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            tasks = [
+                asyncio.create_task(self._attempt(session_data, variant, feedback))
+                for variant in range(self.candidates)
+            ]
+            failed_runs: List[dict] = []
+            try:
+                for next_done in asyncio.as_completed(tasks, timeout=remaining):
+                    try:
+                        result, run = await next_done
+                    except asyncio.TimeoutError:
+                        break
+                    except Exception:
+                        continue
+                    attempts += 1
+                    if best is None:
+                        best, best_run = result, run
+                    if output_matches(signature, run):
+                        return VerificationOutcome(result, True, attempts, elapsed_ms(), run)
+                    failed_runs.append(run)
+            finally:
+                for task in tasks:
+                    task.cancel()
+            if not failed_runs:
+                break
+            feedback = self._feedback(failed_runs)
+
+        if best is None:
+            # Every generation failed or timed out; surface a real error
+            best = await self.generator.generate_reproduction(session_data)
+            attempts += 1
+        return VerificationOutcome(best, False, attempts, elapsed_ms(), best_run)
@@ -0,0 +1,286 @@
+"""Retention for runs and debug sessions, with monthly partitions on Postgres.
+
+Run it periodically, e.g. daily from cron:
+    python -m app.services.retention
+
+On Postgres, migration 0004 partitions ``runs`` and ``debug_sessions`` by
+month of ``created_at``. Each pass does the following:
+
+1. Creates the monthly partitions for the next ``PARTITION_MONTHS_AHEAD``
+   months, so new rows never land in the default partition.
+2. Archives rows older than the table's retention window into
+   ``retention_archive``, as gzip-compressed NDJSON with one entry per month
+   and batch. Runs take their output chunks with them.
+3. Removes those rows. Fully expired partitions are detached and dropped, so
+   no index or table bloat is left behind. The rest are deleted in batches.
+   This is the only path on other databases.
+
+Archiving a batch or partition and removing it happen in one transaction, so
+a crash never loses rows and never archives them twice. The ``/api/stats``
+rollups are kept; do not ``rebuild_rollups`` over archived ranges.
+"""
+import argparse
+import asyncio
+import gzip
+import json
+import logging
+import re
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Dict, List, Optional, Sequence, Tuple
+from uuid import UUID
+
+from sqlalchemy import and_, delete, or_, select, text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.models.archive import RetentionArchive
+from app.models.debug_session import DebugSession
+from app.models.run import Run, RunOutputChunk
+from app.services.serialization import json_default
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_CODEC = "gzip"
+_PARTITION_SUFFIX = re.compile(r"_p(\d{4})_(\d{2})$")
+
+
+@dataclass(frozen=True)
+class RetentionPolicy:
+    """Keep rows of ``model`` for ``days`` days (0 keeps them forever)."""
+
+    model: type
+    days: int
+
+
+def policies_from_settings() -> List[RetentionPolicy]:
+    return [
+        RetentionPolicy(Run, settings.RUN_RETENTION_DAYS),
+        RetentionPolicy(DebugSession, settings.SESSION_RETENTION_DAYS),
+    ]
+
+
+def month_start(at: datetime) -> datetime:
+    return at.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def add_months(month: datetime, months: int) -> datetime:
+    years, index = divmod(month.month - 1 + months, 12)
+    return month.replace(year=month.year + years, month=index + 1)
+
+
+def partition_name(table: str, month: datetime) -> str:
+    return f"{table}_p{month:%Y_%m}"
+
+
+# ---------------------------------------------------------------------------
+# Archive encoding
+
+
+def encode_archive(rows: Sequence[Dict]) -> bytes:
+    """Rows as gzip-compressed NDJSON."""
+    lines = "".join(json.dumps(row, default=json_default, ensure_ascii=False) + "\n" for row in rows)
+    return gzip.compress(lines.encode("utf-8"), compresslevel=6)
+
+
+def decode_archive(data: bytes) -> List[Dict]:
+    return [json.loads(line) for line in gzip.decompress(data).decode("utf-8").splitlines()]
+
+
+def _add_archives(db: AsyncSession, table_name: str, rows_by_month: Dict[datetime, List[Dict]]) -> None:
+    for month, rows in sorted(rows_by_month.items()):
+        db.add(RetentionArchive(
+            table_name=table_name,
+            period_start=month,
+            row_count=len(rows),
+            codec=ARCHIVE_CODEC,
+            data=encode_archive(rows),
+        ))
+
+
+async def _archive_batch(db: AsyncSession, model, rows: List[Dict]) -> None:
+    """Archive ``rows`` of ``model`` (and, for runs, their output chunks)."""
+    by_month: Dict[datetime, List[Dict]] = defaultdict(list)
+    for row in rows:
+        by_month[month_start(row["created_at"])].append(row)
+    _add_archives(db, model.__tablename__, by_month)
+
+    if model is Run:
+        month_of = {row["id"]: month_start(row["created_at"]) for row in rows}
+        chunks: Dict[datetime, List[Dict]] = defaultdict(list)
+        result = await db.execute(
+            select(RunOutputChunk.__table__).where(RunOutputChunk.run_id.in_(list(month_of)))
+        )
+        for chunk in result:
+            chunks[month_of[chunk.run_id]].append(dict(chunk._mapping))
+        _add_archives(db, RunOutputChunk.__tablename__, chunks)
+        await db.execute(delete(RunOutputChunk).where(RunOutputChunk.run_id.in_(list(month_of))))
+
+
+async def _batches(
+    db: AsyncSession, model, start: Optional[datetime], end: datetime, batch_size: int
+) -> AsyncIterator[List[Dict]]:
+    """Rows with ``start <= created_at < end`` in (created_at, id) order, ``batch_size`` at a time."""
+    table = model.__table__
+    after: Optional[Tuple[datetime, UUID]] = None
+    while True:
+        query = select(table).where(table.c.created_at < end)
+        if start is not None:
+            query = query.where(table.c.created_at >= start)
+        if after is not None:
+            query = query.where(or_(
+                table.c.created_at > after[0],
+                and_(table.c.created_at == after[0], table.c.id > after[1]),
+            ))
+        result = await db.execute(query.order_by(table.c.created_at, table.c.id).limit(batch_size))
+        rows = [dict(row._mapping) for row in result]
+        if not rows:
+            return
+        yield rows
+        after = (rows[-1]["created_at"], rows[-1]["id"])
+
+
+# ---------------------------------------------------------------------------
+# Postgres partitions
+
+
+async def is_partitioned(db: AsyncSession, table: str) -> bool:
+    if db.bind.dialect.name != "postgresql":
+        return False
+    result = await db.execute(
+        text(
+            "SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+            "WHERE c.relname = :table"
+        ),
+        {"table": table},
+    )
+    return result.first() is not None
+
+
+async def monthly_partitions(db: AsyncSession, table: str) -> Dict[datetime, str]:
+    """Month -> partition name, for partitions named by ``partition_name``."""
+    result = await db.execute(
+        text(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid JOIN pg_class p ON p.oid = i.inhparent "
+            "WHERE p.relname = :table"
+        ),
+        {"table": table},
+    )
+    partitions = {}
+    for (name,) in result:
+        match = _PARTITION_SUFFIX.search(name)
+        if match and name == partition_name(table, datetime(int(match[1]), int(match[2]), 1)):
+            partitions[datetime(int(match[1]), int(match[2]), 1)] = name
+    return partitions
+
+
+async def ensure_partitions(db: AsyncSession, table: str, now: datetime, months_ahead: int) -> List[str]:
+    """Create missing partitions from this month through ``months_ahead`` months ahead."""
+    existing = await monthly_partitions(db, table)
+    created = []
+    for offset in range(months_ahead + 1):
+        month = add_months(month_start(now), offset)
+        if month in existing:
+            continue
+        name = partition_name(table, month)
+        try:
+            async with db.begin_nested():
+                await db.execute(text(
+                    f'CREATE TABLE "{name}" PARTITION OF "{table}" '
+                    f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{add_months(month, 1):%Y-%m-%d}')"
+                ))
+        except DBAPIError:
+            # The default partition already holds rows for that month
+            logger.warning("could not create partition %s", name, exc_info=True)
+            continue
+        created.append(name)
+    await db.commit()
+    return created
+
+
+async def _drop_expired_partitions(
+    db: AsyncSession, model, cutoff: datetime, batch_size: int
+) -> Tuple[int, List[str]]:
+    table = model.__tablename__
+    archived, dropped = 0, []
+    for month, name in sorted((await monthly_partitions(db, table)).items()):
+        if add_months(month, 1) > cutoff:
+            break
+        async for rows in _batches(db, model, month, add_months(month, 1), batch_size):
+            await _archive_batch(db, model, rows)
+            archived += len(rows)
+        await db.execute(text(f'ALTER TABLE "{table}" DETACH PARTITION "{name}"'))
+        await db.execute(text(f'DROP TABLE "{name}"'))
+        await db.commit()
+        dropped.append(name)
+    return archived, dropped
+
+
+async def _delete_expired_rows(db: AsyncSession, model, cutoff: datetime, batch_size: int) -> int:
+    deleted = 0
+    async for rows in _batches(db, model, None, cutoff, batch_size):
+        await _archive_batch(db, model, rows)
+        await db.execute(delete(model).where(model.id.in_([row["id"] for row in rows])))
+        await db.commit()
+        deleted += len(rows)
+    return deleted
+
+
+async def run_retention(
+    db: AsyncSession,
+    now: Optional[datetime] = None,
+    policies: Optional[Sequence[RetentionPolicy]] = None,
+    batch_size: Optional[int] = None,
+    months_ahead: Optional[int] = None,
+) -> List[Dict]:
+    """One retention pass over every policy; returns a report per table."""
+    now = now or datetime.utcnow()
+    batch_size = batch_size or settings.RETENTION_BATCH_SIZE
+    months_ahead = settings.PARTITION_MONTHS_AHEAD if months_ahead is None else months_ahead
+
+    reports = []
+    for policy in policies or policies_from_settings():
+        table = policy.model.__tablename__
+        report = {
+            "table": table,
+            "retention_days": policy.days,
+            "archived_rows": 0,
+            "created_partitions": [],
+            "dropped_partitions": [],
+        }
+        partitioned = await is_partitioned(db, table)
+        if partitioned:
+            report["created_partitions"] = await ensure_partitions(db, table, now, months_ahead)
+        if policy.days > 0:
+            cutoff = now - timedelta(days=policy.days)
+            report["cutoff"] = cutoff.isoformat()
+            if partitioned:
+                archived, report["dropped_partitions"] = await _drop_expired_partitions(
+                    db, policy.model, cutoff, batch_size
+                )
+                report["archived_rows"] += archived
+            report["archived_rows"] += await _delete_expired_rows(db, policy.model, cutoff, batch_size)
+        reports.append(report)
+    return reports
+
+
+async def _main() -> None:
+    from app.db.session import AsyncSessionLocal, async_engine
+
+    async with AsyncSessionLocal() as db:
+        reports = await run_retention(db)
+    await async_engine.dispose()
+    print(json.dumps(reports, indent=2))
+
+
+def main() -> None:
+    argparse.ArgumentParser(description=__doc__.split("\n")[0]).parse_args()
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_main())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,293 @@
+"""Run state and log broker shared by the HTTP and WebSocket run endpoints.
+
+A broker keeps the latest ``RunResponse`` of each run plus an ordered,
+bounded log of events (stdout/stderr chunks and a final ``complete``), and
+fans new events out to subscribers. Every event carries a per-run ``seq``,
+so a reader can subscribe first, replay the history and then skip live
+events it has already seen, without gaps or duplicates.
+
+``InProcessRunBroker`` only serves the worker it lives in. ``RedisRunBroker``
+keeps state in Redis and uses Redis pub/sub, so a WebSocket can land on any
+worker. It speaks the plain Redis protocol, so anything compatible
+(Redis, Valkey, KeyDB or a local stand-in) works.
+"""
+import asyncio
+import json
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict, defaultdict, deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Callable, Deque, Dict, List, Optional, Set
+
+from app.config import settings
+from app.schemas.run import RunResponse
+
+# Largest stdout/stderr chunk published as one event
+LOG_CHUNK_CHARS = 4096
+
+
+class RunBroker(ABC):
+    """Interface for run state storage and log fan-out."""
+
+    @abstractmethod
+    async def put_run(self, run: RunResponse) -> None:
+        pass
+
+    @abstractmethod
+    async def get_run(self, run_id: str) -> Optional[RunResponse]:
+        pass
+
+    @abstractmethod
+    async def publish(self, run_id: str, event: dict) -> dict:
+        """Append ``event`` to the run's log, notify subscribers, return it with its ``seq``."""
+        pass
+
+    @abstractmethod
+    async def history(self, run_id: str) -> List[dict]:
+        """Retained events for ``run_id``, oldest first."""
+        pass
+
+    @abstractmethod
+    def subscribe(self, run_id: str):
+        """Async context manager yielding an async iterator of live events."""
+        pass
+
+    async def close(self) -> None:
+        pass
+
+
+def output_chunks(text: Optional[str], limit: int = LOG_CHUNK_CHARS) -> List[str]:
+    """Split output into chunks of whole lines, each at most ``limit`` characters where possible."""
+    if not text:
+        return []
+    chunks, current, size = [], [], 0
+    for line in text.split("\n"):
+        if current and size + len(line) + 1 > limit:
+            chunks.append("\n".join(current))
+            current, size = [], 0
+        current.append(line)
+        size += len(line) + 1
+    chunks.append("\n".join(current))
+    return chunks
+
+
+async def publish_finished_run(broker: RunBroker, run: RunResponse) -> None:
+    """Store a finished run and publish its output followed by ``complete``."""
+    await broker.put_run(run)
+    for stream in ("stdout", "stderr"):
+        for chunk in output_chunks(getattr(run, stream)):
+            await broker.publish(run.run_id, {"type": stream, "data": chunk})
+    await broker.publish(run.run_id, {"type": "complete", "status": run.status})
+
+
+# ---------------------------------------------------------------------------
+# In-process
+# ---------------------------------------------------------------------------
+
+@dataclass
+class _RunEntry:
+    expires_at: float
+    log: Deque[dict]
+    run: Optional[RunResponse] = None
+    seq: int = 0
+
+
+@dataclass(eq=False)
+class _Subscription:
+    loop: asyncio.AbstractEventLoop
+    queue: asyncio.Queue = field(default_factory=asyncio.Queue)
+
+
+class InProcessRunBroker(RunBroker):
+    """Broker for a single worker, bounded by TTL and by number of runs (LRU)."""
+
+    def __init__(
+        self,
+        ttl_sec: float = 3600,
+        max_runs: int = 1000,
+        max_log_events: int = 5000,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.ttl_sec = ttl_sec
+        self.max_runs = max_runs
+        self.max_log_events = max_log_events
+        self._clock = clock
+        self._runs: "OrderedDict[str, _RunEntry]" = OrderedDict()
+        self._subscribers: Dict[str, Set[_Subscription]] = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._expire()
+            return len(self._runs)
+
+    def _expire(self) -> None:
+        now = self._clock()
+        # Entries are kept in last-write order, so expired ones are at the front
+        while self._runs:
+            run_id, entry = next(iter(self._runs.items()))
+            if entry.expires_at > now:
+                break
+            del self._runs[run_id]
+
+    def _entry(self, run_id: str, create: bool) -> Optional[_RunEntry]:
+        self._expire()
+        entry = self._runs.get(run_id)
+        if entry is None and create:
+            entry = _RunEntry(expires_at=0.0, log=deque(maxlen=self.max_log_events))
+            self._runs[run_id] = entry
+        if entry is not None and create:
+            entry.expires_at = self._clock() + self.ttl_sec
+            self._runs.move_to_end(run_id)
+            while len(self._runs) > self.max_runs:
+                self._runs.popitem(last=False)
+        return entry
+
+    async def put_run(self, run: RunResponse) -> None:
+        with self._lock:
+            self._entry(run.run_id, create=True).run = run
+
+    async def get_run(self, run_id: str) -> Optional[RunResponse]:
+        with self._lock:
+            entry = self._entry(run_id, create=False)
+            return entry.run if entry else None
+
+    async def publish(self, run_id: str, event: dict) -> dict:
+        with self._lock:
+            entry = self._entry(run_id, create=True)
+            entry.seq += 1
+            event = {**event, "seq": entry.seq}
+            entry.log.append(event)
+            subscribers = list(self._subscribers.get(run_id, ()))
+        for sub in subscribers:
+            sub.loop.call_soon_threadsafe(sub.queue.put_nowait, event)
+        return event
+
+    async def history(self, run_id: str) -> List[dict]:
+        with self._lock:
+            entry = self._entry(run_id, create=False)
+            return list(entry.log) if entry else []
+
+    @asynccontextmanager
+    async def subscribe(self, run_id: str) -> AsyncIterator[AsyncIterator[dict]]:
+        sub = _Subscription(loop=asyncio.get_running_loop())
+        with self._lock:
+            self._subscribers[run_id].add(sub)
+
+        async def events() -> AsyncIterator[dict]:
+            while True:
+                yield await sub.queue.get()
+
+        try:
+            yield events()
+        finally:
+            with self._lock:
+                subs = self._subscribers.get(run_id)
+                if subs is not None:
+                    subs.discard(sub)
+                    if not subs:
+                        del self._subscribers[run_id]
+
+
+# ---------------------------------------------------------------------------
+# Redis protocol
+# ---------------------------------------------------------------------------
+
+class RedisRunBroker(RunBroker):
+    """Broker shared by all workers through a Redis-protocol server.
+
+    State and logs expire after ``ttl_sec``; each run's log is trimmed to
+    ``max_log_events``. Total size is bounded by the TTL and the server's
+    own ``maxmemory`` policy.
+    """
+
+    def __init__(
+        self,
+        url: Optional[str] = None,
+        client=None,
+        ttl_sec: int = 3600,
+        max_log_events: int = 5000,
+        prefix: str = "bugghost:run:",
+    ):
+        if client is None:
+            import redis.asyncio as redis  # optional dependency, only needed for RUN_BROKER_URL
+
+            client = redis.from_url(url, decode_responses=True)
+        self.client = client
+        self.ttl_sec = ttl_sec
+        self.max_log_events = max_log_events
+        self.prefix = prefix
+
+    def _key(self, run_id: str, suffix: str = "") -> str:
+        return f"{self.prefix}{run_id}{suffix}"
+
+    async def put_run(self, run: RunResponse) -> None:
+        await self.client.set(self._key(run.run_id), run.model_dump_json(), ex=self.ttl_sec)
+
+    async def get_run(self, run_id: str) -> Optional[RunResponse]:
+        raw = await self.client.get(self._key(run_id))
+        return RunResponse.model_validate_json(raw) if raw else None
+
+    async def publish(self, run_id: str, event: dict) -> dict:
+        seq_key, log_key = self._key(run_id, ":seq"), self._key(run_id, ":log")
+        seq = await self.client.incr(seq_key)
+        event = {**event, "seq": seq}
+        payload = json.dumps(event)
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.rpush(log_key, payload)
+            pipe.ltrim(log_key, -self.max_log_events, -1)
+            pipe.expire(log_key, self.ttl_sec)
+            pipe.expire(seq_key, self.ttl_sec)
+            pipe.publish(self._key(run_id, ":events"), payload)
+            await pipe.execute()
+        return event
+
+    async def history(self, run_id: str) -> List[dict]:
+        return [json.loads(item) for item in await self.client.lrange(self._key(run_id, ":log"), 0, -1)]
+
+    @asynccontextmanager
+    async def subscribe(self, run_id: str) -> AsyncIterator[AsyncIterator[dict]]:
+        channel = self._key(run_id, ":events")
+        pubsub = self.client.pubsub()
+        await pubsub.subscribe(channel)
+
+        async def events() -> AsyncIterator[dict]:
+            while True:
+                message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                if message and message.get("type") == "message":
+                    yield json.loads(message["data"])
+
+        try:
+            yield events()
+        finally:
+            await pubsub.unsubscribe(channel)
+            await pubsub.aclose()
+
+    async def close(self) -> None:
+        await self.client.aclose()
+
+
+_broker: Optional[RunBroker] = None
+_broker_lock = threading.Lock()
+
+
+def get_run_broker() -> RunBroker:
+    """Process-wide broker: Redis when ``RUN_BROKER_URL`` is set, else in-process."""
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            if settings.RUN_BROKER_URL:
+                _broker = RedisRunBroker(
+                    settings.RUN_BROKER_URL,
+                    ttl_sec=settings.RUN_STATE_TTL_SEC,
+                    max_log_events=settings.RUN_LOG_MAX_EVENTS,
+                )
+            else:
+                _broker = InProcessRunBroker(
+                    ttl_sec=settings.RUN_STATE_TTL_SEC,
+                    max_runs=settings.RUN_STATE_MAX_RUNS,
+                    max_log_events=settings.RUN_LOG_MAX_EVENTS,
+                )
+        return _broker
@@ -0,0 +1,80 @@
+"""Compressed chunk storage for run stdout/stderr.
+
+A run's output can reach 1 MiB per stream. Storing it inline made every
+``runs`` row and every ``GET /api/runs/{id}`` response that large. Instead,
+each stream is encoded as UTF-8 and cut into fixed ``CHUNK_BYTES`` slices.
+Each slice is compressed and stored as a ``run_output_chunks`` row. The
+``runs`` row keeps only a short preview and the byte size of each stream.
+
+Because chunks have a fixed uncompressed size, a byte range maps directly
+to the chunks that hold it. A range read only fetches and decompresses
+those chunks.
+"""
+from functools import lru_cache
+from typing import Callable, Dict, List, Tuple
+from uuid import UUID
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.models.run import RunOutputChunk
+
+STREAMS = ("stdout", "stderr")
+CHUNK_BYTES = 64 * 1024
+
+
+@lru_cache(maxsize=None)
+def _codec(name: str) -> Tuple[Callable[[bytes], bytes], Callable[[bytes], bytes]]:
+    """(compress, decompress) for a codec name stored with each chunk."""
+    if name == "zlib":
+        import zlib
+
+        return (lambda data: zlib.compress(data, 6)), zlib.decompress
+    if name == "zstd":
+        import zstandard  # optional dependency, only needed for RUN_OUTPUT_CODEC=zstd
+
+        return zstandard.ZstdCompressor(level=3).compress, zstandard.ZstdDecompressor().decompress
+    raise ValueError(f"Unknown run output codec: {name}")
+
+
+def pack_run_output(
+    values: Dict,
+    codec: str = settings.RUN_OUTPUT_CODEC,
+    preview_chars: int = settings.RUN_OUTPUT_PREVIEW_CHARS,
+) -> Tuple[Dict, List[Dict]]:
+    """Split a finished run into its ``runs`` row (previews and sizes) and its chunk rows."""
+    compress = _codec(codec)[0]
+    row = dict(values)
+    chunks = []
+    for stream in STREAMS:
+        text = values.get(stream) or ""
+        data = text.encode("utf-8")
+        row[stream] = text[:preview_chars]
+        row[f"{stream}_bytes"] = len(data)
+        for index, offset in enumerate(range(0, len(data), CHUNK_BYTES)):
+            chunks.append({
+                "run_id": values["id"],
+                "stream": stream,
+                "chunk_index": index,
+                "codec": codec,
+                "data": compress(data[offset:offset + CHUNK_BYTES]),
+            })
+    return row, chunks
+
+
+async def read_output_range(db: AsyncSession, run_id: UUID, stream: str, start: int, end: int) -> bytes:
+    """Bytes ``start``..``end`` (inclusive) of a chunked stream."""
+    first, last = start // CHUNK_BYTES, end // CHUNK_BYTES
+    rows = await db.execute(
+        select(RunOutputChunk.codec, RunOutputChunk.data)
+        .where(
+            RunOutputChunk.run_id == run_id,
+            RunOutputChunk.stream == stream,
+            RunOutputChunk.chunk_index.between(first, last),
+        )
+        .order_by(RunOutputChunk.chunk_index)
+    )
+    data = b"".join(_codec(codec)[1](blob) for codec, blob in rows)
+    offset = start - first * CHUNK_BYTES
+    return data[offset:offset + end - start + 1]
@@ -0,0 +1,152 @@
+"""Group-commit writer for finished runs.
+
+Persisting each run with its own transaction makes ``POST /api/runs``
+commit-bound under load. The writer batches concurrent requests instead.
+``persist`` queues a run and waits. A background task collects queued runs
+for up to ``max_delay_ms`` or ``max_batch`` rows. It then writes all of them
+in one transaction: multi-row INSERTs of the runs and their compressed output
+chunks, plus the aggregated rollup upserts.
+
+The handoff is durable. ``persist`` returns only after the batch holding the
+run has committed, so a run is never acknowledged before it is on disk. A
+crash before the commit fails the request rather than losing a run the
+client was told about. If a batch fails, its runs are retried one by one, so
+a single bad row (e.g. a foreign key to a deleted team) only fails its own
+request.
+"""
+import asyncio
+import contextvars
+import logging
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.db.session import AsyncSessionLocal
+from app.models.run import Run, RunOutputChunk
+from app.services.run_output import pack_run_output
+from app.services.stats_rollups import record_runs
+from app.services import tracing
+
+logger = logging.getLogger(__name__)
+
+_Pending = Tuple[Dict, asyncio.Future]
+
+
+class RunWriter:
+    """Batches Run inserts from concurrent requests into group commits."""
+
+    def __init__(
+        self,
+        session_factory: Callable[[], AsyncSession] = AsyncSessionLocal,
+        max_batch: int = 200,
+        max_delay_ms: float = 5.0,
+    ):
+        self.session_factory = session_factory
+        self.max_batch = max(1, max_batch)
+        self.max_delay_sec = max(0.0, max_delay_ms) / 1000
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional["asyncio.Queue[Optional[_Pending]]"] = None
+        self._task: Optional[asyncio.Task] = None
+        self.batches = 0
+        self.rows = 0
+
+    def _ensure_started(self) -> "asyncio.Queue[Optional[_Pending]]":
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._task is None or self._task.done():
+            # One writer task per event loop (test clients may run several loops).
+            # Fresh context: the task must not inherit the first caller's trace span.
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._task = loop.create_task(self._run(self._queue), context=contextvars.Context())
+        return self._queue
+
+    async def persist(self, values: Dict) -> None:
+        """Insert one run; returns once the batch containing it has committed.
+
+        ``values`` maps Run column names to values. Raises the database error
+        if the run could not be written.
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._ensure_started().put_nowait((values, future))
+        await future
+
+    async def close(self) -> None:
+        """Write everything queued so far and stop the background task."""
+        if self._task is None or self._task.done() or self._loop is not asyncio.get_running_loop():
+            return
+        self._queue.put_nowait(None)
+        await self._task
+
+    async def _run(self, queue: "asyncio.Queue[Optional[_Pending]]") -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            batch: List[_Pending] = [item]
+            closing = False
+            deadline = loop.time() + self.max_delay_sec
+            while len(batch) < self.max_batch:
+                if not queue.empty():
+                    item = queue.get_nowait()
+                else:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                if item is None:
+                    closing = True
+                    break
+                batch.append(item)
+            await self._flush(batch)
+            if closing:
+                return
+
+    async def _flush(self, batch: List[_Pending]) -> None:
+        rows = [values for values, _ in batch]
+        try:
+            with tracing.span("run_writer.flush", rows=len(rows)):
+                run_rows, chunk_rows = await asyncio.to_thread(_pack_batch, rows)
+                async with self.session_factory() as db:
+                    await db.execute(insert(Run), run_rows)
+                    if chunk_rows:
+                        await db.execute(insert(RunOutputChunk), chunk_rows)
+                    await record_runs(db, rows)
+                    await db.commit()
+        except Exception as exc:
+            if len(batch) == 1:
+                _, future = batch[0]
+                if not future.done():
+                    future.set_exception(exc)
+                return
+            logger.warning("group commit of %d runs failed; retrying one by one", len(batch), exc_info=True)
+            for pending in batch:
+                await self._flush([pending])
+            return
+
+        self.batches += 1
+        self.rows += len(batch)
+        for _, future in batch:
+            if not future.done():
+                future.set_result(None)
+
+
+def _pack_batch(rows: List[Dict]) -> Tuple[List[Dict], List[Dict]]:
+    """Compress the output of a batch (off the event loop)."""
+    run_rows, chunk_rows = [], []
+    for values in rows:
+        row, chunks = pack_run_output(values)
+        run_rows.append(row)
+        chunk_rows.extend(chunks)
+    return run_rows, chunk_rows
+
+
+run_writer = RunWriter(
+    max_batch=settings.RUN_WRITER_MAX_BATCH,
+    max_delay_ms=settings.RUN_WRITER_MAX_DELAY_MS,
+)
@@ -18,21 +18,57 @@ class SandboxResult(BaseModel):
 
 import io
 import uuid
-from typing import Optional, Dict, List
-import docker
+from typing import TYPE_CHECKING, Optional, Dict, List
+
+from app.services import metrics, tracing
+from app.services.circuit_breaker import CircuitOpenError, get_circuit_breaker
+
+if TYPE_CHECKING:
+    import docker
+
+
+def _step_timer(step: str):
+    return metrics.container_step_duration.labels(step).time()
+
+
+def is_daemon_outage(exc: BaseException) -> bool:
+    """Whether ``exc`` means the Docker daemon is unreachable or failing.
+
+    Only these feed the "docker" breaker. A missing image, a rejected create
+    or any other 4xx answer means the daemon is up. Connection errors raised
+    while the client is created arrive wrapped in a ``DockerException``, so
+    the cause is checked too.
+    """
+    import docker.errors
+    import requests
+
+    while exc is not None:
+        if isinstance(exc, docker.errors.APIError):
+            return exc.status_code is not None and exc.status_code >= 500
+        if isinstance(exc, (requests.ConnectionError, requests.Timeout, ConnectionError, TimeoutError)):
+            return True
+        exc = exc.__cause__
+    return False
 
 
 class SandboxRunner:
     """Docker-based sandbox runner with strict resource limits and no networking."""
 
+    _LANGUAGES = ("python", "node", "javascript", "typescript", "java")
+
     def __init__(self, docker_host: Optional[str] = None):
         # Lazy init to reduce cold start; connect to DinD or local Docker.
         self._docker_host = docker_host
-        self._client: Optional[docker.DockerClient] = None
+        self._client: Optional["docker.DockerClient"] = None
+        # Shared by all runners: an unreachable daemon fails every run fast
+        self.breaker = get_circuit_breaker("docker", is_failure=is_daemon_outage)
 
     @property
-    def client(self) -> docker.DockerClient:
+    def client(self) -> "docker.DockerClient":
         if self._client is None:
+            # The Docker SDK (and requests) is only imported once a run needs it
+            import docker
+
             self._client = docker.DockerClient(base_url=self._docker_host) if self._docker_host else docker.from_env()
         return self._client
 
@@ -67,6 +103,21 @@ class SandboxRunner:
         - Drop capabilities and prevent privilege escalation
         - Read-only rootfs with tmpfs mounted at /workspace (rw)
         """
+        # Unknown languages run as Python but are counted apart
+        metric_language = language.lower() if language.lower() in self._LANGUAGES else "other"
+        try:
+            with self.breaker.guard():
+                result = self._run(language, code, timeout_sec)
+        except CircuitOpenError:
+            metrics.sandbox_runs.labels(metric_language, "rejected").inc()
+            raise
+        except Exception:
+            metrics.sandbox_runs.labels(metric_language, "failed").inc()
+            raise
+        metrics.sandbox_runs.labels(metric_language, result["status"]).inc()
+        return result
+
+    def _run(self, language: str, code: str, timeout_sec: int) -> dict:
         import time
 
         image = self._image_for_language(language)
@@ -121,83 +172,89 @@ class SandboxRunner:
         start_ts = time.time()
 
         try:
-            created = self.client.api.create_container(
-                image=image,
-                command=self._command_for_language(language, filename),
-                user="1000:1000",  # non-root
-                name=f"sandbox-{run_id}",
-                stdin_open=False,
-                tty=False,
-                host_config=host_config,
-                network_disabled=True,
-                working_dir="/workspace",
-                environment={},
-            )
+            with tracing.span("docker.create_container", image=image), _step_timer("create_container"):
+                created = self.client.api.create_container(
+                    image=image,
+                    command=self._command_for_language(language, filename),
+                    user="1000:1000",  # non-root
+                    name=f"sandbox-{run_id}",
+                    stdin_open=False,
+                    tty=False,
+                    host_config=host_config,
+                    network_disabled=True,
+                    working_dir="/workspace",
+                    environment={},
+                )
             container_id = created.get("Id")
             if not container_id:
                 raise RuntimeError("Failed to create container")
 
             # Wrap into high-level object for convenience
-            container = self.client.containers.get(container_id)
+            with tracing.span("docker.start"), _step_timer("start"):
+                container = self.client.containers.get(container_id)
 
-            # Start
-            container.start()
+                # Start
+                container.start()
 
             # Write code file into /workspace using base64 to avoid tar extraction issues
             import base64
             b64 = base64.b64encode(contents.encode("utf-8")).decode("ascii")
             create_cmd = f"/bin/sh -lc 'mkdir -p /workspace && echo {b64} | base64 -d > /workspace/{filename}'"
-            container.exec_run(create_cmd)
+            with tracing.span("docker.exec", bytes=len(contents)), _step_timer("exec"):
+                container.exec_run(create_cmd)
 
             # Attach to logs with demux to split stdout/stderr
             # Fallback to combined logs if demux not supported
-            try:
-                stream = container.attach(stream=True, stdout=True, stderr=True, logs=True, demux=True)
-                for out in stream:
-                    if out is None:
-                        continue
-                    out_chunk, err_chunk = out
-                    if out_chunk:
-                        stdout_buf.append(out_chunk)
-                    if err_chunk:
-                        stderr_buf.append(err_chunk)
-                    # Enforce soft limit on collected bytes
-                    if sum(len(b) for b in stdout_buf) + sum(len(b) for b in stderr_buf) > 1024 * 1024:
-                        break
-            except TypeError:
-                # Older docker-py without demux
-                for chunk in container.logs(stream=True, stdout=True, stderr=True, follow=True):
-                    stdout_buf.append(chunk)
-                    if sum(len(b) for b in stdout_buf) > 1024 * 1024:
-                        break
+            with tracing.span("docker.logs"), _step_timer("logs"):
+                try:
+                    stream = container.attach(stream=True, stdout=True, stderr=True, logs=True, demux=True)
+                    for out in stream:
+                        if out is None:
+                            continue
+                        out_chunk, err_chunk = out
+                        if out_chunk:
+                            stdout_buf.append(out_chunk)
+                        if err_chunk:
+                            stderr_buf.append(err_chunk)
+                        # Enforce soft limit on collected bytes
+                        if sum(len(b) for b in stdout_buf) + sum(len(b) for b in stderr_buf) > 1024 * 1024:
+                            break
+                except TypeError:
+                    # Older docker-py without demux
+                    for chunk in container.logs(stream=True, stdout=True, stderr=True, follow=True):
+                        stdout_buf.append(chunk)
+                        if sum(len(b) for b in stdout_buf) > 1024 * 1024:
+                            break
 
             # Wait for exit with timeout; stop if exceeded
-            try:
-                container.wait(timeout=timeout_sec)
-            except Exception:
-                # Timeout exceeded
+            with tracing.span("docker.wait", timeout_sec=timeout_sec), _step_timer("wait"):
                 try:
-                    container.stop(timeout=1)
+                    container.wait(timeout=timeout_sec)
                 except Exception:
-                    pass
+                    # Timeout exceeded
+                    try:
+                        container.stop(timeout=1)
+                    except Exception:
+                        pass
 
-            # Get exit code
-            inspect = container.reload() or container.attrs
-            exit_code = container.attrs.get("State", {}).get("ExitCode", 137)
+                # Get exit code
+                inspect = container.reload() or container.attrs
+                exit_code = container.attrs.get("State", {}).get("ExitCode", 137)
 
         finally:
             # Cleanup always
             try:
                 # Ensure stopped
                 if container_id:
-                    try:
-                        self.client.api.stop(container=container_id, timeout=1)
-                    except Exception:
-                        pass
-                    try:
-                        self.client.api.remove_container(container=container_id, force=True)
-                    except Exception:
-                        pass
+                    with tracing.span("docker.remove"), _step_timer("remove"):
+                        try:
+                            self.client.api.stop(container=container_id, timeout=1)
+                        except Exception:
+                            pass
+                        try:
+                            self.client.api.remove_container(container=container_id, force=True)
+                        except Exception:
+                            pass
             except Exception:
                 pass
 
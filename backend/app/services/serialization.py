@@ -0,0 +1,18 @@
+"""JSON encoding of database rows, shared by exports and retention archives."""
+import base64
+import enum
+from datetime import datetime
+from uuid import UUID
+
+
+def json_default(value):
+    """``default`` for ``json.dumps`` over row values: ISO datetimes, UUID strings, enum values, base64 bytes."""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, UUID):
+        return str(value)
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, bytes):
+        return base64.b64encode(value).decode("ascii")
+    raise TypeError(f"Cannot encode {type(value).__name__} as JSON")
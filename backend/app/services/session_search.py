@@ -0,0 +1,344 @@
+"""Full-text search over debug sessions.
+
+On Postgres, search uses ``search_vector``, a stored generated tsvector
+column of error_text (A), explanation (B) and fix_suggestion (C) with a GIN
+index (migration 0006). Postgres computes it on every write, so neither the
+match nor the ``ts_rank_cd`` ranking re-tokenizes the text at query time.
+Snippets use ``ts_headline``. The column is not mapped on the model, which
+other databases share.
+
+Other databases (SQLite in tests and local setups) use an in-process
+inverted index. It is refreshed incrementally from ``updated_at``, so it
+also sees rows written by other processes.
+"""
+import math
+import re
+import threading
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set, Tuple
+from uuid import UUID
+
+from sqlalchemy import DDL, event, func, literal_column, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.models.debug_session import DebugSession, SessionStatus, make_error_snippet
+
+SEARCH_FIELDS = ("error_text", "explanation", "fix_suggestion")
+_FIELD_WEIGHTS = {"error_text": 1.0, "explanation": 0.4, "fix_suggestion": 0.2}
+
+# Same expression as migrations 0001 and 0006
+_TSVECTOR_SQL = (
+    "setweight(to_tsvector('english', coalesce(error_text, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(explanation, '')), 'B') || "
+    "setweight(to_tsvector('english', coalesce(fix_suggestion, '')), 'C')"
+)
+
+# For tables made by metadata.create_all rather than Alembic
+event.listen(
+    DebugSession.__table__,
+    "after_create",
+    DDL(
+        "ALTER TABLE debug_sessions ADD COLUMN IF NOT EXISTS search_vector tsvector "
+        f"GENERATED ALWAYS AS ({_TSVECTOR_SQL}) STORED"
+    ).execute_if(dialect="postgresql"),
+)
+event.listen(
+    DebugSession.__table__,
+    "after_create",
+    DDL(
+        "CREATE INDEX IF NOT EXISTS ix_debug_sessions_search ON debug_sessions USING gin (search_vector)"
+    ).execute_if(dialect="postgresql"),
+)
+
+
+@dataclass
+class SearchHit:
+    """One ranked search result."""
+
+    id: UUID
+    created_at: datetime
+    language: str
+    status: SessionStatus
+    error_snippet: str
+    rank: float
+    highlights: Dict[str, str] = field(default_factory=dict)
+
+
+# ---------------------------------------------------------------------------
+# Postgres
+# ---------------------------------------------------------------------------
+
+async def _search_postgres(
+    db: AsyncSession, q: str, language: Optional[str], status: Optional[SessionStatus], limit: int, offset: int
+) -> List[SearchHit]:
+    vector = literal_column("debug_sessions.search_vector")
+    tsquery = func.websearch_to_tsquery("english", q)
+    rank = func.ts_rank_cd(vector, tsquery).label("rank")
+    headline_opts = "StartSel=<mark>, StopSel=</mark>, MaxFragments=2, MaxWords=20, MinWords=5"
+
+    query = (
+        select(
+            DebugSession.id,
+            DebugSession.created_at,
+            DebugSession.language,
+            DebugSession.status,
+            func.coalesce(DebugSession.error_snippet, func.substr(DebugSession.error_text, 1, 100)).label("snippet"),
+            rank,
+            *[
+                func.ts_headline("english", func.coalesce(getattr(DebugSession, name), ""), tsquery, headline_opts)
+                .label(f"hl_{name}")
+                for name in SEARCH_FIELDS
+            ],
+        )
+        .where(vector.op("@@")(tsquery))
+    )
+    if language:
+        query = query.where(DebugSession.language == language)
+    if status:
+        query = query.where(DebugSession.status == status)
+    query = query.order_by(rank.desc(), DebugSession.created_at.desc()).limit(limit).offset(offset)
+
+    hits = []
+    for row in (await db.execute(query)).all():
+        highlights = {
+            name: getattr(row, f"hl_{name}")
+            for name in SEARCH_FIELDS
+            if "<mark>" in (getattr(row, f"hl_{name}") or "")
+        }
+        hits.append(SearchHit(
+            id=row.id,
+            created_at=row.created_at,
+            language=row.language,
+            status=row.status,
+            error_snippet=make_error_snippet(row.snippet or ""),
+            rank=float(row.rank),
+            highlights=highlights,
+        ))
+    return hits
+
+
+# ---------------------------------------------------------------------------
+# In-process fallback
+# ---------------------------------------------------------------------------
+
+_TOKEN = re.compile(r"[A-Za-z0-9_]+")
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    return [t.lower() for t in _TOKEN.findall(text or "") if len(t) > 1]
+
+
+def highlight(text: str, terms: Set[str], context: int = 60) -> Optional[str]:
+    """Wrap matching terms in <mark> around the first match, like ts_headline."""
+    if not text:
+        return None
+    matches = [m for m in _TOKEN.finditer(text) if m.group(0).lower() in terms]
+    if not matches:
+        return None
+    start = max(0, matches[0].start() - context)
+    end = min(len(text), matches[0].end() + context * 2)
+    out, pos = [], start
+    for m in matches:
+        if m.start() < start or m.end() > end:
+            continue
+        out.append(text[pos:m.start()])
+        out.append(f"<mark>{m.group(0)}</mark>")
+        pos = m.end()
+    out.append(text[pos:end])
+    return ("..." if start > 0 else "") + "".join(out) + ("..." if end < len(text) else "")
+
+
+@dataclass
+class _Doc:
+    created_at: datetime
+    language: str
+    status: SessionStatus
+    error_snippet: str
+    fields: Dict[str, str]
+    length: int
+
+
+PRUNE_INTERVAL = timedelta(hours=1)
+
+
+class InvertedIndex:
+    """BM25-ranked inverted index over the search fields of debug sessions."""
+
+    k1 = 1.2
+    b = 0.75
+
+    def __init__(self):
+        self.docs: Dict[UUID, _Doc] = {}
+        # term -> doc id -> weighted term frequency
+        self.postings: Dict[str, Dict[UUID, float]] = defaultdict(dict)
+        self.total_length = 0
+        self.watermark: Optional[datetime] = None
+        self.pruned_before: Optional[datetime] = None
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+    def add(
+        self,
+        doc_id: UUID,
+        created_at: datetime,
+        language: str,
+        status: SessionStatus,
+        fields: Dict[str, Optional[str]],
+        error_snippet: Optional[str] = None,
+    ) -> None:
+        with self._lock:
+            self._remove(doc_id)
+            tf: Counter = Counter()
+            length = 0
+            for name in SEARCH_FIELDS:
+                tokens = tokenize(fields.get(name))
+                length += len(tokens)
+                for token in tokens:
+                    tf[token] += _FIELD_WEIGHTS[name]
+            for token, weight in tf.items():
+                self.postings[token][doc_id] = weight
+            self.docs[doc_id] = _Doc(
+                created_at=created_at,
+                language=language,
+                status=status,
+                error_snippet=error_snippet or make_error_snippet(fields.get("error_text") or ""),
+                fields={name: fields.get(name) or "" for name in SEARCH_FIELDS},
+                length=length,
+            )
+            self.total_length += length
+
+    def _remove(self, doc_id: UUID) -> None:
+        doc = self.docs.pop(doc_id, None)
+        if doc is None:
+            return
+        self.total_length -= doc.length
+        for name in SEARCH_FIELDS:
+            for token in set(tokenize(doc.fields[name])):
+                postings = self.postings.get(token)
+                if postings is not None:
+                    postings.pop(doc_id, None)
+                    if not postings:
+                        del self.postings[token]
+
+    def search(
+        self,
+        q: str,
+        language: Optional[str] = None,
+        status: Optional[SessionStatus] = None,
+        limit: int = 20,
+        offset: int = 0,
+    ) -> List[SearchHit]:
+        terms = set(tokenize(q))
+        if not terms:
+            return []
+        with self._lock:
+            n = len(self.docs) or 1
+            avg_len = (self.total_length / n) or 1.0
+            scores: Dict[UUID, float] = defaultdict(float)
+            matched: Dict[UUID, int] = defaultdict(int)
+            for term in terms:
+                postings = self.postings.get(term, {})
+                if not postings:
+                    continue
+                idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id, tf in postings.items():
+                    doc = self.docs[doc_id]
+                    norm = tf + self.k1 * (1 - self.b + self.b * doc.length / avg_len)
+                    scores[doc_id] += idf * tf * (self.k1 + 1) / norm
+                    matched[doc_id] += 1
+
+            # websearch_to_tsquery ANDs plain terms; mirror that
+            candidates: List[Tuple[float, datetime, UUID]] = []
+            for doc_id, score in scores.items():
+                if matched[doc_id] < len(terms):
+                    continue
+                doc = self.docs[doc_id]
+                if language and doc.language != language:
+                    continue
+                if status and doc.status != status:
+                    continue
+                candidates.append((score, doc.created_at, doc_id))
+            candidates.sort(reverse=True)
+
+            hits = []
+            for score, _, doc_id in candidates[offset:offset + limit]:
+                doc = self.docs[doc_id]
+                highlights = {}
+                for name in SEARCH_FIELDS:
+                    marked = highlight(doc.fields[name], terms)
+                    if marked:
+                        highlights[name] = marked
+                hits.append(SearchHit(
+                    id=doc_id,
+                    created_at=doc.created_at,
+                    language=doc.language,
+                    status=doc.status,
+                    error_snippet=doc.error_snippet,
+                    rank=round(score, 6),
+                    highlights=highlights,
+                ))
+            return hits
+
+    def prune(self, before: datetime) -> None:
+        """Drop sessions created before ``before`` (removed by the retention job).
+
+        Scans every document, so it runs at most once per ``PRUNE_INTERVAL``.
+        """
+        if self.pruned_before is not None and before - self.pruned_before < PRUNE_INTERVAL:
+            return
+        with self._lock:
+            self.pruned_before = before
+            for doc_id in [doc_id for doc_id, doc in self.docs.items() if doc.created_at < before]:
+                self._remove(doc_id)
+
+    async def refresh(self, db: AsyncSession) -> None:
+        """Index sessions created or updated since the last refresh."""
+        query = select(
+            DebugSession.id,
+            DebugSession.created_at,
+            DebugSession.updated_at,
+            DebugSession.language,
+            DebugSession.status,
+            DebugSession.error_snippet,
+            DebugSession.error_text,
+            DebugSession.explanation,
+            DebugSession.fix_suggestion,
+        ).order_by(DebugSession.updated_at)
+        if self.watermark is not None:
+            query = query.where(DebugSession.updated_at >= self.watermark)
+        result = await db.stream(query.execution_options(yield_per=1000))
+        async for row in result:
+            self.add(
+                row.id,
+                row.created_at,
+                row.language,
+                row.status,
+                {name: getattr(row, name) for name in SEARCH_FIELDS},
+                error_snippet=row.error_snippet,
+            )
+            self.watermark = row.updated_at
+
+
+_fallback_index = InvertedIndex()
+
+
+async def search_sessions(
+    db: AsyncSession,
+    q: str,
+    language: Optional[str] = None,
+    status: Optional[SessionStatus] = None,
+    limit: int = 20,
+    offset: int = 0,
+) -> List[SearchHit]:
+    """Ranked full-text search with highlights, using the best backend available."""
+    if db.bind.dialect.name == "postgresql":
+        return await _search_postgres(db, q, language, status, limit, offset)
+    await _fallback_index.refresh(db)
+    if settings.SESSION_RETENTION_DAYS > 0:
+        _fallback_index.prune(datetime.utcnow() - timedelta(days=settings.SESSION_RETENTION_DAYS))
+    return _fallback_index.search(q, language, status, limit, offset)
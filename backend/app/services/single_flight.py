@@ -0,0 +1,187 @@
+"""Single-flight coalescing of identical in-flight LLM generations.
+
+When many requests carry the same prompt at once, only the first (the
+leader) calls the provider; the others await the leader's result. Within a
+worker this uses a shared asyncio task per key. Across workers it can
+optionally elect a leader through a lease row in ``generation_leases`` and
+hand the result over through the ``generation_results`` table.
+"""
+import asyncio
+import hashlib
+import json
+import re
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def prompt_key(*parts: Optional[str]) -> str:
+    """SHA-256 over whitespace-normalized prompt parts."""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(_WHITESPACE.sub(" ", (part or "").strip()).encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+class SingleFlight:
+    """Coalesces concurrent calls that share a key into one execution."""
+
+    def __init__(self):
+        self._inflight: Dict[Tuple[asyncio.AbstractEventLoop, str], asyncio.Task] = {}
+
+    def inflight(self) -> int:
+        return len(self._inflight)
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Run ``fn`` once per key; concurrent callers share its outcome.
+
+        The work runs in its own task, so a leader whose request is cancelled
+        does not cancel the followers waiting on it.
+        """
+        slot = (asyncio.get_running_loop(), key)
+        task = self._inflight.get(slot)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._inflight[slot] = task
+            task.add_done_callback(lambda _t: self._inflight.pop(slot, None))
+        return await asyncio.shield(task)
+
+
+class LeaseCoalescer:
+    """Cross-worker coalescing through a lease row.
+
+    The leader claims a row in ``generation_leases`` for the prompt hash, in a
+    short transaction that is committed at once. No connection is held while
+    the LLM runs. The leader then stores the JSON result in
+    ``generation_results`` and drops its lease in a second short transaction.
+    Other workers poll with exponential backoff, taking a pooled connection
+    only for each brief check. They reuse the stored result if it is younger
+    than ``ttl_sec``. A lease expires after ``lease_sec``, so a crashed
+    leader is replaced. A follower that is still waiting after
+    ``max_wait_sec`` generates on its own.
+    """
+
+    def __init__(
+        self,
+        engine: AsyncEngine,
+        ttl_sec: int = 60,
+        lease_sec: float = 120.0,
+        max_wait_sec: float = 120.0,
+        poll_interval: float = 0.1,
+        max_poll_interval: float = 2.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.engine = engine
+        self.ttl_sec = ttl_sec
+        self.lease_sec = lease_sec
+        self.max_wait_sec = max_wait_sec
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max_poll_interval
+        self.clock = clock
+
+    @property
+    def enabled(self) -> bool:
+        return self.engine.dialect.name == "postgresql"
+
+    async def _lookup(self, conn, key: str) -> Optional[dict]:
+        row = (await conn.execute(
+            text("SELECT result FROM generation_results WHERE prompt_hash = :k AND created_at >= :since"),
+            {"k": key, "since": datetime.utcnow() - timedelta(seconds=self.ttl_sec)},
+        )).first()
+        return json.loads(row[0]) if row else None
+
+    async def _poll(self, key: str, owner: str) -> Tuple[bool, Optional[dict]]:
+        """One short transaction: return a fresh result, or try to claim the lease."""
+        async with self.engine.begin() as conn:
+            cached = await self._lookup(conn, key)
+            if cached is not None:
+                return False, cached
+            now = datetime.utcnow()
+            claimed = (await conn.execute(
+                text(
+                    "INSERT INTO generation_leases (prompt_hash, owner, expires_at) VALUES (:k, :o, :e) "
+                    "ON CONFLICT (prompt_hash) DO UPDATE SET owner = EXCLUDED.owner, expires_at = EXCLUDED.expires_at "
+                    "WHERE generation_leases.expires_at < :now "
+                    "RETURNING owner"
+                ),
+                {"k": key, "o": owner, "e": now + timedelta(seconds=self.lease_sec), "now": now},
+            )).first() is not None
+            if claimed:
+                # The previous leader may have stored its result just before its lease went away
+                cached = await self._lookup(conn, key)
+                if cached is not None:
+                    await self._drop_lease(conn, key, owner)
+                    return False, cached
+            return claimed, None
+
+    @staticmethod
+    async def _drop_lease(conn, key: str, owner: str) -> None:
+        await conn.execute(
+            text("DELETE FROM generation_leases WHERE prompt_hash = :k AND owner = :o"), {"k": key, "o": owner}
+        )
+
+    async def _store(self, key: str, owner: str, result: dict) -> None:
+        async with self.engine.begin() as conn:
+            await conn.execute(
+                text(
+                    "INSERT INTO generation_results (prompt_hash, result, created_at) VALUES (:k, :r, :t) "
+                    "ON CONFLICT (prompt_hash) DO UPDATE SET result = EXCLUDED.result, created_at = EXCLUDED.created_at"
+                ),
+                {"k": key, "r": json.dumps(result), "t": datetime.utcnow()},
+            )
+            await self._drop_lease(conn, key, owner)
+
+    async def _release(self, key: str, owner: str) -> None:
+        async with self.engine.begin() as conn:
+            await self._drop_lease(conn, key, owner)
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[dict]]) -> dict:
+        """Run ``fn`` unless another worker produced the result for ``key``."""
+        owner = uuid.uuid4().hex
+        deadline = self.clock() + self.max_wait_sec
+        delay = self.poll_interval
+        while True:
+            claimed, cached = await self._poll(key, owner)
+            if cached is not None:
+                return cached
+            if claimed:
+                break
+            remaining = deadline - self.clock()
+            if remaining <= 0:
+                # The leader is stuck; generate independently rather than hang
+                return await fn()
+            await asyncio.sleep(min(delay, remaining))
+            delay = min(delay * 2, self.max_poll_interval)
+
+        try:
+            result = await fn()
+        except BaseException:
+            # Let a follower take over now instead of when the lease expires
+            await asyncio.shield(self._release(key, owner))
+            raise
+        await self._store(key, owner, result)
+        return result
+
+
+_coalescer: Optional[LeaseCoalescer] = None
+
+
+def cross_worker_coalescer() -> Optional[LeaseCoalescer]:
+    """Configured cross-worker coalescer, or None when disabled."""
+    global _coalescer
+    from app.config import settings
+
+    if not settings.LLM_COALESCE_ACROSS_WORKERS:
+        return None
+    if _coalescer is None:
+        from app.db.session import async_engine
+
+        _coalescer = LeaseCoalescer(async_engine, ttl_sec=settings.LLM_COALESCE_TTL_SEC)
+    return _coalescer
@@ -0,0 +1,337 @@
+"""Incrementally maintained rollups behind ``/api/stats``.
+
+Writers call ``record_run``/``record_runs``/``record_session`` in the same
+transaction that persists the terminal state. These calls upsert counter
+increments into the hourly and daily rollup rows. Reads only touch rollup rows for the requested
+buckets, so their cost depends on the time range, not on the size of the
+``runs`` or ``debug_sessions`` tables. ``rebuild_rollups`` recomputes a
+range from the raw tables, for backfills and repairs.
+"""
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+from sqlalchemy import and_, delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.debug_session import DebugSession, SessionStatus
+from app.models.run import Run
+from app.models.stats import RUNTIME_BUCKETS_MS, ErrorTypeRollup, RuntimeHistogram, StatsRollup
+from app.services.error_types import primary_exception_type
+
+GRANULARITIES = ("hour", "day")
+
+
+def bucket_start(at: datetime, granularity: str) -> datetime:
+    if granularity == "hour":
+        return at.replace(minute=0, second=0, microsecond=0)
+    return at.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def runtime_bucket(runtime_ms: int) -> int:
+    for le in RUNTIME_BUCKETS_MS:
+        if le < 0 or runtime_ms <= le:
+            return le
+    return -1
+
+
+def _insert_for(db: AsyncSession):
+    dialect = db.bind.dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        return None
+    return insert
+
+
+async def _increment(db: AsyncSession, model, keys: Dict, increments: Dict[str, int]) -> None:
+    """Atomically add ``increments`` to the row identified by ``keys``."""
+    insert = _insert_for(db)
+    if insert is not None:
+        stmt = insert(model).values(**keys, **increments)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(keys),
+            set_={name: getattr(model, name) + stmt.excluded[name] for name in increments},
+        )
+        await db.execute(stmt)
+        return
+    row = await db.get(model, tuple(keys.values()), with_for_update=True)
+    if row is None:
+        db.add(model(**keys, **increments))
+    else:
+        for name, value in increments.items():
+            setattr(row, name, getattr(row, name) + value)
+
+
+Increment = Tuple[type, Tuple[Tuple[str, object], ...], Dict[str, int]]
+
+
+def _run_increments(
+    language: str, status: str, execution_time_ms: Optional[int], stderr: Optional[str], at: datetime
+) -> Iterator[Increment]:
+    error_type = primary_exception_type(stderr) if status != "completed" else None
+    for granularity in GRANULARITIES:
+        start = bucket_start(at, granularity)
+        yield StatsRollup, (
+            ("granularity", granularity), ("bucket_start", start), ("kind", "run"), ("language", language),
+        ), {
+            "total": 1,
+            "ok": int(status == "completed"),
+            "errors": int(status == "error"),
+            "timeouts": int(status == "timeout"),
+            "runtime_count": int(execution_time_ms is not None),
+            "runtime_sum_ms": execution_time_ms or 0,
+        }
+        if execution_time_ms is not None:
+            yield RuntimeHistogram, (
+                ("granularity", granularity), ("bucket_start", start), ("language", language),
+                ("le_ms", runtime_bucket(execution_time_ms)),
+            ), {"count": 1}
+        if error_type:
+            yield ErrorTypeRollup, (
+                ("granularity", granularity), ("bucket_start", start), ("kind", "run"), ("language", language),
+                ("error_type", error_type),
+            ), {"count": 1}
+
+
+def _session_increments(
+    language: str, status: SessionStatus, error_text: Optional[str], at: datetime
+) -> Iterator[Increment]:
+    error_type = primary_exception_type(error_text)
+    for granularity in GRANULARITIES:
+        start = bucket_start(at, granularity)
+        yield StatsRollup, (
+            ("granularity", granularity), ("bucket_start", start), ("kind", "session"), ("language", language),
+        ), {
+            "total": 1,
+            "ok": int(status == SessionStatus.COMPLETED),
+            "errors": int(status == SessionStatus.FAILED),
+        }
+        if error_type:
+            yield ErrorTypeRollup, (
+                ("granularity", granularity), ("bucket_start", start), ("kind", "session"), ("language", language),
+                ("error_type", error_type),
+            ), {"count": 1}
+
+
+async def record_run(
+    db: AsyncSession,
+    language: str,
+    status: str,
+    execution_time_ms: Optional[int],
+    stderr: Optional[str],
+    at: datetime,
+) -> None:
+    """Count a finished sandbox run in the hourly and daily rollups."""
+    for model, keys, increments in _run_increments(language, status, execution_time_ms, stderr, at):
+        await _increment(db, model, dict(keys), increments)
+
+
+async def record_runs(db: AsyncSession, runs: Iterable[Dict]) -> None:
+    """Count a batch of finished runs, with one upsert per touched rollup row.
+
+    ``runs`` are dicts with ``language``, ``status``, ``execution_time_ms``,
+    ``stderr`` and ``created_at``. Rows are upserted in a fixed order, so
+    concurrent batches from several workers take row locks in the same order.
+    """
+    totals: Dict[Tuple[type, Tuple], Dict[str, int]] = {}
+    for run in runs:
+        for model, keys, increments in _run_increments(
+            run["language"], run["status"], run["execution_time_ms"], run["stderr"], run["created_at"]
+        ):
+            counters = totals.setdefault((model, keys), defaultdict(int))
+            for name, value in increments.items():
+                counters[name] += value
+    ordered = sorted(totals.items(), key=lambda item: (item[0][0].__tablename__, repr(item[0][1])))
+    for (model, keys), increments in ordered:
+        await _increment(db, model, dict(keys), dict(increments))
+
+
+async def record_session(
+    db: AsyncSession,
+    language: str,
+    status: SessionStatus,
+    error_text: Optional[str],
+    at: datetime,
+) -> None:
+    """Count a debug session that reached a terminal status."""
+    for model, keys, increments in _session_increments(language, status, error_text, at):
+        await _increment(db, model, dict(keys), increments)
+
+
+async def rebuild_rollups(db: AsyncSession, since: datetime, until: datetime) -> None:
+    """Recompute whole days in [since, until) from the raw tables (compactor/backfill).
+
+    Raw rows are streamed and aggregated in memory, then written as one
+    upsert per rollup row.
+    """
+    since = bucket_start(since, "day")
+    if until != bucket_start(until, "day"):
+        until = bucket_start(until, "day") + timedelta(days=1)
+
+    pending: Dict[Tuple[type, Tuple], Dict[str, int]] = {}
+
+    def merge(increments: Iterator[Increment]) -> None:
+        for model, keys, values in increments:
+            target = pending.setdefault((model, keys), dict.fromkeys(values, 0))
+            for name, value in values.items():
+                target[name] += value
+
+    runs = await db.stream(
+        select(Run.language, Run.status, Run.execution_time_ms, Run.stderr, Run.created_at)
+        .where(Run.created_at >= since, Run.created_at < until)
+        .execution_options(yield_per=1000)
+    )
+    async for row in runs:
+        merge(_run_increments(row.language, row.status, row.execution_time_ms, row.stderr, row.created_at))
+
+    sessions = await db.stream(
+        select(DebugSession.language, DebugSession.status, DebugSession.error_text, DebugSession.created_at)
+        .where(
+            DebugSession.created_at >= since,
+            DebugSession.created_at < until,
+            DebugSession.status != SessionStatus.PROCESSING,
+        )
+        .execution_options(yield_per=1000)
+    )
+    async for row in sessions:
+        merge(_session_increments(row.language, row.status, row.error_text, row.created_at))
+
+    for model in (StatsRollup, RuntimeHistogram, ErrorTypeRollup):
+        await db.execute(delete(model).where(and_(model.bucket_start >= since, model.bucket_start < until)))
+    for (model, keys), increments in pending.items():
+        await _increment(db, model, dict(keys), increments)
+    await db.commit()
+
+
+def _percentile_from_histogram(counts: Dict[int, int], q: float) -> Optional[int]:
+    total = sum(counts.values())
+    if not total:
+        return None
+    target = q * total
+    seen = 0
+    for le in RUNTIME_BUCKETS_MS:
+        seen += counts.get(le, 0)
+        if seen >= target:
+            return le if le >= 0 else None
+    return None
+
+
+async def query_stats(
+    db: AsyncSession,
+    granularity: str,
+    since: datetime,
+    until: datetime,
+    language: Optional[str] = None,
+    top_errors: int = 10,
+) -> Dict:
+    """Time series and totals for [since, until) answered from rollups only."""
+    since = bucket_start(since, granularity)
+
+    filters = [
+        StatsRollup.granularity == granularity,
+        StatsRollup.bucket_start >= since,
+        StatsRollup.bucket_start < until,
+    ]
+    if language:
+        filters.append(StatsRollup.language == language)
+    rollups = (await db.execute(select(StatsRollup).where(*filters))).scalars().all()
+
+    hist_filters = [
+        RuntimeHistogram.granularity == granularity,
+        RuntimeHistogram.bucket_start >= since,
+        RuntimeHistogram.bucket_start < until,
+    ]
+    if language:
+        hist_filters.append(RuntimeHistogram.language == language)
+    histogram = (await db.execute(select(RuntimeHistogram).where(*hist_filters))).scalars().all()
+
+    error_filters = [
+        ErrorTypeRollup.granularity == granularity,
+        ErrorTypeRollup.bucket_start >= since,
+        ErrorTypeRollup.bucket_start < until,
+    ]
+    if language:
+        error_filters.append(ErrorTypeRollup.language == language)
+    errors = (await db.execute(select(ErrorTypeRollup).where(*error_filters))).scalars().all()
+
+    series: Dict[datetime, Dict] = defaultdict(lambda: {"runs": _empty("run"), "sessions": _empty("session")})
+    runs_by_language: Dict[str, Dict] = defaultdict(lambda: _empty("run"))
+    hist_by_bucket: Dict[datetime, Dict[int, int]] = defaultdict(lambda: defaultdict(int))
+    hist_total: Dict[int, int] = defaultdict(int)
+    hist_by_language: Dict[str, Dict[int, int]] = defaultdict(lambda: defaultdict(int))
+
+    for row in rollups:
+        key = "runs" if row.kind == "run" else "sessions"
+        _accumulate(series[row.bucket_start][key], row)
+        if row.kind == "run":
+            _accumulate(runs_by_language[row.language], row)
+    for row in histogram:
+        hist_by_bucket[row.bucket_start][row.le_ms] += row.count
+        hist_total[row.le_ms] += row.count
+        hist_by_language[row.language][row.le_ms] += row.count
+
+    error_counts: Dict[Tuple[str, str], int] = defaultdict(int)
+    for row in errors:
+        error_counts[(row.kind, row.error_type)] += row.count
+    top = sorted(error_counts.items(), key=lambda item: item[1], reverse=True)[:top_errors]
+
+    points = []
+    for start in sorted(series):
+        point = series[start]
+        _finish(point["runs"], hist_by_bucket.get(start, {}))
+        _finish(point["sessions"], {})
+        points.append({"bucket_start": start, **point})
+
+    totals = _empty("run")
+    for stats in runs_by_language.values():
+        for field in ("total", "completed", "error", "timeout", "runtime_count", "runtime_sum_ms"):
+            totals[field] += stats[field]
+    _finish(totals, hist_total)
+    for name, stats in runs_by_language.items():
+        _finish(stats, hist_by_language.get(name, {}))
+
+    return {
+        "granularity": granularity,
+        "since": since,
+        "until": until,
+        "runs": totals,
+        "runs_by_language": dict(runs_by_language),
+        "series": points,
+        "top_error_types": [{"kind": kind, "error_type": name, "count": count} for (kind, name), count in top],
+    }
+
+
+def _empty(kind: str) -> Dict:
+    if kind == "run":
+        return {"total": 0, "completed": 0, "error": 0, "timeout": 0, "runtime_count": 0, "runtime_sum_ms": 0}
+    return {"total": 0, "completed": 0, "failed": 0}
+
+
+def _accumulate(target: Dict, row: StatsRollup) -> None:
+    target["total"] += row.total
+    target["completed"] += row.ok
+    if row.kind == "run":
+        target["error"] += row.errors
+        target["timeout"] += row.timeouts
+        target["runtime_count"] += row.runtime_count
+        target["runtime_sum_ms"] += row.runtime_sum_ms
+    else:
+        target["failed"] += row.errors
+
+
+def _finish(stats: Dict, histogram: Dict[int, int]) -> None:
+    """Add derived rates and runtime percentiles; drop raw sums."""
+    total = stats["total"]
+    if "error" in stats:
+        stats["error_rate"] = round(stats["error"] / total, 4) if total else 0.0
+        stats["timeout_rate"] = round(stats["timeout"] / total, 4) if total else 0.0
+        count = stats.pop("runtime_count")
+        runtime_sum = stats.pop("runtime_sum_ms")
+        stats["avg_runtime_ms"] = round(runtime_sum / count, 1) if count else None
+        if histogram:
+            stats["p95_runtime_ms"] = _percentile_from_histogram(histogram, 0.95)
+    else:
+        stats["failure_rate"] = round(stats["failed"] / total, 4) if total else 0.0
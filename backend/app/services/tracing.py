@@ -0,0 +1,387 @@
+"""Lightweight tracing: spans across the generation and sandbox pipelines.
+
+``span(name, **attributes)`` times a block of sync or async code as a
+child of the current span. The current span lives in a ``ContextVar``, so
+it follows ``await``s and is copied into ``asyncio.to_thread`` workers
+(which run in a copy of the caller's context): spans opened by
+``SandboxRunner`` inside its worker thread nest under the request that
+started the run. Work started with ``run_in_executor`` does not copy the
+context; wrap it with ``contextvars.copy_context().run``.
+
+``TracingMiddleware`` opens one root span per HTTP request and continues a
+trace from an incoming W3C ``traceparent`` header. SQL statements get
+``db.query`` spans from engine events (see ``instrument_engine``).
+
+Finished spans are exported in batches from a background thread:
+
+- ``TRACING_EXPORTER=file`` appends OTLP/JSON span lines to
+  ``TRACING_FILE_PATH``, for offline use.
+- ``TRACING_EXPORTER=otlp`` posts OTLP/HTTP JSON to ``TRACING_OTLP_ENDPOINT``
+  (an OpenTelemetry collector, Jaeger or Tempo).
+- ``none`` (the default) disables tracing; ``span`` is then a no-op.
+
+``TRACING_SAMPLE_RATE`` decides per trace, at its root, whether it is
+recorded.
+"""
+import contextlib
+import json
+import logging
+import os
+import queue
+import random
+import re
+import threading
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional
+
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+_TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+MAX_ATTRIBUTE_CHARS = 512
+
+
+@dataclass
+class Span:
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str]
+    sampled: bool
+    kind: str = "internal"
+    start_ns: int = field(default_factory=time.time_ns)
+    end_ns: Optional[int] = None
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    error: Optional[str] = None
+
+    def set(self, **attributes: Any) -> None:
+        self.attributes.update(attributes)
+
+    def to_otlp(self) -> Dict:
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": {"internal": 1, "server": 2, "client": 3}.get(self.kind, 1),
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns or self.start_ns),
+            "attributes": [_otlp_attribute(key, value) for key, value in self.attributes.items()],
+            "status": {"code": 2, "message": self.error} if self.error else {"code": 1},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+
+def _otlp_attribute(key: str, value: Any) -> Dict:
+    if isinstance(value, bool):
+        typed = {"boolValue": value}
+    elif isinstance(value, int):
+        typed = {"intValue": str(value)}
+    elif isinstance(value, float):
+        typed = {"doubleValue": value}
+    else:
+        typed = {"stringValue": str(value)[:MAX_ATTRIBUTE_CHARS]}
+    return {"key": key, "value": typed}
+
+
+def _new_id(nbytes: int) -> str:
+    return os.urandom(nbytes).hex()
+
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+# ---------------------------------------------------------------------------
+# Exporters
+
+
+class FileSpanExporter:
+    """Appends one OTLP/JSON span per line to ``path``."""
+
+    def __init__(self, path: str, service_name: str):
+        self.path = path
+        self.service_name = service_name
+
+    def export(self, spans: List[Span]) -> None:
+        lines = "".join(
+            json.dumps({"service": self.service_name, **span.to_otlp()}) + "\n" for span in spans
+        )
+        with open(self.path, "a", encoding="utf-8") as out:
+            out.write(lines)
+
+
+class OTLPSpanExporter:
+    """Posts spans to an OTLP/HTTP collector as JSON."""
+
+    def __init__(self, endpoint: str, service_name: str, timeout_sec: float = 5.0):
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self.timeout_sec = timeout_sec
+
+    def payload(self, spans: List[Span]) -> Dict:
+        return {"resourceSpans": [{
+            "resource": {"attributes": [_otlp_attribute("service.name", self.service_name)]},
+            "scopeSpans": [{"scope": {"name": "bug-ghost-ai"}, "spans": [span.to_otlp() for span in spans]}],
+        }]}
+
+    def export(self, spans: List[Span]) -> None:
+        import urllib.request
+
+        request = urllib.request.Request(
+            self.endpoint,
+            data=json.dumps(self.payload(spans)).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout_sec) as response:
+            response.read()
+
+
+class BatchSpanProcessor:
+    """Queues finished spans and exports them in batches from a daemon thread.
+
+    The queue is bounded: when the exporter cannot keep up, spans are
+    dropped (and counted) instead of slowing requests down.
+    """
+
+    def __init__(self, exporter, max_queue: int = 10000, max_batch: int = 512, interval_sec: float = 2.0):
+        self.exporter = exporter
+        self.max_batch = max_batch
+        self.interval_sec = interval_sec
+        self.dropped = 0
+        self.exported = 0
+        self._queue: "queue.Queue[Optional[Span]]" = queue.Queue(maxsize=max_queue)
+        self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+        self._thread.start()
+
+    def on_end(self, span: Span) -> None:
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self) -> None:
+        closing = False
+        while not closing:
+            batch: List[Span] = []
+            deadline = time.monotonic() + self.interval_sec
+            while len(batch) < self.max_batch:
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is None:
+                    closing = True
+                    break
+                batch.append(item)
+            if batch:
+                try:
+                    self.exporter.export(batch)
+                    self.exported += len(batch)
+                except Exception:
+                    self.dropped += len(batch)
+                    logger.warning("exporting %d spans failed", len(batch), exc_info=True)
+
+    def shutdown(self, timeout_sec: float = 5.0) -> None:
+        """Export what is queued and stop the thread."""
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join(timeout=timeout_sec)
+
+
+# ---------------------------------------------------------------------------
+# Tracer
+
+
+class Tracer:
+    def __init__(self, processor: Optional[BatchSpanProcessor] = None, sample_rate: float = 1.0):
+        self.processor = processor
+        self.sample_rate = sample_rate
+
+    @property
+    def enabled(self) -> bool:
+        return self.processor is not None
+
+    def start_span(
+        self,
+        name: str,
+        parent: Optional[Span] = None,
+        kind: str = "internal",
+        trace_id: Optional[str] = None,
+        parent_id: Optional[str] = None,
+        sampled: Optional[bool] = None,
+        **attributes: Any,
+    ) -> Span:
+        """A new span, child of ``parent`` (default: the current span); not made current."""
+        parent = parent if parent is not None else _current_span.get()
+        if parent is not None:
+            trace_id, parent_id, sampled = parent.trace_id, parent.span_id, parent.sampled
+        elif sampled is None:
+            sampled = random.random() < self.sample_rate
+        return Span(
+            name=name,
+            trace_id=trace_id or _new_id(16),
+            span_id=_new_id(8),
+            parent_id=parent_id,
+            sampled=sampled,
+            kind=kind,
+            attributes=attributes,
+        )
+
+    def end_span(self, span: Span, error: Optional[BaseException] = None) -> None:
+        span.end_ns = time.time_ns()
+        if error is not None:
+            span.error = f"{type(error).__name__}: {error}"[:MAX_ATTRIBUTE_CHARS]
+        if span.sampled and self.processor is not None:
+            self.processor.on_end(span)
+
+    @contextlib.contextmanager
+    def span(self, name: str, **attributes: Any) -> Iterator[Optional[Span]]:
+        if self.processor is None:
+            yield None
+            return
+        span = self.start_span(name, **attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as exc:
+            self.end_span(span, exc)
+            raise
+        else:
+            self.end_span(span)
+        finally:
+            _current_span.reset(token)
+
+    def shutdown(self) -> None:
+        if self.processor is not None:
+            self.processor.shutdown()
+
+
+def tracer_from_settings() -> Tracer:
+    exporter_name = settings.TRACING_EXPORTER.lower()
+    if exporter_name == "file":
+        exporter = FileSpanExporter(settings.TRACING_FILE_PATH, settings.TRACING_SERVICE_NAME)
+    elif exporter_name == "otlp":
+        exporter = OTLPSpanExporter(settings.TRACING_OTLP_ENDPOINT, settings.TRACING_SERVICE_NAME)
+    else:
+        return Tracer()
+    return Tracer(BatchSpanProcessor(exporter), sample_rate=settings.TRACING_SAMPLE_RATE)
+
+
+tracer = Tracer()
+
+
+def configure(new_tracer: Optional[Tracer] = None) -> Tracer:
+    """Install ``new_tracer`` (default: from settings) as the process-wide tracer."""
+    global tracer
+    previous, tracer = tracer, new_tracer or tracer_from_settings()
+    if previous is not tracer:
+        previous.shutdown()
+    return tracer
+
+
+def span(name: str, **attributes: Any):
+    """Context manager timing a block as a child of the current span."""
+    return tracer.span(name, **attributes)
+
+
+# ---------------------------------------------------------------------------
+# Instrumentation
+
+
+def instrument_engine(engine) -> None:
+    """``db.query`` spans for every statement run on ``engine`` (a sync Engine)."""
+    from sqlalchemy import event
+
+    if getattr(engine, "_traced", False):
+        return
+    engine._traced = True
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        if tracer.enabled and _current_span.get() is not None:
+            context._trace_span = tracer.start_span(
+                "db.query",
+                kind="client",
+                **{"db.system": engine.dialect.name, "db.statement": statement, "db.executemany": executemany},
+            )
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        span = getattr(context, "_trace_span", None)
+        if span is not None:
+            context._trace_span = None
+            if cursor.rowcount is not None and cursor.rowcount >= 0:
+                span.set(**{"db.rowcount": cursor.rowcount})
+            tracer.end_span(span)
+
+    @event.listens_for(engine, "handle_error")
+    def _error(exception_context):
+        context = exception_context.execution_context
+        span = getattr(context, "_trace_span", None) if context is not None else None
+        if span is not None:
+            context._trace_span = None
+            tracer.end_span(span, exception_context.original_exception)
+
+
+def parse_traceparent(value: Optional[str]):
+    """(trace_id, parent span id, sampled) from a W3C ``traceparent`` header, or None."""
+    match = _TRACEPARENT.match((value or "").strip().lower())
+    if not match or match[1] == "0" * 32 or match[2] == "0" * 16:
+        return None
+    return match[1], match[2], bool(int(match[3], 16) & 1)
+
+
+class TracingMiddleware:
+    """Root span per HTTP request, continuing an incoming ``traceparent``."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not tracer.enabled:
+            await self.app(scope, receive, send)
+            return
+        remote = parse_traceparent(Headers(scope=scope).get("traceparent"))
+        trace_id, parent_id, sampled = remote if remote else (None, None, None)
+        span = tracer.start_span(
+            f"{scope['method']} {scope['path']}",
+            kind="server",
+            trace_id=trace_id,
+            parent_id=parent_id,
+            sampled=sampled,
+            **{"http.method": scope["method"], "http.target": scope["path"]},
+        )
+        token = _current_span.set(span)
+
+        async def send_with_status(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                span.set(**{"http.status_code": message["status"]})
+            await send(message)
+
+        error: Optional[BaseException] = None
+        try:
+            await self.app(scope, receive, send_with_status)
+        except BaseException as exc:
+            error = exc
+            raise
+        finally:
+            if error is None and span.attributes.get("http.status_code", 0) >= 500:
+                span.error = f"HTTP {span.attributes['http.status_code']}"
+            endpoint = scope.get("endpoint")
+            if endpoint is not None:
+                # Low-cardinality name once routing has resolved the endpoint
+                span.name = f"{scope['method']} {getattr(endpoint, '__name__', scope['path'])}"
+            _current_span.reset(token)
+            tracer.end_span(span, error)
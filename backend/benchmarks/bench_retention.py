@@ -0,0 +1,169 @@
+"""Benchmark hot queries on runs and debug sessions before and after retention.
+
+Usage (from backend/):
+    python -m benchmarks.bench_retention --runs 200000 --sessions 100000 --months 12 --keep-days 30
+    DATABASE_URL=postgresql://... python -m benchmarks.bench_retention --runs 2000000 --months 24
+
+Fills the tables with synthetic rows spread evenly over the last ``--months``
+months. On a partitioned Postgres schema (``alembic upgrade head``), the
+monthly partitions for that span are created first. The benchmark then
+times the listing/feed queries the API runs, applies retention with a
+``--keep-days`` window, and times them again. It also reports table and
+index sizes. The schema is created if missing and rows are left in place,
+so run it against a scratch database. Without DATABASE_URL a temporary
+SQLite file is used.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+if "DATABASE_URL" not in os.environ:
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench_retention.db"
+
+LANGUAGES = ["python", "javascript", "java"]
+RUN_STATUSES = ["completed"] * 8 + ["error", "timeout"]
+
+
+def summarize(latencies_ms):
+    ordered = sorted(latencies_ms)
+    return {
+        "p50_ms": round(statistics.median(ordered), 3),
+        "p95_ms": round(ordered[int(0.95 * (len(ordered) - 1))], 3),
+    }
+
+
+async def _fill(db, runs: int, sessions: int, months: int, now: datetime) -> None:
+    from sqlalchemy import insert
+    from app.models.debug_session import DebugSession, SessionStatus
+    from app.models.run import Run
+
+    rng = random.Random(42)
+    span = timedelta(days=30 * months).total_seconds()
+
+    def at() -> datetime:
+        return now - timedelta(seconds=rng.random() * span)
+
+    for model, count, make in (
+        (Run, runs, lambda t: {
+            "id": uuid.uuid4(), "created_at": t, "completed_at": t, "language": rng.choice(LANGUAGES),
+            "status": rng.choice(RUN_STATUSES), "stdout": "ok", "stderr": "", "stdout_bytes": 2, "stderr_bytes": 0,
+            "exit_code": 0, "execution_time_ms": rng.randint(20, 3000), "image": "python:3.11-slim",
+        }),
+        (DebugSession, sessions, lambda t: {
+            "id": uuid.uuid4(), "created_at": t, "updated_at": t, "language": rng.choice(LANGUAGES),
+            "error_text": "KeyError: 'user'", "error_snippet": "KeyError: 'user'", "status": SessionStatus.COMPLETED,
+        }),
+    ):
+        for offset in range(0, count, 5000):
+            await db.execute(insert(model), [make(at()) for _ in range(min(5000, count - offset))])
+            await db.commit()
+
+
+async def _time_queries(db, repeats: int, now: datetime) -> dict:
+    from sqlalchemy import func, select
+    from app.models.debug_session import DebugSession, SessionStatus
+    from app.models.run import Run
+
+    queries = {
+        "runs_recent_errors": select(Run.id, Run.created_at).where(Run.status == "error")
+        .order_by(Run.created_at.desc()).limit(20),
+        "runs_last_24h_count": select(func.count()).select_from(Run).where(Run.created_at >= now - timedelta(days=1)),
+        "sessions_first_page": select(DebugSession.id, DebugSession.created_at)
+        .order_by(DebugSession.created_at.desc(), DebugSession.id.desc()).limit(20),
+        "sessions_completed_page": select(DebugSession.id, DebugSession.created_at)
+        .where(DebugSession.status == SessionStatus.COMPLETED)
+        .order_by(DebugSession.created_at.desc(), DebugSession.id.desc()).limit(20),
+    }
+    recent_ids = (await db.execute(select(Run.id).order_by(Run.created_at.desc()).limit(100))).scalars().all()
+
+    results = {}
+    for name, query in queries.items():
+        latencies = []
+        for _ in range(repeats):
+            t0 = time.perf_counter()
+            (await db.execute(query)).all()
+            latencies.append((time.perf_counter() - t0) * 1000)
+        results[name] = summarize(latencies)
+    latencies = []
+    for i in range(repeats):
+        t0 = time.perf_counter()
+        await db.execute(select(Run).where(Run.id == recent_ids[i % len(recent_ids)]))
+        latencies.append((time.perf_counter() - t0) * 1000)
+    results["run_by_id"] = summarize(latencies)
+    return results
+
+
+async def _sizes(db) -> dict:
+    from sqlalchemy import func, select, text
+    from app.models.debug_session import DebugSession
+    from app.models.run import Run
+
+    sizes = {
+        "runs_rows": await db.scalar(select(func.count()).select_from(Run)),
+        "sessions_rows": await db.scalar(select(func.count()).select_from(DebugSession)),
+    }
+    if db.bind.dialect.name == "postgresql":
+        for table in ("runs", "debug_sessions"):
+            sizes[f"{table}_mb"] = round(await db.scalar(text(
+                "SELECT sum(pg_total_relation_size(relid)) FROM pg_partition_tree(:table)"
+            ), {"table": table}) / 2 ** 20, 1)
+    return sizes
+
+
+async def run(args) -> dict:
+    from sqlalchemy import text
+    from app.db.session import AsyncSessionLocal, Base, async_engine
+    from app.models.debug_session import DebugSession
+    from app.models.run import Run
+    from app.services import retention
+    import app.models  # noqa: F401  (register every table)
+
+    async with async_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    now = datetime.utcnow()
+    async with AsyncSessionLocal() as db:
+        for table in ("runs", "debug_sessions"):
+            if await retention.is_partitioned(db, table):
+                oldest = now - timedelta(days=30 * args.months)
+                await retention.ensure_partitions(db, table, oldest, args.months + 2)
+
+        start = time.perf_counter()
+        await _fill(db, args.runs, args.sessions, args.months, now)
+        report = {"load_sec": round(time.perf_counter() - start, 1), "before": {
+            "sizes": await _sizes(db), "queries": await _time_queries(db, args.repeats, now),
+        }}
+
+        start = time.perf_counter()
+        report["retention"] = await retention.run_retention(db, now=now, policies=[
+            retention.RetentionPolicy(Run, args.keep_days),
+            retention.RetentionPolicy(DebugSession, args.keep_days),
+        ])
+        report["retention_sec"] = round(time.perf_counter() - start, 1)
+        if db.bind.dialect.name == "postgresql":
+            await db.execute(text("ANALYZE runs"))
+            await db.execute(text("ANALYZE debug_sessions"))
+        report["after"] = {"sizes": await _sizes(db), "queries": await _time_queries(db, args.repeats, now)}
+    await async_engine.dispose()
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--runs", type=int, default=200_000)
+    parser.add_argument("--sessions", type=int, default=100_000)
+    parser.add_argument("--months", type=int, default=12)
+    parser.add_argument("--keep-days", type=int, default=30)
+    parser.add_argument("--repeats", type=int, default=50)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""Benchmark run persistence: per-request commits vs. the group-commit writer.
+
+Usage (from backend/):
+    python -m benchmarks.bench_run_writer --runs 5000 --concurrency 64
+    DATABASE_URL=postgresql://... python -m benchmarks.bench_run_writer --runs 20000
+
+Both modes write the same synthetic finished runs, including the stats
+rollups, from ``--concurrency`` concurrent tasks. ``per-request`` is the
+former ``create_run`` path, with one session and one commit per run.
+``group`` goes through ``RunWriter``. The schema is created if missing and
+the inserted rows are left in place, so run it against a scratch database.
+Without DATABASE_URL a temporary SQLite file is used.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+import uuid
+from datetime import datetime
+
+if "DATABASE_URL" not in os.environ:
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench_run_writer.db"
+
+STDERR = [
+    "",
+    "Traceback (most recent call last):\n  File \"main.py\", line 3\nKeyError: 'user'",
+    "TypeError: Cannot read properties of undefined (reading 'map')",
+]
+
+
+def synthetic_run(rng: random.Random) -> dict:
+    stderr = rng.choice(STDERR)
+    now = datetime.utcnow()
+    return {
+        "id": uuid.uuid4(),
+        "language": rng.choice(["python", "javascript", "java"]),
+        "status": "error" if stderr else "completed",
+        "stdout": "ok\n" * rng.randint(1, 20),
+        "stderr": stderr,
+        "exit_code": 1 if stderr else 0,
+        "execution_time_ms": rng.randint(20, 3000),
+        "image": "python:3.11-slim",
+        "created_at": now,
+        "completed_at": now,
+        "user_id": None,
+        "team_id": None,
+    }
+
+
+async def _per_request(values: dict) -> None:
+    from app.db.session import AsyncSessionLocal
+    from app.models.run import Run
+    from app.services.stats_rollups import record_run
+
+    async with AsyncSessionLocal() as db:
+        db.add(Run(**values))
+        await record_run(
+            db,
+            language=values["language"],
+            status=values["status"],
+            execution_time_ms=values["execution_time_ms"],
+            stderr=values["stderr"],
+            at=values["created_at"],
+        )
+        await db.commit()
+
+
+async def bench(mode: str, runs: int, concurrency: int, max_batch: int, max_delay_ms: float) -> dict:
+    from app.services.run_writer import RunWriter
+
+    rng = random.Random(42)
+    pending = [synthetic_run(rng) for _ in range(runs)]
+    writer = RunWriter(max_batch=max_batch, max_delay_ms=max_delay_ms)
+    persist = writer.persist if mode == "group" else _per_request
+    latencies = []
+    failed = 0
+
+    async def worker() -> None:
+        nonlocal failed
+        while pending:
+            values = pending.pop()
+            t0 = time.perf_counter()
+            try:
+                await persist(values)
+            except Exception:  # e.g. "database is locked" with concurrent SQLite writers
+                failed += 1
+                continue
+            latencies.append((time.perf_counter() - t0) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    await writer.close()
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    report = {
+        "mode": mode,
+        "runs": runs,
+        "concurrency": concurrency,
+        "failed": failed,
+        "inserts_per_sec": round((runs - failed) / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies), 2) if latencies else None,
+        "p99_ms": round(latencies[int(0.99 * (len(latencies) - 1))], 2) if latencies else None,
+    }
+    if mode == "group":
+        report["commits"] = writer.batches
+        report["avg_batch"] = round(writer.rows / max(1, writer.batches), 1)
+    return report
+
+
+async def run_all(args) -> list:
+    from app.db.session import Base, async_engine
+    import app.models  # noqa: F401  (register every table)
+
+    async with async_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    modes = ["per-request", "group"] if args.mode == "both" else [args.mode]
+    reports = [
+        await bench(mode, args.runs, args.concurrency, args.max_batch, args.max_delay_ms) for mode in modes
+    ]
+    await async_engine.dispose()
+    return reports
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--mode", choices=["per-request", "group", "both"], default="both")
+    parser.add_argument("--runs", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--max-batch", type=int, default=200)
+    parser.add_argument("--max-delay-ms", type=float, default=5.0)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run_all(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""Benchmark full-text search over debug sessions.
+
+Usage (from backend/):
+    python -m benchmarks.bench_search --backend memory --sessions 100000
+    DATABASE_URL=postgresql://... python -m benchmarks.bench_search --backend postgres --sessions 1000000
+
+The postgres backend fills ``debug_sessions`` with synthetic rows using
+generate_series (so run it against a scratch database), then times ranked
+searches through the real query path. The memory backend times the
+in-process inverted index used for SQLite/test setups.
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+import uuid
+from datetime import datetime, timedelta
+
+ERRORS = [
+    "KeyError: '{w}' in handler process_{n}",
+    "TypeError: Cannot read properties of undefined (reading '{w}')",
+    "java.lang.NullPointerException at com.app.{W}Service.run({W}Service.java:{n})",
+    "ValueError: invalid literal for int() with base 10: '{w}'",
+    "ConnectionRefusedError: [Errno 111] Connection refused while calling {w}",
+    "RecursionError: maximum recursion depth exceeded in {w}",
+]
+WORDS = ["user", "order", "payment", "session", "token", "cache", "invoice", "profile", "cart", "report"]
+QUERIES = ["keyerror", "undefined map", "nullpointerexception service", "connection refused", "payment token", "recursion"]
+
+
+def synthetic_session(i: int, rng: random.Random) -> dict:
+    w = rng.choice(WORDS)
+    return {
+        "error_text": rng.choice(ERRORS).format(w=w, W=w.title(), n=i % 997),
+        "explanation": f"The {w} lookup fails because the value is missing when request {i % 101} runs.",
+        "fix_suggestion": f"Validate {w} before use and add a guard clause.",
+        "language": rng.choice(["python", "javascript", "java"]),
+    }
+
+
+def summarize(latencies_ms):
+    ordered = sorted(latencies_ms)
+    return {
+        "p50_ms": round(statistics.median(ordered), 3),
+        "p95_ms": round(ordered[int(0.95 * (len(ordered) - 1))], 3),
+        "max_ms": round(ordered[-1], 3),
+    }
+
+
+def bench_memory(sessions: int, repeats: int) -> dict:
+    from app.models.debug_session import SessionStatus
+    from app.services.session_search import InvertedIndex
+
+    rng = random.Random(42)
+    index = InvertedIndex()
+    start = time.perf_counter()
+    base = datetime(2024, 1, 1)
+    for i in range(sessions):
+        s = synthetic_session(i, rng)
+        index.add(uuid.uuid4(), base + timedelta(seconds=i), s["language"], SessionStatus.COMPLETED, s)
+    build_sec = time.perf_counter() - start
+
+    results = {}
+    for q in QUERIES:
+        latencies = []
+        for _ in range(repeats):
+            t0 = time.perf_counter()
+            index.search(q, limit=20)
+            latencies.append((time.perf_counter() - t0) * 1000)
+        results[q] = summarize(latencies)
+    return {"backend": "memory", "sessions": sessions, "build_sec": round(build_sec, 2), "queries": results}
+
+
+async def bench_postgres(sessions: int, repeats: int) -> dict:
+    from sqlalchemy import text
+    from app.db.session import AsyncSessionLocal, Base, async_engine
+    from app.services.session_search import search_sessions
+
+    async with async_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        start = time.perf_counter()
+        await conn.execute(text(
+            """
+            INSERT INTO debug_sessions (id, created_at, updated_at, language, error_text, error_snippet,
+                                        explanation, fix_suggestion, status)
+            SELECT gen_random_uuid(), now() - (g || ' seconds')::interval, now(),
+                   (ARRAY['python','javascript','java'])[1 + g % 3],
+                   (ARRAY['KeyError: ''user'' in handler', 'TypeError: Cannot read properties of undefined (reading ''map'')',
+                          'java.lang.NullPointerException at com.app.PaymentService.run',
+                          'ConnectionRefusedError: Connection refused while calling token',
+                          'RecursionError: maximum recursion depth exceeded'])[1 + g % 5] || ' #' || g,
+                   'err #' || g,
+                   'The lookup fails because the value is missing when request ' || (g % 101) || ' runs.',
+                   'Validate input before use and add a guard clause.',
+                   'COMPLETED'
+            FROM generate_series(1, :n) AS g
+            """
+        ), {"n": sessions})
+        await conn.execute(text("ANALYZE debug_sessions"))
+        load_sec = time.perf_counter() - start
+
+    results = {}
+    async with AsyncSessionLocal() as db:
+        for q in QUERIES:
+            latencies = []
+            for _ in range(repeats):
+                t0 = time.perf_counter()
+                await search_sessions(db, q, limit=20)
+                latencies.append((time.perf_counter() - t0) * 1000)
+            results[q] = summarize(latencies)
+    return {"backend": "postgres", "sessions": sessions, "load_sec": round(load_sec, 2), "queries": results}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--backend", choices=["memory", "postgres"], default="memory")
+    parser.add_argument("--sessions", type=int, default=1_000_000)
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    if args.backend == "memory":
+        report = bench_memory(args.sessions, args.repeats)
+    else:
+        report = asyncio.run(bench_postgres(args.sessions, args.repeats))
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
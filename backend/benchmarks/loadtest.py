@@ -0,0 +1,428 @@
+"""End-to-end load test of the API with a configurable request mix.
+
+Usage (from backend/):
+    python -m benchmarks.loadtest --duration 30 --concurrency 32
+    python -m benchmarks.loadtest --mix create_session=1,create_run=2,list_sessions=4,get_session=4,ws_logs=1
+    python -m benchmarks.loadtest --output before.json
+    python -m benchmarks.loadtest --compare before.json
+    python -m benchmarks.loadtest --cassette llm_cassette.ndjson --llm-latency-scale 0.5 --llm-error-rate 0.05
+
+The real FastAPI app is served by uvicorn on a thread of this process.
+Generation goes through ``DummyLLMClient`` (``LLM_API_KEY`` is cleared), or
+replays a recorded cassette with ``--cassette`` (see
+``app.services.llm_cassette``) for realistic latencies and failures. Sandbox
+runs through a stand-in for Docker. The stand-in sleeps for
+``--sandbox-ms`` per run and returns output shaped like a real run, so the
+run path (broker, group commit, output chunks) is exercised without
+containers. Use ``--docker`` to run real containers instead. Rate limiting
+is disabled.
+
+``--concurrency`` clients issue requests back to back for ``--duration``
+seconds, each picking an operation at random with the ``--mix`` weights:
+
+- ``create_session``: ``POST /api/debug-sessions``
+- ``get_session``: ``GET /api/debug-sessions/{id}``
+- ``list_sessions``: ``GET /api/debug-sessions``
+- ``create_run``: ``POST /api/runs``
+- ``get_run``: ``GET /api/runs/{id}``
+- ``ws_logs``: open ``/api/runs/ws/{id}/logs`` and read until ``complete``
+
+The report gives throughput and p50/p95/p99 latency per operation and
+overall. It also gives the server's event-loop lag, sampled every 10 ms on
+the server loop. A lag of more than a few milliseconds means blocking work
+on the loop. The report is printed as JSON and written to ``--output``
+(default ``benchmarks/results/loadtest-<commit>.json``). ``--compare``
+prints the relative change against an earlier report. Without DATABASE_URL
+a temporary SQLite file is used.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import socket
+import statistics
+import subprocess
+import tempfile
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+BENCH_DIR = Path(__file__).resolve().parent
+
+DEFAULT_MIX = "create_session=1,get_session=4,list_sessions=3,create_run=2,get_run=2,ws_logs=1"
+OPERATIONS = ("create_session", "get_session", "list_sessions", "create_run", "get_run", "ws_logs")
+
+ERRORS = [
+    ("python", "Traceback (most recent call last):\n  File \"app.py\", line 12, in handler\nKeyError: 'user'"),
+    ("javascript", "TypeError: Cannot read properties of undefined (reading 'map')\n    at render (app.js:8:19)"),
+    ("java", "Exception in thread \"main\" java.lang.NullPointerException\n\tat Main.main(Main.java:5)"),
+]
+
+
+def parse_mix(text: str) -> Dict[str, float]:
+    """``"op=weight,..."`` -> weights; unknown operations raise ValueError."""
+    mix = {}
+    for part in text.split(","):
+        if not part.strip():
+            continue
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise ValueError(f"unknown operation {name!r}; choose from {', '.join(OPERATIONS)}")
+        mix[name] = float(weight or 1)
+    if not any(weight > 0 for weight in mix.values()):
+        raise ValueError("the mix needs at least one operation with a positive weight")
+    return mix
+
+
+def nearest_rank(ordered: List[float], q: float) -> float:
+    """Nearest-rank ``q`` quantile of sorted, non-empty ``ordered``.
+
+    The smallest sample with at least a fraction ``q`` of the samples at or below it.
+    """
+    return ordered[max(0, math.ceil(q * len(ordered)) - 1)]
+
+
+def summarize(latencies_ms: List[float], elapsed_sec: float, errors: int = 0) -> Dict:
+    ordered = sorted(latencies_ms)
+
+    def pct(q: float) -> Optional[float]:
+        return round(nearest_rank(ordered, q), 2) if ordered else None
+
+    return {
+        "requests": len(ordered),
+        "errors": errors,
+        "throughput_rps": round(len(ordered) / elapsed_sec, 1) if elapsed_sec else None,
+        "p50_ms": round(statistics.median(ordered), 2) if ordered else None,
+        "p95_ms": pct(0.95),
+        "p99_ms": pct(0.99),
+        "max_ms": round(ordered[-1], 2) if ordered else None,
+    }
+
+
+def compare(report: Dict, baseline: Dict) -> Dict:
+    """Relative change (``+0.12`` = 12% higher) of throughput and latencies per operation."""
+    changes = {}
+    for name, current in report["operations"].items():
+        before = baseline.get("operations", {}).get(name)
+        if not before:
+            continue
+        changes[name] = {
+            key: round(current[key] / before[key] - 1, 3)
+            for key in ("throughput_rps", "p50_ms", "p95_ms", "p99_ms")
+            if current.get(key) is not None and before.get(key)
+        }
+    return changes
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# ---------------------------------------------------------------------------
+# Server
+
+
+def _sandbox_stand_in(sandbox_ms: float):
+    """A ``SandboxRunner`` that sleeps instead of starting a container."""
+    from app.services.sandbox_runner import SandboxRunner
+
+    class StandInSandboxRunner(SandboxRunner):
+        def run_in_sandbox(self, language: str, code: str, timeout_sec: int = 10) -> dict:
+            import uuid
+
+            time.sleep(sandbox_ms / 1000)
+            failed = "raise" in code or "throw" in code
+            return {
+                "run_id": str(uuid.uuid4()),
+                "image": self._image_for_language(language),
+                "filename": "main",
+                "stdout": "".join(f"step {i}: ok\n" for i in range(40)),
+                "stderr": ERRORS[0][1] if failed else "",
+                "exit_code": 1 if failed else 0,
+                "execution_time_ms": int(sandbox_ms),
+                "status": "error" if failed else "completed",
+            }
+
+    return StandInSandboxRunner
+
+
+class LagMonitor:
+    """Samples how late the event loop wakes up from a fixed-interval sleep."""
+
+    def __init__(self, interval_sec: float = 0.01):
+        self.interval_sec = interval_sec
+        self.samples_ms: List[float] = []
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval_sec
+            await asyncio.sleep(self.interval_sec)
+            self.samples_ms.append(max(0.0, (loop.time() - expected) * 1000))
+
+    def report(self) -> Dict:
+        ordered = sorted(self.samples_ms)
+        if not ordered:
+            return {}
+        return {
+            "samples": len(ordered),
+            "mean_ms": round(statistics.fmean(ordered), 2),
+            "p50_ms": round(statistics.median(ordered), 2),
+            "p99_ms": round(nearest_rank(ordered, 0.99), 2),
+            "max_ms": round(ordered[-1], 2),
+        }
+
+
+class ServerThread(threading.Thread):
+    """uvicorn serving the app on its own event loop, with a lag monitor on that loop."""
+
+    def __init__(self, port: int):
+        super().__init__(daemon=True)
+        import uvicorn
+        from app.main import app
+
+        self.server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+        self.lag = LagMonitor()
+
+    def run(self) -> None:
+        asyncio.run(self._serve())
+
+    async def _serve(self) -> None:
+        monitor = asyncio.create_task(self.lag.run())
+        try:
+            await self.server.serve()
+        finally:
+            monitor.cancel()
+
+    def stop(self) -> None:
+        self.server.should_exit = True
+        self.join(timeout=10)
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+# ---------------------------------------------------------------------------
+# Client
+
+
+class LoadTest:
+    def __init__(self, base_url: str, mix: Dict[str, float], seed: int = 42):
+        self.base_url = base_url
+        self.ws_url = "ws" + base_url[len("http"):]
+        self.mix = mix
+        self.rng = random.Random(seed)
+        self.session_ids: List[str] = []
+        self.run_ids: List[str] = []
+        self.latencies: Dict[str, List[float]] = {name: [] for name in mix}
+        self.errors: Dict[str, int] = {name: 0 for name in mix}
+        self.error_samples: List[str] = []
+        self._counter = 0
+
+    async def create_session(self, client) -> None:
+        self._counter += 1
+        language, error = ERRORS[self._counter % len(ERRORS)]
+        response = await client.post("/api/debug-sessions", json={
+            "language": language,
+            "error_text": f"{error}\n# request {self._counter}",  # distinct, so nothing is coalesced
+            "code_snippet": "def handler(event):\n    return event['user']['id']\n",
+        })
+        response.raise_for_status()
+        self.session_ids.append(response.json()["id"])
+
+    async def get_session(self, client) -> None:
+        if not self.session_ids:
+            return await self.create_session(client)
+        response = await client.get(f"/api/debug-sessions/{self.rng.choice(self.session_ids)}")
+        response.raise_for_status()
+
+    async def list_sessions(self, client) -> None:
+        response = await client.get("/api/debug-sessions", params={"limit": 20})
+        response.raise_for_status()
+
+    async def create_run(self, client) -> None:
+        self._counter += 1
+        code = "print('ok')\n" if self._counter % 4 else "raise KeyError('user')\n"
+        response = await client.post("/api/runs", json={"language": "python", "code": code, "timeout_sec": 10})
+        response.raise_for_status()
+        self.run_ids.append(response.json()["run_id"])
+
+    async def get_run(self, client) -> None:
+        if not self.run_ids:
+            return await self.create_run(client)
+        response = await client.get(f"/api/runs/{self.rng.choice(self.run_ids)}")
+        response.raise_for_status()
+
+    async def ws_logs(self, client) -> None:
+        import websockets
+
+        if not self.run_ids:
+            await self.create_run(client)
+        url = f"{self.ws_url}/api/runs/ws/{self.rng.choice(self.run_ids)}/logs"
+        async with websockets.connect(url) as ws:
+            while True:
+                message = json.loads(await ws.recv())
+                if "error" in message:
+                    raise RuntimeError(message["error"])
+                if message.get("type") == "complete":
+                    return
+
+    async def worker(self, client, deadline: float) -> None:
+        names, weights = list(self.mix), list(self.mix.values())
+        while time.perf_counter() < deadline:
+            name = self.rng.choices(names, weights)[0]
+            t0 = time.perf_counter()
+            try:
+                await getattr(self, name)(client)
+            except Exception as exc:
+                self.errors[name] += 1
+                if len(self.error_samples) < 5:
+                    self.error_samples.append(f"{name}: {exc!r}"[:300])
+                continue
+            self.latencies[name].append((time.perf_counter() - t0) * 1000)
+
+    async def warm_up(self, client, sessions: int, runs: int) -> None:
+        for operation, count in ((self.create_session, sessions), (self.create_run, runs)):
+            for _ in range(count):
+                try:
+                    await operation(client)
+                except Exception:  # e.g. injected LLM errors; measured later
+                    pass
+
+    async def run(self, concurrency: int, duration_sec: float, lag: Optional[LagMonitor] = None) -> float:
+        import httpx
+
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        async with httpx.AsyncClient(base_url=self.base_url, limits=limits, timeout=60) as client:
+            await self.warm_up(client, sessions=10, runs=10)
+            for name in self.latencies:
+                self.latencies[name].clear()
+                self.errors[name] = 0
+            if lag is not None:
+                lag.samples_ms.clear()  # measure the steady state only
+            start = time.perf_counter()
+            await asyncio.gather(*(self.worker(client, start + duration_sec) for _ in range(concurrency)))
+            return time.perf_counter() - start
+
+
+async def _create_schema() -> None:
+    from app.db.session import Base, async_engine
+    import app.models  # noqa: F401  (register every table)
+
+    async with async_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    await async_engine.dispose()
+
+
+def run(args) -> Dict:
+    mix = parse_mix(args.mix)
+    asyncio.run(_create_schema())
+    if not args.docker:
+        import app.api.routes_debug
+        import app.api.routes_runs
+
+        stand_in = _sandbox_stand_in(args.sandbox_ms)
+        app.api.routes_runs.SandboxRunner = stand_in
+        app.api.routes_debug.SandboxRunner = stand_in
+
+    server = ServerThread(_free_port())
+    server.start()
+    while not server.server.started:
+        if not server.is_alive():
+            raise RuntimeError("server failed to start")
+        time.sleep(0.01)
+
+    load = LoadTest(f"http://127.0.0.1:{server.server.config.port}", mix, seed=args.seed)
+    try:
+        elapsed = asyncio.run(load.run(args.concurrency, args.duration, server.lag))
+    finally:
+        server.stop()
+
+    all_latencies = [ms for latencies in load.latencies.values() for ms in latencies]
+    return {
+        "benchmark": "loadtest",
+        "commit": _git_commit(),
+        "timestamp": datetime.utcnow().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "database": os.environ["DATABASE_URL"].split(":", 1)[0],
+        "config": {
+            "concurrency": args.concurrency,
+            "duration_sec": args.duration,
+            "mix": mix,
+            "sandbox": "docker" if args.docker else f"stand-in {args.sandbox_ms} ms",
+            "llm": (
+                f"replay {args.cassette} x{args.llm_latency_scale}, error rate {args.llm_error_rate}"
+                if args.cassette else "dummy"
+            ),
+        },
+        "elapsed_sec": round(elapsed, 2),
+        "overall": summarize(all_latencies, elapsed, sum(load.errors.values())),
+        "operations": {
+            name: summarize(latencies, elapsed, load.errors[name]) for name, latencies in load.latencies.items()
+        },
+        "event_loop_lag": server.lag.report(),
+        "error_samples": load.error_samples,
+    }
+
+
+def _configure_env(args) -> None:
+    """Settings for the in-process app; must run before anything imports ``app``."""
+    if "DATABASE_URL" not in os.environ:
+        os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/loadtest.db"
+    os.environ["LLM_API_KEY"] = ""
+    os.environ["RATE_LIMIT_ENABLED"] = "false"
+    if args.cassette:
+        os.environ.update({
+            "LLM_CASSETTE_MODE": "replay",
+            "LLM_CASSETTE_PATH": args.cassette,
+            "LLM_REPLAY_LATENCY_SCALE": str(args.llm_latency_scale),
+            "LLM_REPLAY_ERROR_RATE": str(args.llm_error_rate),
+            "LLM_REPLAY_SEED": str(args.seed),
+        })
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds of measured load")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"operation=weight list (default {DEFAULT_MIX})")
+    parser.add_argument("--sandbox-ms", type=float, default=50.0, help="time the Docker stand-in takes per run")
+    parser.add_argument("--docker", action="store_true", help="run real sandbox containers")
+    parser.add_argument("--cassette", help="replay LLM completions from this cassette instead of DummyLLMClient")
+    parser.add_argument("--llm-latency-scale", type=float, default=1.0, help="scales replayed LLM latencies")
+    parser.add_argument("--llm-error-rate", type=float, default=0.0, help="fraction of replayed LLM calls that fail")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="report path (default benchmarks/results/loadtest-<commit>.json)")
+    parser.add_argument("--compare", help="earlier report to compare against")
+    args = parser.parse_args()
+
+    _configure_env(args)
+    report = run(args)
+    if args.compare:
+        report["compared_to"] = {"path": args.compare}
+        baseline = json.loads(Path(args.compare).read_text())
+        report["compared_to"]["commit"] = baseline.get("commit")
+        report["change"] = compare(report, baseline)
+
+    output = Path(args.output) if args.output else BENCH_DIR / "results" / f"loadtest-{report['commit'] or 'local'}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2) + "\n")
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -54,3 +54,35 @@ def test_create_debug_session_success(mock_generator_class, mock_llm_class):
     # In a real test, you'd use a test database or mock the DB layer
     # For now, this documents the expected behavior
     assert response.status_code in [201, 500]  # 500 if no DB configured
+
+
+@pytest.mark.asyncio
+async def test_create_debug_session_holds_no_connection_while_generating(api_client, sqlite_engine):
+    """The session is committed before generation, so no pooled connection waits on the LLM."""
+    from sqlalchemy import event
+
+    checked_out = 0
+
+    def on_checkout(*args):
+        nonlocal checked_out
+        checked_out += 1
+
+    def on_checkin(*args):
+        nonlocal checked_out
+        checked_out -= 1
+
+    event.listen(sqlite_engine.sync_engine, "checkout", on_checkout)
+    event.listen(sqlite_engine.sync_engine, "checkin", on_checkin)
+    during = []
+
+    async def generate(session_data):
+        during.append(checked_out)
+        return ReproductionResult(repro_code="x", test_code="y", explanation="z", fix_suggestion="w")
+
+    with patch('app.api.routes_debug.LLMClient'), patch('app.api.routes_debug.ReproductionGenerator') as generator:
+        generator.return_value.generate_reproduction = generate
+        response = api_client.post("/api/debug-sessions", json={"language": "python", "error_text": "KeyError: 'a'"})
+
+    assert response.status_code == 201
+    assert response.json()["status"] == "completed" and response.json()["repro_code"] == "x"
+    assert during == [0]
@@ -0,0 +1,168 @@
+"""Tests for circuit breakers and the fail-fast 503 responses."""
+import asyncio
+
+import docker.errors
+import pytest
+import requests
+from fastapi.testclient import TestClient
+
+from app.services.circuit_breaker import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    CircuitBreaker,
+    CircuitOpenError,
+)
+from app.services.llm_client import BaseLLMClient, FailoverLLMClient
+from app.services.sandbox_runner import SandboxRunner, is_daemon_outage
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+class StatusError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+def _fail(breaker: CircuitBreaker, exc: Exception) -> None:
+    with pytest.raises(type(exc)):
+        with breaker.guard():
+            raise exc
+
+
+def test_opens_after_consecutive_outages_and_probes_once():
+    clock = Clock()
+    breaker = CircuitBreaker("test-probe", failure_threshold=3, recovery_sec=10, clock=clock)
+    _fail(breaker, ConnectionError("refused"))
+    _fail(breaker, StatusError(400))  # the dependency answered: resets the count
+    for _ in range(3):
+        _fail(breaker, StatusError(503))
+    assert breaker.state == OPEN
+
+    clock.now += 4
+    with pytest.raises(CircuitOpenError) as rejected:
+        with breaker.guard():
+            pass
+    assert rejected.value.headers() == {"Retry-After": "6"}
+
+    clock.now += 6
+    probe = breaker.before_call()
+    assert probe and breaker.state == HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()  # only one probe at a time
+    breaker.record_success()
+    assert breaker.state == CLOSED and breaker.snapshot()["rejected"] == 2
+
+
+def test_failed_probe_reopens_and_cancelled_probe_frees_the_slot():
+    clock = Clock()
+    breaker = CircuitBreaker("test-reopen", failure_threshold=1, recovery_sec=5, clock=clock)
+    _fail(breaker, TimeoutError())
+    clock.now += 5
+    _fail(breaker, TimeoutError())
+    assert breaker.state == OPEN and breaker.retry_after() == 5
+
+    clock.now += 5
+    with pytest.raises(asyncio.CancelledError):
+        with breaker.guard():
+            raise asyncio.CancelledError()
+    assert breaker.state == HALF_OPEN
+    with breaker.guard():
+        pass
+    assert breaker.state == CLOSED
+
+
+def _docker_api_error(cls, status_code):
+    response = requests.Response()
+    response.status_code = status_code
+    return cls(f"HTTP {status_code}", response=response)
+
+
+def test_docker_breaker_counts_only_daemon_outages():
+    unreachable = docker.errors.DockerException("Error while fetching server API version")
+    unreachable.__cause__ = requests.ConnectionError("connection refused")
+    assert is_daemon_outage(unreachable)
+    assert is_daemon_outage(_docker_api_error(docker.errors.APIError, 500))
+    assert is_daemon_outage(requests.ReadTimeout())
+    assert not is_daemon_outage(_docker_api_error(docker.errors.ImageNotFound, 404))
+    assert not is_daemon_outage(_docker_api_error(docker.errors.APIError, 409))
+    assert not is_daemon_outage(RuntimeError("Failed to create container"))
+
+
+def test_missing_image_does_not_open_the_docker_breaker(monkeypatch):
+    runner = SandboxRunner()
+    assert runner.breaker.is_failure is is_daemon_outage
+    runner.breaker = CircuitBreaker("test-docker", failure_threshold=1, is_failure=is_daemon_outage)
+
+    def missing_image(*args, **kwargs):
+        raise _docker_api_error(docker.errors.ImageNotFound, 404)
+
+    monkeypatch.setattr(SandboxRunner, "_run", missing_image)
+    with pytest.raises(docker.errors.ImageNotFound):
+        runner.run_in_sandbox("python", "print(1)")
+    assert runner.breaker.state == CLOSED
+
+    def daemon_error(*args, **kwargs):
+        raise _docker_api_error(docker.errors.APIError, 500)
+
+    monkeypatch.setattr(SandboxRunner, "_run", daemon_error)
+    with pytest.raises(docker.errors.APIError):
+        runner.run_in_sandbox("python", "print(1)")
+    assert runner.breaker.state == OPEN
+
+
+@pytest.fixture
+def docker_breaker_open():
+    breaker = SandboxRunner().breaker
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+    yield breaker
+    breaker.record_success()
+
+
+def test_create_run_fails_fast_while_docker_breaker_is_open(docker_breaker_open, monkeypatch):
+    from app.main import app
+    from app.services.sandbox_runner import SandboxRunner
+
+    def unexpected(*args, **kwargs):
+        raise AssertionError("Docker must not be called while the breaker is open")
+
+    monkeypatch.setattr(SandboxRunner, "_run", unexpected)
+    client = TestClient(app)
+    response = client.post("/api/runs", json={"language": "python", "code": "print(1)"})
+    assert response.status_code == 503
+    assert 1 <= int(response.headers["Retry-After"]) <= docker_breaker_open.recovery_sec
+
+    health = client.get("/health").json()
+    assert health["status"] == "degraded"
+    assert health["circuit_breakers"]["docker"]["state"] == OPEN
+    assert 'circuit_breaker_state{name="docker"} 2' in client.get("/metrics").text
+
+
+class FakeClient(BaseLLMClient):
+    def __init__(self, model: str, breaker: CircuitBreaker):
+        self.model = model
+        self.breaker = breaker
+
+    async def generate_completion(self, prompt, system_prompt=None):
+        with self.breaker.guard():
+            return self.model
+
+
+@pytest.mark.asyncio
+async def test_failover_skips_backends_with_open_breakers():
+    broken = CircuitBreaker("test-primary", failure_threshold=1, recovery_sec=60)
+    broken.record_failure()
+    client = FailoverLLMClient(
+        [("primary", FakeClient("primary", broken)), ("backup", FakeClient("backup", CircuitBreaker("test-backup")))],
+        hedge=False,
+    )
+    assert client.ranked()[0][0] == "backup"
+    assert await client.generate_completion("prompt") == "backup"
@@ -0,0 +1,84 @@
+"""Tests for Accept-Encoding negotiation, response compression and sparse fieldsets."""
+import gzip
+
+import pytest
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from fastapi.testclient import TestClient
+
+from app.api.compression import CompressionMiddleware, choose_encoding
+from app.api.fieldsets import parse_fieldset
+from app.schemas.debug_session import DebugSessionResponse
+
+BIG = "x" * 5000
+
+
+def _client() -> TestClient:
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=1024)
+
+    @app.get("/big")
+    async def big():
+        return PlainTextResponse(BIG, headers={"ETag": '"abc"'})
+
+    @app.get("/small")
+    async def small():
+        return PlainTextResponse("ok")
+
+    @app.get("/stream")
+    async def stream():
+        async def chunks():
+            for _ in range(3):
+                yield BIG.encode()
+        return StreamingResponse(chunks(), media_type="application/x-ndjson")
+
+    @app.get("/partial")
+    async def partial():
+        return PlainTextResponse(BIG, status_code=206, headers={"Content-Range": "bytes 0-4999/9000"})
+
+    return TestClient(app)
+
+
+def test_choose_encoding():
+    assert choose_encoding("gzip, deflate, br", brotli_available=True) == "br"
+    assert choose_encoding("gzip, deflate, br", brotli_available=False) == "gzip"
+    assert choose_encoding("br;q=0.5, gzip;q=0.8", brotli_available=True) == "gzip"
+    assert choose_encoding("gzip;q=0, *;q=0.1", brotli_available=False) is None
+    assert choose_encoding("*", brotli_available=False) == "gzip"
+    assert choose_encoding("identity", brotli_available=True) is None
+    assert choose_encoding("", brotli_available=True) is None
+
+
+def test_compresses_above_threshold_only():
+    client = _client()
+    headers = {"Accept-Encoding": "gzip"}
+
+    response = client.get("/big", headers=headers)
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["etag"] == 'W/"abc"'
+    assert "Accept-Encoding" in response.headers["vary"]
+    assert response.text == BIG
+
+    response = client.get("/small", headers=headers)
+    assert "content-encoding" not in response.headers
+    assert response.text == "ok"
+
+    response = client.get("/partial", headers=headers)
+    assert "content-encoding" not in response.headers
+
+
+def test_streaming_response_is_compressed_incrementally():
+    response = _client().get("/stream", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert "content-length" not in response.headers
+    assert response.text == BIG * 3
+
+
+def test_parse_fieldset():
+    assert parse_fieldset(None, DebugSessionResponse) is None
+    assert parse_fieldset("status, explanation,status", DebugSessionResponse, always=("id",)) == (
+        "id", "status", "explanation",
+    )
+    with pytest.raises(HTTPException) as exc:
+        parse_fieldset("status,secret", DebugSessionResponse)
+    assert exc.value.status_code == 400
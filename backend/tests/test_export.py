@@ -0,0 +1,31 @@
+"""Tests for export field selection and batch encoding."""
+import json
+import uuid
+from datetime import datetime
+
+import pytest
+from fastapi import HTTPException
+
+from app.api.routes_export import encode_batch, export_columns
+from app.models.debug_session import DebugSession, SessionStatus
+
+
+def test_field_selection():
+    assert [c.name for c in export_columns(DebugSession, "id, status,id")] == ["id", "status"]
+    assert len(export_columns(DebugSession, None)) == len(DebugSession.__table__.columns)
+    with pytest.raises(HTTPException) as exc:
+        export_columns(DebugSession, "id,secret")
+    assert exc.value.status_code == 400
+
+
+def test_ndjson_and_columnar_batches():
+    row_id = uuid.uuid4()
+    rows = [(row_id, datetime(2024, 5, 1, 12), SessionStatus.COMPLETED)] * 2
+    names = ["id", "created_at", "status"]
+
+    lines = encode_batch(names, rows, "ndjson").decode().splitlines()
+    assert len(lines) == 2
+    assert json.loads(lines[0]) == {"id": str(row_id), "created_at": "2024-05-01T12:00:00", "status": "completed"}
+
+    chunk = json.loads(encode_batch(names, rows, "columnar"))
+    assert chunk["rows"] == 2 and chunk["columns"]["status"] == ["completed", "completed"]
@@ -0,0 +1,91 @@
+"""Route tests for the membership-aware feeds."""
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.api.pagination import NEXT_CURSOR_HEADER
+from app.models.debug_session import DebugSession, SessionStatus
+from app.models.run import Run
+from app.models.team import Membership
+
+
+@pytest.fixture
+def people():
+    return {name: uuid.uuid4() for name in ("me", "other", "team", "foreign_team")}
+
+
+async def _seed(db, people):
+    """Sessions and runs of several owners and teams, one minute apart (newest last)."""
+    base = datetime(2025, 1, 1)
+    owners = [
+        ("mine", people["me"], None),
+        ("mine_in_team", people["me"], people["team"]),  # visible through both scopes
+        ("teammate", people["other"], people["team"]),
+        ("team_anonymous", None, people["team"]),
+        ("stranger", people["other"], people["foreign_team"]),
+        ("other_private", people["other"], None),
+    ]
+    db.add(Membership(user_id=people["me"], team_id=people["team"]))
+    for i in range(12):
+        label, user_id, team_id = owners[i % len(owners)]
+        created_at = base + timedelta(minutes=i)
+        db.add(DebugSession(
+            created_at=created_at, user_id=user_id, team_id=team_id, language="python" if i % 2 else "go",
+            error_text=f"{label} {i}", status=SessionStatus.COMPLETED,
+        ))
+        db.add(Run(created_at=created_at, user_id=user_id, team_id=team_id, language="python", status="success"))
+    await db.commit()
+
+
+def _pages(client, path, params, limit):
+    items, cursor = [], None
+    while True:
+        response = client.get(path, params={**params, "limit": limit, **({"cursor": cursor} if cursor else {})})
+        assert response.status_code == 200
+        items.extend(response.json())
+        cursor = response.headers.get(NEXT_CURSOR_HEADER)
+        if cursor is None:
+            return items
+
+
+@pytest.mark.asyncio
+async def test_session_feed_lists_own_and_team_rows_once_across_pages(api_client, db, people):
+    await _seed(db, people)
+
+    items = _pages(api_client, "/api/feed/sessions", {"user_id": str(people["me"])}, limit=3)
+
+    labels = [item["error_snippet"].split()[0] for item in items]
+    assert labels == ["team_anonymous", "teammate", "mine_in_team", "mine"] * 2
+    created = [item["created_at"] for item in items]
+    assert created == sorted(created, reverse=True)
+    assert len({item["id"] for item in items}) == len(items)
+
+
+@pytest.mark.asyncio
+async def test_session_feed_filters_and_single_team(api_client, db, people):
+    await _seed(db, people)
+    me = str(people["me"])
+
+    python_only = _pages(api_client, "/api/feed/sessions", {"user_id": me, "language": "python"}, limit=2)
+    assert {item["language"] for item in python_only} == {"python"}
+    assert len(python_only) == 4
+
+    team = _pages(api_client, "/api/feed/sessions", {"user_id": me, "team_id": str(people["team"])}, limit=5)
+    assert {item["team_id"] for item in team} == {str(people["team"])}
+    assert len(team) == 6
+
+    forbidden = api_client.get("/api/feed/sessions", params={"user_id": me, "team_id": str(people["foreign_team"])})
+    assert forbidden.status_code == 403
+
+
+@pytest.mark.asyncio
+async def test_run_feed_without_teams_is_owner_only(api_client, db, people):
+    await _seed(db, people)
+
+    mine = _pages(api_client, "/api/feed/runs", {"user_id": str(people["other"])}, limit=4)
+    assert {item["user_id"] for item in mine} == {str(people["other"])}
+    assert len(mine) == 6
+
+    shared = _pages(api_client, "/api/feed/runs", {"user_id": str(people["me"])}, limit=100)
+    assert len(shared) == 8
@@ -0,0 +1,39 @@
+"""Tests for ETag helpers and the terminal-resource response cache."""
+import pytest
+
+from app.api.http_cache import RangeNotSatisfiable, ResponseCache, etag_matches, parse_byte_range
+
+
+def test_lru_evicts_least_recently_used_and_invalidates():
+    cache = ResponseCache(max_entries=2)
+    a = cache.put("a", b'{"id": "a"}')
+    cache.put("b", b'{"id": "b"}')
+    assert cache.get("a") == a
+    cache.put("c", b'{"id": "c"}')
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    cache.invalidate("a")
+    assert cache.get("a") is None
+    assert len(cache) == 1
+
+
+def test_etag_matching():
+    etag = ResponseCache(1).put("k", b"{}").etag
+    assert etag_matches(etag, etag)
+    assert etag_matches(f'"other", W/{etag}', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches('"other"', etag)
+    assert not etag_matches(None, etag)
+
+
+def test_byte_ranges():
+    assert parse_byte_range("bytes=0-9", 100) == (0, 9)
+    assert parse_byte_range("bytes=90-", 100) == (90, 99)
+    assert parse_byte_range("bytes=-10", 100) == (90, 99)
+    assert parse_byte_range("bytes=50-500", 100) == (50, 99)
+    assert parse_byte_range("bytes=0-1,5-6", 100) is None
+    assert parse_byte_range("items=0-1", 100) is None
+    assert parse_byte_range(None, 100) is None
+    with pytest.raises(RangeNotSatisfiable):
+        parse_byte_range("bytes=100-", 100)
@@ -0,0 +1,96 @@
+"""Tests for the record/replay LLM client."""
+import asyncio
+import time
+
+import pytest
+
+from app.services.llm_cassette import (
+    CassetteMiss,
+    RecordingLLMClient,
+    ReplayedLLMError,
+    ReplayLLMClient,
+    split_tokens,
+)
+from app.services.llm_client import BaseLLMClient
+from app.services.rate_limiter import is_rate_limit_error, retry_after_seconds
+
+
+class FakeProvider(BaseLLMClient):
+    model = "fake-model"
+
+    async def generate_completion(self, prompt, system_prompt=None):
+        await asyncio.sleep(0.02)
+        if prompt == "fail":
+            raise RuntimeError("provider down")
+        return f"answer to {prompt}"
+
+
+@pytest.mark.asyncio
+async def test_record_then_replay(tmp_path):
+    path = tmp_path / "cassette.ndjson"
+    recorder = RecordingLLMClient(FakeProvider(), str(path))
+    assert await recorder.generate_completion("a", "sys") == "answer to a"
+    with pytest.raises(RuntimeError):
+        await recorder.generate_completion("fail")
+
+    replay = ReplayLLMClient.from_file(str(path), latency_scale=0.5)
+    assert replay.model == "fake-model"
+    start = time.monotonic()
+    assert await replay.generate_completion("a", "sys") == "answer to a"
+    assert time.monotonic() - start >= 0.009
+    with pytest.raises(ReplayedLLMError):
+        await replay.generate_completion("fail")
+
+    # Unknown prompts map to a recorded entry deterministically, unless strict
+    first = await _outcome(replay, "something new")
+    assert first == await _outcome(replay, "something new")
+    with pytest.raises(CassetteMiss):
+        await ReplayLLMClient.from_file(str(path), strict=True).generate_completion("something new")
+
+
+async def _outcome(client, prompt):
+    try:
+        return await client.generate_completion(prompt)
+    except ReplayedLLMError as exc:
+        return str(exc)
+
+
+@pytest.mark.asyncio
+async def test_streaming_and_injected_errors():
+    entry = {"key": "k", "latency_ms": 40.0, "first_token_ms": 20.0, "response": "def f():\n    return 1\n"}
+    replay = ReplayLLMClient([entry], seed=1)
+
+    start = time.monotonic()
+    pieces = [piece async for piece in replay.stream_completion("anything")]
+    assert "".join(pieces) == entry["response"] and len(pieces) > 1
+    assert time.monotonic() - start >= 0.035
+    assert split_tokens("a  b\nc") == ["a  ", "b\n", "c"]
+
+    failing = ReplayLLMClient([entry], latency_scale=0, error_rate=1.0, error_status=429)
+    with pytest.raises(ReplayedLLMError) as exc:
+        await failing.generate_completion("anything")
+    assert is_rate_limit_error(exc.value)
+    assert retry_after_seconds(exc.value) == 1.0
+    assert failing.snapshot()["injected_errors"] == 1
+
+
+@pytest.mark.asyncio
+async def test_from_settings_passes_the_replay_seed(tmp_path, monkeypatch):
+    from app.config import settings
+    from app.services.llm_client import LLMClient, last_model_used
+
+    path = tmp_path / "cassette.ndjson"
+    path.write_text('{"key": "k", "latency_ms": 0, "response": "ok", "model": "recorded"}\n')
+    monkeypatch.setattr(settings, "LLM_CASSETTE_MODE", "replay")
+    monkeypatch.setattr(settings, "LLM_CASSETTE_PATH", str(path))
+    monkeypatch.setattr(settings, "LLM_REPLAY_ERROR_RATE", 0.5)
+    monkeypatch.setattr(settings, "LLM_REPLAY_SEED", 7)
+
+    async def failures():
+        monkeypatch.setattr(LLMClient, "_from_settings", None)
+        client = LLMClient.from_settings()
+        return [await _outcome(client, "prompt") != "ok" for _ in range(20)]
+
+    first = await failures()
+    assert first == await failures() and any(first) and not all(first)
+    assert last_model_used() == "recorded"
@@ -0,0 +1,65 @@
+"""Tests for the failover/hedging LLM client."""
+import asyncio
+import pytest
+from app.services.llm_client import BaseLLMClient, FailoverLLMClient, last_model_used
+
+
+class FakeClient(BaseLLMClient):
+    def __init__(self, model: str, delay: float = 0.0, error: Exception = None):
+        self.model = model
+        self.delay = delay
+        self.error = error
+        self.cancelled = False
+
+    async def generate_completion(self, prompt, system_prompt=None):
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        if self.error:
+            raise self.error
+        return self.model
+
+
+@pytest.mark.asyncio
+async def test_hedged_request_wins_and_cancels_slow_primary():
+    slow = FakeClient("slow", delay=5)
+    fast = FakeClient("fast", delay=0.01)
+    client = FailoverLLMClient([("openai", slow), ("anthropic", fast)], default_hedge_delay=0.05)
+
+    assert await client.generate_completion("prompt") == "fast"
+    await asyncio.sleep(0)
+    assert slow.cancelled
+    assert last_model_used() == "fast"
+    assert client.stats["anthropic"].wins == 1
+    # The cancelled primary still leaves a lower-bound latency sample, not an error
+    (lower_bound,) = client.stats["openai"].latencies
+    assert lower_bound >= 0.05
+    assert client.stats["openai"].error_rate == 0.0
+
+
+@pytest.mark.asyncio
+async def test_fails_over_when_primary_errors():
+    broken = FakeClient("broken", error=RuntimeError("provider down"))
+    backup = FakeClient("backup")
+    client = FailoverLLMClient([("openai", broken), ("anthropic", backup)], hedge=False)
+
+    assert await client.generate_completion("prompt") == "backup"
+    assert client.stats["openai"].failures == 1
+    assert client.ranked()[0][0] == "openai"  # one failure is not enough to demote
+
+    for _ in range(3):
+        await client.generate_completion("prompt")
+    assert client.ranked()[0][0] == "anthropic"
+
+
+@pytest.mark.asyncio
+async def test_raises_when_all_backends_fail():
+    client = FailoverLLMClient([
+        ("openai", FakeClient("a", error=RuntimeError("a down"))),
+        ("anthropic", FakeClient("b", error=RuntimeError("b down"))),
+    ])
+
+    with pytest.raises(RuntimeError):
+        await client.generate_completion("prompt")
@@ -0,0 +1,28 @@
+"""Tests for the load-test report helpers."""
+import pytest
+
+from benchmarks.loadtest import compare, parse_mix, summarize
+
+
+def test_parse_mix():
+    assert parse_mix("create_session=1, get_session=4,ws_logs") == {
+        "create_session": 1.0, "get_session": 4.0, "ws_logs": 1.0,
+    }
+    with pytest.raises(ValueError):
+        parse_mix("create_session=1,delete_everything=2")
+    with pytest.raises(ValueError):
+        parse_mix("get_run=0")
+
+
+def test_summary_percentiles_and_comparison():
+    summary = summarize([float(ms) for ms in range(1, 101)], elapsed_sec=2.0, errors=3)
+    assert summary["requests"] == 100 and summary["errors"] == 3
+    assert summary["throughput_rps"] == 50.0
+    assert summary["p50_ms"] == 50.5
+    assert summary["p95_ms"] == 95.0 and summary["p99_ms"] == 99.0
+    assert summarize([5.0, 1.0], elapsed_sec=1.0)["p95_ms"] == 5.0
+    assert summarize([], elapsed_sec=1.0)["p99_ms"] is None
+
+    baseline = {"operations": {"get_run": {**summary, "p95_ms": 76.0}}}
+    change = compare({"operations": {"get_run": summary, "ws_logs": summary}}, baseline)
+    assert change == {"get_run": {"throughput_rps": 0.0, "p50_ms": 0.0, "p95_ms": 0.25, "p99_ms": 0.0}}
@@ -0,0 +1,62 @@
+"""Tests for the per-user team membership cache."""
+import uuid
+
+import pytest
+
+from app.services.membership_cache import MembershipCache
+
+
+class _Rows:
+    def __init__(self, values):
+        self._values = values
+
+    def scalars(self):
+        return self
+
+    def all(self):
+        return list(self._values)
+
+
+class _CountingDB:
+    """Answers membership queries with a fixed team list and counts them."""
+
+    def __init__(self, team_ids):
+        self.team_ids = team_ids
+        self.queries = 0
+
+    async def execute(self, _statement):
+        self.queries += 1
+        return _Rows(self.team_ids)
+
+
+@pytest.mark.asyncio
+async def test_team_ids_cached_until_ttl_or_invalidate():
+    now = [0.0]
+    cache = MembershipCache(ttl_sec=60, clock=lambda: now[0])
+    user, team = uuid.uuid4(), uuid.uuid4()
+    db = _CountingDB([team])
+
+    assert await cache.team_ids(db, user) == frozenset({team})
+    assert await cache.is_member(db, user, team)
+    assert db.queries == 1
+
+    now[0] = 61.0
+    await cache.team_ids(db, user)
+    assert db.queries == 2
+
+    db.team_ids = []
+    cache.invalidate(user)
+    assert not await cache.is_member(db, user, team)
+    assert db.queries == 3
+
+
+@pytest.mark.asyncio
+async def test_least_recently_used_user_evicted():
+    cache = MembershipCache(max_users=1)
+    db = _CountingDB([])
+    first, second = uuid.uuid4(), uuid.uuid4()
+
+    await cache.team_ids(db, first)
+    await cache.team_ids(db, second)
+    await cache.team_ids(db, first)
+    assert db.queries == 3
@@ -0,0 +1,96 @@
+"""Tests for the Prometheus metrics registry, request middleware and instrumentation."""
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.pool import QueuePool
+
+from app.api.metrics import MetricsMiddleware, router
+from app.services import metrics
+from app.services.sandbox_runner import SandboxRunner
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = metrics.Registry()
+    histogram = metrics.Histogram("step_seconds", "Step time.", ("step",), buckets=(0.1, 1.0), registry=registry)
+    for value in (0.05, 0.5, 0.5, 3.0):
+        histogram.labels('say "hi"').observe(value)
+    assert registry.render().splitlines() == [
+        "# HELP step_seconds Step time.",
+        "# TYPE step_seconds histogram",
+        'step_seconds_bucket{step="say \\"hi\\"",le="0.1"} 1',
+        'step_seconds_bucket{step="say \\"hi\\"",le="1"} 3',
+        'step_seconds_bucket{step="say \\"hi\\"",le="+Inf"} 4',
+        'step_seconds_sum{step="say \\"hi\\""} 4.05',
+        'step_seconds_count{step="say \\"hi\\""} 4',
+    ]
+    with pytest.raises(ValueError):
+        metrics.Counter("step_seconds", "Duplicate.", registry=registry)
+    with pytest.raises(ValueError):
+        histogram.labels("a", "b")
+
+
+def test_gauge_function_is_read_at_scrape_time():
+    registry = metrics.Registry()
+    gauge = metrics.Gauge("open_things", "Open things.", registry=registry)
+    gauge.inc(3)
+    gauge.dec()
+    assert "open_things 2\n" in registry.render()
+    gauge.set_function(lambda: None)
+    assert registry.render().endswith("# TYPE open_things gauge\n")
+
+
+def _series(metric, *labels) -> float:
+    series = metric._series.get(labels)
+    return 0 if series is None else getattr(series, "value", None) or sum(getattr(series, "counts", []))
+
+
+def test_middleware_labels_by_route_template():
+    app = FastAPI()
+
+    @app.get("/api/items/{item_id}")
+    async def get_item(item_id: str):
+        return {"id": item_id}
+
+    app.include_router(router)
+    app.add_middleware(MetricsMiddleware)
+    client = TestClient(app)
+    before = _series(metrics.http_requests, "GET", "/api/items/{item_id}", "200")
+    unmatched = _series(metrics.http_requests, "GET", "unmatched", "404")
+
+    assert client.get("/api/items/1").status_code == 200
+    assert client.get("/api/items/2").status_code == 200
+    assert client.get("/nope").status_code == 404
+
+    assert _series(metrics.http_requests, "GET", "/api/items/{item_id}", "200") == before + 2
+    assert _series(metrics.http_requests, "GET", "unmatched", "404") == unmatched + 1
+    response = client.get("/metrics")
+    assert response.headers["content-type"] == "text/plain; version=0.0.4; charset=utf-8"
+    assert 'http_request_duration_seconds_count{method="GET",route="/api/items/{item_id}"}' in response.text
+
+
+def test_pool_checkouts_are_timed():
+    engine = create_engine("sqlite://", poolclass=QueuePool)
+    metrics.instrument_pool(engine)
+    metrics.instrument_pool(engine)
+    before = _series(metrics.db_pool_checkout_wait)
+    with engine.connect():
+        assert "db_pool_checked_out 1\n" in metrics.render()
+    assert _series(metrics.db_pool_checkout_wait) == before + 1
+
+
+def test_sandbox_runs_counted_by_language_and_status(monkeypatch):
+    runner = SandboxRunner()
+    monkeypatch.setattr(runner, "_run", lambda language, code, timeout_sec: {"status": "timeout"})
+    before = _series(metrics.sandbox_runs, "python", "timeout")
+    runner.run_in_sandbox("Python", "while True: pass")
+    assert _series(metrics.sandbox_runs, "python", "timeout") == before + 1
+
+    def fail(language, code, timeout_sec):
+        raise RuntimeError("Docker is not running")
+
+    monkeypatch.setattr(runner, "_run", fail)
+    before = _series(metrics.sandbox_runs, "other", "failed")
+    with pytest.raises(RuntimeError):
+        runner.run_in_sandbox("cobol", "")
+    assert _series(metrics.sandbox_runs, "other", "failed") == before + 1
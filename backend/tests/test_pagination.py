@@ -0,0 +1,85 @@
+"""Tests for keyset pagination: cursor encoding and the debug session listing."""
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+
+from app.api.pagination import NEXT_CURSOR_HEADER, decode_cursor, encode_cursor
+from app.models.debug_session import DebugSession, SessionStatus
+
+
+def test_cursor_round_trip_and_rejects_garbage():
+    created_at, row_id = datetime(2024, 12, 31, 23, 59, 59, 123456), uuid.uuid4()
+    cursor = encode_cursor(created_at, row_id)
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == (created_at, row_id)
+
+    for bad in ("not-a-cursor", encode_cursor(created_at, row_id)[:-4], "bm9waXBl"):
+        with pytest.raises(HTTPException) as error:
+            decode_cursor(bad)
+        assert error.value.status_code == 400
+
+
+async def _seed(db):
+    """12 sessions; pairs share a timestamp so pages also break ties on id."""
+    base = datetime(2025, 1, 1)
+    for i in range(12):
+        db.add(DebugSession(
+            created_at=base + timedelta(minutes=i // 2),
+            language="python" if i % 3 else "go",
+            status=SessionStatus.FAILED if i % 4 == 0 else SessionStatus.COMPLETED,
+            error_text=f"ValueError: {i}\nTraceback",
+        ))
+    await db.commit()
+
+
+def _walk(client, limit, **params):
+    pages, cursor = [], None
+    while True:
+        query = {**params, "limit": limit, **({"cursor": cursor} if cursor else {})}
+        response = client.get("/api/debug-sessions", params=query)
+        assert response.status_code == 200
+        pages.append(response.json())
+        cursor = response.headers.get(NEXT_CURSOR_HEADER)
+        if cursor is None:
+            return pages
+
+
+@pytest.mark.asyncio
+async def test_cursor_pages_cover_every_session_once_in_order(api_client, db):
+    await _seed(db)
+
+    pages = _walk(api_client, limit=5)
+    assert [len(page) for page in pages] == [5, 5, 2]
+    items = [item for page in pages for item in page]
+    assert len({item["id"] for item in items}) == 12
+    keys = [(item["created_at"], uuid.UUID(item["id"])) for item in items]
+    assert keys == sorted(keys, reverse=True)
+    assert items[0]["error_snippet"] in ("ValueError: 10", "ValueError: 11")
+
+
+@pytest.mark.asyncio
+async def test_filters_apply_on_every_page(api_client, db):
+    await _seed(db)
+
+    pages = _walk(api_client, limit=2, language="python", status="completed")
+    items = [item for page in pages for item in page]
+    # i % 3 != 0 and i % 4 != 0: 1, 2, 5, 7, 10, 11
+    assert sorted(int(item["error_snippet"].split()[-1]) for item in items) == [1, 2, 5, 7, 10, 11]
+    assert {(item["language"], item["status"]) for item in items} == {("python", "completed")}
+    assert [len(page) for page in pages] == [2, 2, 2]
+
+
+@pytest.mark.asyncio
+async def test_no_next_cursor_on_last_page(api_client, db):
+    await _seed(db)
+
+    exact = api_client.get("/api/debug-sessions", params={"limit": 12})
+    assert len(exact.json()) == 12 and NEXT_CURSOR_HEADER not in exact.headers
+
+    go = api_client.get("/api/debug-sessions", params={"language": "go", "limit": 100})
+    assert len(go.json()) == 4 and NEXT_CURSOR_HEADER not in go.headers
+
+    bad = api_client.get("/api/debug-sessions", params={"cursor": "garbage"})
+    assert bad.status_code == 400
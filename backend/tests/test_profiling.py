@@ -0,0 +1,76 @@
+"""Tests for the request profiler: sampling, classification and the profile store."""
+import asyncio
+import json
+import time
+from datetime import datetime
+
+import pytest
+
+from app.api.profiling import WAITING, Profile, ProfileStore, Sampler, admin_token_matches, categorize
+
+
+def _profile(profile_id: str, duration_ms: float) -> Profile:
+    return Profile(profile_id, "GET", "/", 200, datetime.utcnow(), duration_ms, False, 0, {}, {"a;b": 2})
+
+
+def test_store_keeps_slowest():
+    store = ProfileStore(max_profiles=2)
+    assert store.add(_profile("a", 10))
+    assert store.add(_profile("b", 30))
+    assert store.add(_profile("c", 20))
+    assert not store.add(_profile("d", 5))
+    assert [p.id for p in store.list()] == ["b", "c"]
+    assert store.get("a") is None and store.get("c").collapsed() == "a;b 2\n"
+
+
+def test_admin_token_comparison_handles_any_input(monkeypatch):
+    from app.config import settings
+
+    monkeypatch.setattr(settings, "ADMIN_TOKEN", "s3cret")
+    assert admin_token_matches("s3cret")
+    assert not admin_token_matches("s3cre\u00e9")
+    assert not admin_token_matches("")
+    assert not admin_token_matches(None)
+    monkeypatch.setattr(settings, "ADMIN_TOKEN", "")
+    assert not admin_token_matches("")
+
+
+def test_categorize_uses_innermost_known_frame():
+    assert categorize(["app.api.routes_debug:create", "app.services.llm_client:X.generate", WAITING]) == "llm"
+    assert categorize(["app.services.llm_cassette:R.generate", "json.decoder:JSONDecoder.decode"]) == "json"
+    assert categorize(["app.api.routes_runs:create_run", "[thread] app.services.sandbox_runner:SandboxRunner.run"]) == "docker"
+    assert categorize(["sqlalchemy.ext.asyncio.session:AsyncSession.execute", WAITING]) == "db"
+    assert categorize(["app.api.routes_debug:get", WAITING]) == "other"
+
+
+def _parse_many():
+    deadline = time.perf_counter() + 0.1
+    while time.perf_counter() < deadline:
+        json.loads('{"a": [1, 2, 3], "b": "x"}' * 1)
+
+
+async def _handler():
+    await asyncio.sleep(0.1)
+    await asyncio.to_thread(time.sleep, 0.1)
+    _parse_many()
+
+
+@pytest.mark.asyncio
+async def test_sampler_sees_awaits_threads_and_cpu():
+    sampler = Sampler(interval_ms=2)
+
+    async def profiled():
+        sampler.start("p")
+        try:
+            await _handler()
+        finally:
+            active = sampler.stop("p")
+        return active
+
+    active = await asyncio.create_task(profiled())
+    stacks = "\n".join(active.stacks)
+    assert active.samples > 20
+    assert "asyncio.tasks:sleep;(waiting)" in stacks
+    assert "[thread] time:sleep;(waiting)" in stacks
+    assert "test_profiling:_parse_many" in stacks
+    assert active.categories["json"] > 0
@@ -0,0 +1,68 @@
+"""Tests for stack-trace compaction."""
+from app.services.prompt_compactor import compact_error_text, count_tokens, truncate_to_budget
+
+
+def _recursion_trace(depth: int) -> str:
+    frames = "".join('  File "/app/main.py", line 5, in f\n    return f(n - 1)\n' for _ in range(depth))
+    return f"Traceback (most recent call last):\n{frames}RecursionError: maximum recursion depth exceeded"
+
+
+def test_repeated_frames_are_collapsed():
+    trace = _recursion_trace(500)
+    compacted = compact_error_text(trace, token_budget=10000)
+
+    assert "repeated 499 more times" in compacted
+    assert compacted.endswith("RecursionError: maximum recursion depth exceeded")
+    assert count_tokens(compacted) < count_tokens(trace) / 20
+
+
+def test_library_frames_past_limit_are_dropped():
+    frames = "".join(
+        f'  File "/usr/lib/python3.11/site-packages/pkg/mod{i}.py", line {i}, in call\n    handler()\n'
+        for i in range(20)
+    )
+    trace = f'Traceback (most recent call last):\n  File "/app/main.py", line 3, in <module>\n    run()\n{frames}ValueError: bad'
+    compacted = compact_error_text(trace, token_budget=10000, max_library_frames=2)
+
+    assert "mod1.py" in compacted and "mod2.py" not in compacted
+    assert "18 library frames omitted" in compacted
+    assert "/app/main.py" in compacted
+
+
+def test_log_lines_are_deduped_and_budget_enforced():
+    log = "\n".join(f"2024-05-01 12:00:{i % 60:02d} WARN retrying request id={i}" for i in range(300))
+    compacted = compact_error_text(log + "\nFATAL: giving up", token_budget=10000)
+    assert "repeated 299 more times" in compacted
+
+    noisy = "\n".join(f"line {i} " + "x" * (i % 7) + chr(65 + i % 26) * i for i in range(400))
+    truncated = truncate_to_budget(noisy, 200)
+    assert count_tokens(truncated) <= 220
+    assert "lines truncated" in truncated
+    assert truncated.startswith("line 0")
+
+
+def test_tiktoken_encoding_is_loaded_on_first_count(monkeypatch):
+    import importlib
+    import sys
+    import types
+
+    import app.services.prompt_compactor as prompt_compactor
+
+    loads = []
+
+    class Encoding:
+        def encode(self, text, disallowed_special=()):
+            return text.split()
+
+    fake = types.ModuleType("tiktoken")
+    fake.get_encoding = lambda name: loads.append(name) or Encoding()
+    monkeypatch.setitem(sys.modules, "tiktoken", fake)
+    try:
+        module = importlib.reload(prompt_compactor)
+        assert loads == []
+        assert module.count_tokens("three small words") == 3
+        assert module.count_tokens("and two") == 2
+        assert loads == ["cl100k_base"]
+    finally:
+        monkeypatch.delitem(sys.modules, "tiktoken")
+        importlib.reload(prompt_compactor)
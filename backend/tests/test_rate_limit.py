@@ -0,0 +1,77 @@
+"""Tests for the cost-weighted rate limiting middleware."""
+import os
+import uuid
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.rate_limit import (
+    Bucket,
+    MemoryRateLimitBackend,
+    RateLimitMiddleware,
+    RedisRateLimitBackend,
+)
+
+
+def backends():
+    yield MemoryRateLimitBackend()
+    # Any Redis-protocol server works, e.g. a throwaway `redis-server --port 6390`
+    if os.getenv("TEST_REDIS_URL"):
+        yield RedisRateLimitBackend(os.environ["TEST_REDIS_URL"], prefix=f"test:{uuid.uuid4()}:")
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("backend", list(backends()), ids=lambda b: type(b).__name__)
+async def test_all_buckets_must_pay_and_are_charged_together(backend):
+    user = Bucket("user:u1", capacity=10, refill_per_sec=0.1)
+    team = Bucket("team:t1", capacity=25, refill_per_sec=0.1)
+
+    first = await backend.consume([user, team], cost=8)
+    second = await backend.consume([user, team], cost=8)
+
+    assert first.allowed and first.remaining == 2 and first.bucket == user
+    assert not second.allowed
+    assert second.retry_after_sec >= 50
+    # The rejected request did not charge the team bucket
+    assert (await backend.consume([team], cost=17)).allowed
+
+
+def test_middleware_charges_route_costs_and_sets_headers():
+    app = FastAPI()
+
+    @app.post("/api/debug-sessions")
+    async def create():
+        return {"ok": True}
+
+    @app.get("/health")
+    async def health():
+        return {"ok": True}
+
+    app.add_middleware(RateLimitMiddleware, backend=MemoryRateLimitBackend(), per_minute=50, route_costs={})
+    client = TestClient(app)
+
+    responses = [client.post("/api/debug-sessions") for _ in range(3)]
+    assert [r.status_code for r in responses] == [200, 200, 429]
+    assert responses[0].headers["RateLimit-Remaining"] == "30"
+    assert responses[0].headers["RateLimit-Policy"] == "50;w=60"
+    assert int(responses[2].headers["Retry-After"]) > 0
+
+    # Free routes are never limited; a spoofed user header does not escape the IP bucket
+    assert client.get("/health").status_code == 200
+    assert client.post("/api/debug-sessions", headers={"X-User-Id": "u2"}).status_code == 429
+
+
+def test_requests_are_limited_per_client_ip_only():
+    middleware = RateLimitMiddleware(
+        lambda *a: None, backend=MemoryRateLimitBackend(), per_minute=60, trust_forwarded_for=False
+    )
+    scope = {
+        "type": "http",
+        "client": ("10.0.0.1", 1234),
+        "headers": [(b"x-user-id", b"victim"), (b"x-team-id", b"t9"), (b"x-forwarded-for", b"10.9.9.9")],
+    }
+
+    assert [b.key for b in middleware.buckets_for(scope)] == ["ip:10.0.0.1"]
+    middleware.trust_forwarded_for = True
+    assert [b.key for b in middleware.buckets_for(scope)] == ["ip:10.9.9.9"]
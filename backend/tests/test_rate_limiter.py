@@ -0,0 +1,75 @@
+"""Tests for the LLM provider rate limiter."""
+import pytest
+from types import SimpleNamespace
+from app.services.rate_limiter import ProviderRateLimiter, TokenBucket, retry_after_seconds
+
+
+class FakeClock:
+    """Manually advanced clock; ``sleep`` just moves time forward."""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    async def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class RateLimited(Exception):
+    status_code = 429
+
+    def __init__(self, retry_after: str):
+        super().__init__("rate limited")
+        self.response = SimpleNamespace(headers={"retry-after": retry_after})
+
+
+def test_token_bucket_queues_in_arrival_order():
+    clock = FakeClock()
+    bucket = TokenBucket(60, capacity=1, clock=clock)  # one token per second
+
+    assert bucket.reserve(1) == 0.0
+    assert bucket.reserve(1) == pytest.approx(1.0)
+    assert bucket.reserve(1) == pytest.approx(2.0)
+
+    clock.now = 3.0
+    assert bucket.reserve(1) == 0.0
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_honors_retry_after():
+    clock = FakeClock()
+    limiter = ProviderRateLimiter(600, max_retries=2, clock=clock, sleep=clock.sleep)
+    calls = []
+
+    async def send():
+        calls.append(clock.now)
+        if len(calls) == 1:
+            raise RateLimited("7")
+        return "ok"
+
+    assert await limiter.run(send) == "ok"
+    assert len(calls) == 2
+    assert calls[1] >= 7.0
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_gives_up_after_max_retries():
+    clock = FakeClock()
+    limiter = ProviderRateLimiter(600, max_retries=1, clock=clock, sleep=clock.sleep)
+
+    async def send():
+        raise RateLimited("1")
+
+    with pytest.raises(RateLimited):
+        await limiter.run(send)
+
+
+def test_retry_after_seconds_parses_headers():
+    assert retry_after_seconds(RateLimited("3")) == 3.0
+    assert retry_after_seconds(ValueError("no response")) is None
+    assert retry_after_seconds(RateLimited("Wed, 21 Oct 2015 07:28:00 GMT")) == 0.0
+    assert retry_after_seconds(RateLimited("soon")) is None
@@ -62,3 +62,108 @@ async def test_generate_reproduction_handles_malformed_json():
     # Should return error message in explanation
     assert "Failed to parse" in result.explanation
     assert "Could not parse" in result.repro_code
+
+
+@pytest.mark.asyncio
+async def test_identical_concurrent_generations_are_coalesced():
+    """Concurrent calls with the same prompt share one LLM call."""
+    import asyncio
+
+    calls = 0
+
+    async def slow_completion(prompt, system_prompt=None):
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return '{"repro_code": "x", "test_code": "y", "explanation": "z", "fix_suggestion": "w"}'
+
+    mock_llm = Mock()
+    mock_llm.generate_completion = slow_completion
+    generator = ReproductionGenerator(mock_llm)
+
+    session_data = DebugSessionCreate(language="python", error_text="KeyError: 'missing'")
+    # Whitespace differences normalize to the same prompt
+    other_data = DebugSessionCreate(language="python", error_text="KeyError:   'missing'  ")
+
+    results = await asyncio.gather(
+        *[generator.generate_reproduction(session_data) for _ in range(4)],
+        generator.generate_reproduction(other_data),
+    )
+
+    assert calls == 1
+    assert all(r.repro_code == "x" for r in results)
+
+
+@pytest.mark.asyncio
+async def test_lease_coalescer_holds_no_connection_while_generating(sqlite_engine):
+    """Workers share one generation through the lease row, without pinning a pooled connection."""
+    import asyncio
+
+    from sqlalchemy import event
+
+    from app.services.single_flight import LeaseCoalescer
+
+    checked_out = 0
+
+    def on_checkout(*args):
+        nonlocal checked_out
+        checked_out += 1
+
+    def on_checkin(*args):
+        nonlocal checked_out
+        checked_out -= 1
+
+    event.listen(sqlite_engine.sync_engine, "checkout", on_checkout)
+    event.listen(sqlite_engine.sync_engine, "checkin", on_checkin)
+    leader = LeaseCoalescer(sqlite_engine, poll_interval=0.01)
+    follower = LeaseCoalescer(sqlite_engine, poll_interval=0.01)
+    calls = 0
+    started = asyncio.Event()
+
+    async def generate():
+        nonlocal calls
+        calls += 1
+        started.set()
+        assert checked_out == 0
+        await asyncio.sleep(0.05)
+        return {"repro_code": "x"}
+
+    async def follow():
+        await started.wait()
+        return await follower.do("k", generate)
+
+    results = await asyncio.gather(leader.do("k", generate), follow())
+    assert calls == 1
+    assert results == [{"repro_code": "x"}, {"repro_code": "x"}]
+    async with sqlite_engine.connect() as conn:
+        leases = (await conn.exec_driver_sql("SELECT count(*) FROM generation_leases")).scalar()
+    assert leases == 0
+
+
+@pytest.mark.asyncio
+async def test_lease_coalescer_follower_gives_up_after_deadline(sqlite_engine):
+    """A follower whose leader never finishes generates on its own once ``max_wait_sec`` passes."""
+    import asyncio
+
+    from app.services.single_flight import LeaseCoalescer
+
+    stuck = asyncio.Event()
+
+    async def hang():
+        stuck.set()
+        await asyncio.sleep(3600)
+
+    leader = asyncio.create_task(LeaseCoalescer(sqlite_engine).do("k", hang))
+    await stuck.wait()
+
+    async def generate():
+        return {"repro_code": "own"}
+
+    follower = LeaseCoalescer(sqlite_engine, poll_interval=0.01, max_wait_sec=0.05)
+    assert await follower.do("k", generate) == {"repro_code": "own"}
+
+    leader.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await leader
+    # The cancelled leader released its lease, so the next caller leads at once
+    assert await follower.do("k", generate) == {"repro_code": "own"}
@@ -0,0 +1,75 @@
+"""Tests for the generate-verify reproduction loop."""
+import pytest
+from app.schemas.debug_session import DebugSessionCreate, ReproductionResult
+from app.services.error_types import exception_types
+from app.services.repro_verifier import ReproVerifier
+
+
+class FakeGenerator:
+    """Returns a candidate per (round, variant); records feedback it was given."""
+
+    def __init__(self, codes_by_round):
+        self.codes_by_round = codes_by_round
+        self.feedback = []
+
+    async def generate_reproduction(self, session_data, feedback=None, variant=0):
+        self.feedback.append(feedback)
+        round_ = 0 if feedback is None else 1
+        code = self.codes_by_round[round_][variant]
+        return ReproductionResult(repro_code=code, test_code="", explanation="", fix_suggestion="")
+
+
+class FakeRunner:
+    """Raises the exception named in the code, like a real interpreter would."""
+
+    def run_in_sandbox(self, language, code, timeout_sec=10):
+        if code.startswith("raise "):
+            name = code.split()[1]
+            return {"stdout": "", "stderr": f"Traceback ...\n{name}: boom", "exit_code": 1, "status": "error"}
+        return {"stdout": "ok", "stderr": "", "exit_code": 0, "status": "completed"}
+
+
+SESSION = DebugSessionCreate(
+    language="python",
+    error_text="Traceback (most recent call last):\n  File \"a.py\", line 1\nKeyError: 'missing'",
+)
+
+
+def test_exception_types_strip_packages():
+    assert exception_types("Exception in thread \"main\" java.lang.NullPointerException") == {"NullPointerException"}
+    assert exception_types("KeyError: 'x'") == {"KeyError"}
+
+
+@pytest.mark.asyncio
+async def test_accepts_candidate_matching_exception_types():
+    generator = FakeGenerator([["print(1)", "raise KeyError", "raise ValueError"]])
+    verifier = ReproVerifier(generator, FakeRunner(), candidates=3)
+
+    outcome = await verifier.generate_verified(SESSION)
+
+    assert outcome.verified
+    assert outcome.result.repro_code == "raise KeyError"
+    assert outcome.elapsed_ms >= 0
+
+
+@pytest.mark.asyncio
+async def test_retries_with_sandbox_feedback():
+    generator = FakeGenerator([["print(1)", "raise ValueError"], ["raise KeyError", "print(2)"]])
+    verifier = ReproVerifier(generator, FakeRunner(), candidates=2, max_rounds=2)
+
+    outcome = await verifier.generate_verified(SESSION)
+
+    assert outcome.verified
+    assert outcome.attempts >= 3
+    assert any(fb and "ValueError" in fb for fb in generator.feedback)
+
+
+@pytest.mark.asyncio
+async def test_returns_unverified_best_effort_when_nothing_matches():
+    generator = FakeGenerator([["print(1)"], ["print(2)"]])
+    verifier = ReproVerifier(generator, FakeRunner(), candidates=1, max_rounds=2)
+
+    outcome = await verifier.generate_verified(SESSION)
+
+    assert not outcome.verified
+    assert outcome.result.repro_code == "print(1)"
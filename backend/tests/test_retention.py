@@ -0,0 +1,38 @@
+"""Tests for the retention job (against a scratch SQLite database)."""
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import func, select
+
+from app.models.archive import RetentionArchive
+from app.models.run import Run, RunOutputChunk
+from app.services.retention import RetentionPolicy, add_months, decode_archive, run_retention
+
+
+def test_add_months_wraps_years():
+    assert add_months(datetime(2024, 11, 1), 3) == datetime(2025, 2, 1)
+    assert add_months(datetime(2024, 1, 1), -1) == datetime(2023, 12, 1)
+
+
+@pytest.mark.asyncio
+async def test_expired_runs_are_archived_with_their_output_then_deleted(db):
+    now = datetime(2024, 6, 15)
+    for days_ago in (1, 40, 45, 100):
+        run_id = uuid.uuid4()
+        db.add(Run(id=run_id, language="python", status="completed", created_at=now - timedelta(days=days_ago)))
+        db.add(RunOutputChunk(run_id=run_id, stream="stdout", chunk_index=0, codec="zlib", data=b"\x00"))
+    await db.commit()
+
+    reports = await run_retention(db, now=now, policies=[RetentionPolicy(Run, 30)], batch_size=2)
+
+    assert reports[0]["archived_rows"] == 3
+    assert await db.scalar(select(func.count()).select_from(Run)) == 1
+    assert await db.scalar(select(func.count()).select_from(RunOutputChunk)) == 1
+    archives = (await db.execute(select(RetentionArchive))).scalars().all()
+    runs = [row for a in archives if a.table_name == "runs" for row in decode_archive(a.data)]
+    chunks = [row for a in archives if a.table_name == "run_output_chunks" for row in decode_archive(a.data)]
+    assert len(runs) == 3 and len(chunks) == 3
+    assert {a.period_start for a in archives if a.table_name == "runs"} == {
+        datetime(2024, 3, 1), datetime(2024, 5, 1),
+    }
@@ -0,0 +1,156 @@
+"""Tests for the run state/log broker."""
+import asyncio
+import os
+from datetime import datetime
+
+import pytest
+
+from app.schemas.run import RunResponse
+from app.services.run_broker import InProcessRunBroker, RedisRunBroker, output_chunks, publish_finished_run
+
+
+def make_run(run_id: str = "run-1") -> RunResponse:
+    return RunResponse(
+        run_id=run_id,
+        language="python",
+        status="completed",
+        stdout="line 1\nline 2",
+        stderr="",
+        exit_code=0,
+        created_at=datetime(2024, 1, 1),
+    )
+
+
+class FakeRedis:
+    """The subset of ``redis.asyncio.Redis`` that ``RedisRunBroker`` uses, in memory."""
+
+    def __init__(self):
+        self.values = {}
+        self.lists = {}
+        self.channels = {}
+        self.closed = False
+
+    async def set(self, key, value, ex=None):
+        self.values[key] = value
+
+    async def get(self, key):
+        return self.values.get(key)
+
+    async def incr(self, key):
+        self.values[key] = int(self.values.get(key, 0)) + 1
+        return self.values[key]
+
+    async def lrange(self, key, start, stop):
+        items = self.lists.get(key, [])
+        return items[start:] if stop == -1 else items[start:stop + 1]
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    def pubsub(self):
+        return FakePubSub(self)
+
+    async def aclose(self):
+        self.closed = True
+
+
+class FakePipeline:
+    def __init__(self, client: FakeRedis):
+        self.client = client
+        self.commands = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        pass
+
+    def __getattr__(self, name):
+        return lambda *args: self.commands.append((name, args))
+
+    async def execute(self):
+        lists = self.client.lists
+        for name, args in self.commands:
+            if name == "rpush":
+                lists.setdefault(args[0], []).append(args[1])
+            elif name == "ltrim":
+                key, start, _ = args
+                lists[key] = lists.get(key, [])[start:]
+            elif name == "publish":
+                for queue in self.client.channels.get(args[0], ()):
+                    queue.put_nowait({"type": "message", "channel": args[0], "data": args[1]})
+        self.commands = []
+
+
+class FakePubSub:
+    def __init__(self, client: FakeRedis):
+        self.client = client
+        self.queue = asyncio.Queue()
+
+    async def subscribe(self, channel):
+        self.client.channels.setdefault(channel, []).append(self.queue)
+        self.queue.put_nowait({"type": "subscribe", "channel": channel, "data": 1})
+
+    async def get_message(self, ignore_subscribe_messages=False, timeout=0.0):
+        try:
+            message = await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        if ignore_subscribe_messages and message["type"] == "subscribe":
+            return None
+        return message
+
+    async def unsubscribe(self, channel):
+        self.client.channels[channel].remove(self.queue)
+
+    async def aclose(self):
+        pass
+
+
+def brokers():
+    yield InProcessRunBroker()
+    yield RedisRunBroker(client=FakeRedis())
+    # Any Redis-protocol server works, e.g. a throwaway `redis-server --port 6390`
+    if os.getenv("TEST_REDIS_URL"):
+        yield RedisRunBroker(os.environ["TEST_REDIS_URL"], prefix=f"test:{os.getpid()}:")
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("broker", list(brokers()), ids=lambda b: type(b).__name__)
+async def test_subscriber_gets_history_and_live_events_in_order(broker):
+    run = make_run()
+    await publish_finished_run(broker, run)
+
+    async with broker.subscribe(run.run_id) as live:
+        history = await broker.history(run.run_id)
+        await broker.publish(run.run_id, {"type": "stdout", "data": "late"})
+        event = await asyncio.wait_for(live.__anext__(), timeout=5)
+
+    assert [e["type"] for e in history] == ["stdout", "complete"]
+    assert history[0]["data"] == "line 1\nline 2"
+    assert event == {"type": "stdout", "data": "late", "seq": 3}
+    assert await broker.get_run(run.run_id) == run
+    await broker.close()
+
+
+@pytest.mark.asyncio
+async def test_in_process_broker_is_bounded_by_size_and_ttl():
+    now = [0.0]
+    broker = InProcessRunBroker(ttl_sec=10, max_runs=2, max_log_events=3, clock=lambda: now[0])
+    for run_id in ("a", "b", "c"):
+        await broker.put_run(make_run(run_id))
+    assert await broker.get_run("a") is None
+    assert len(broker) == 2
+
+    for i in range(5):
+        await broker.publish("c", {"type": "stdout", "data": str(i)})
+    assert [e["seq"] for e in await broker.history("c")] == [3, 4, 5]
+
+    now[0] = 11.0
+    assert await broker.get_run("c") is None
+    assert len(broker) == 0
+
+
+def test_output_chunks_keep_whole_lines():
+    assert output_chunks("") == []
+    assert output_chunks("aaaa\nbbbb\ncc", limit=10) == ["aaaa\nbbbb", "cc"]
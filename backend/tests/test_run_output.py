@@ -0,0 +1,100 @@
+"""Tests for chunked, compressed run output and the byte-range output endpoint."""
+import string
+import uuid
+from datetime import datetime
+
+import pytest
+from sqlalchemy import insert
+
+from app.models.run import Run, RunOutputChunk
+from app.services.run_output import CHUNK_BYTES, _codec, pack_run_output, read_output_range
+
+
+def test_pack_keeps_preview_and_splits_output_into_chunks():
+    stdout = "x" * (2 * CHUNK_BYTES + 10)
+    row, chunks = pack_run_output({"id": uuid.uuid4(), "stdout": stdout, "stderr": "boom"}, preview_chars=100)
+
+    assert row["stdout"] == "x" * 100 and row["stdout_bytes"] == len(stdout)
+    assert row["stderr"] == "boom" and row["stderr_bytes"] == 4
+    stdout_chunks = [c for c in chunks if c["stream"] == "stdout"]
+    assert [c["chunk_index"] for c in stdout_chunks] == [0, 1, 2]
+    assert all(len(c["data"]) < CHUNK_BYTES for c in stdout_chunks)
+    decompress = _codec("zlib")[1]
+    assert b"".join(decompress(c["data"]) for c in stdout_chunks).decode() == stdout
+
+
+# Position-dependent content, so an offset error shows up as wrong bytes
+STDOUT = (string.ascii_letters * (3 * CHUNK_BYTES // len(string.ascii_letters)))[:2 * CHUNK_BYTES + 100]
+
+
+async def _store_run(db, stdout: str = STDOUT) -> uuid.UUID:
+    run_id = uuid.uuid4()
+    row, chunks = pack_run_output({
+        "id": run_id, "created_at": datetime(2025, 1, 1), "language": "python", "status": "completed",
+        "stdout": stdout, "stderr": "",
+    }, preview_chars=100)
+    await db.execute(insert(Run), [row])
+    if chunks:
+        await db.execute(insert(RunOutputChunk), chunks)
+    await db.commit()
+    return run_id
+
+
+@pytest.mark.asyncio
+async def test_read_output_range_spans_chunk_boundaries(db):
+    run_id = await _store_run(db)
+    data = STDOUT.encode()
+
+    for start, end in [
+        (0, 0),
+        (CHUNK_BYTES - 5, CHUNK_BYTES + 4),  # across the first boundary
+        (CHUNK_BYTES, CHUNK_BYTES),  # first byte of the second chunk
+        (10, 2 * CHUNK_BYTES + 50),  # across all three chunks
+        (len(data) - 1, len(data) - 1),
+    ]:
+        assert await read_output_range(db, run_id, "stdout", start, end) == data[start:end + 1]
+
+
+@pytest.mark.asyncio
+async def test_output_endpoint_serves_byte_ranges(api_client, db):
+    run_id = await _store_run(db)
+    data, size = STDOUT.encode(), len(STDOUT)
+    url = f"/api/runs/{run_id}/output"
+    identity = {"Accept-Encoding": "identity"}
+
+    full = api_client.get(url, headers=identity)
+    assert full.status_code == 200 and full.content == data
+    assert full.headers["Accept-Ranges"] == "bytes" and "Content-Range" not in full.headers
+
+    start, end = CHUNK_BYTES - 3, CHUNK_BYTES + 2
+    partial = api_client.get(url, headers={**identity, "Range": f"bytes={start}-{end}"})
+    assert partial.status_code == 206
+    assert partial.headers["Content-Range"] == f"bytes {start}-{end}/{size}"
+    assert partial.content == data[start:end + 1]
+    assert partial.headers["Content-Type"] == "text/plain; charset=utf-8"
+
+    tail = api_client.get(url, headers={**identity, "Range": "bytes=-10"})
+    assert tail.status_code == 206 and tail.content == data[-10:]
+    assert tail.headers["Content-Range"] == f"bytes {size - 10}-{size - 1}/{size}"
+
+    beyond = api_client.get(url, headers={**identity, "Range": f"bytes={size}-"})
+    assert beyond.status_code == 416
+    assert beyond.headers["Content-Range"] == f"bytes */{size}"
+
+
+@pytest.mark.asyncio
+async def test_output_endpoint_revalidates_with_etag(api_client, db):
+    run_id = await _store_run(db, stdout="hello\n")
+    url = f"/api/runs/{run_id}/output"
+
+    first = api_client.get(url, headers={"Accept-Encoding": "identity"})
+    etag = first.headers["ETag"]
+    assert etag == f'"{run_id}-stdout-6"'
+
+    cached = api_client.get(url, headers={"If-None-Match": etag})
+    assert cached.status_code == 304 and cached.content == b""
+    assert api_client.get(url, headers={"If-None-Match": f"W/{etag}"}).status_code == 304
+    assert api_client.get(url, headers={"If-None-Match": '"something-else"'}).status_code == 200
+
+    empty = api_client.get(f"/api/runs/{run_id}/output", params={"stream": "stderr"}, headers={"Range": "bytes=0-"})
+    assert empty.status_code == 416 and empty.headers["Content-Range"] == "bytes */0"
@@ -0,0 +1,43 @@
+"""Tests for the group-commit run writer (against a scratch SQLite database)."""
+import asyncio
+import uuid
+from datetime import datetime
+
+import pytest
+from sqlalchemy import func, select
+
+from app.models.run import Run
+from app.models.stats import StatsRollup
+from app.services.run_writer import RunWriter
+
+
+def _run(run_id=None) -> dict:
+    now = datetime(2024, 5, 1, 13, 5)
+    return {
+        "id": run_id or uuid.uuid4(), "language": "python", "status": "completed", "stdout": "ok",
+        "stderr": "", "exit_code": 0, "execution_time_ms": 40, "image": "python:3.11-slim",
+        "created_at": now, "completed_at": now, "user_id": None, "team_id": None,
+    }
+
+
+@pytest.mark.asyncio
+async def test_concurrent_runs_share_a_commit_and_bad_rows_fail_alone(sqlite_engine, session_factory):
+    writer = RunWriter(session_factory, max_batch=50, max_delay_ms=20)
+
+    await asyncio.gather(*(writer.persist(_run()) for _ in range(10)))
+    assert writer.batches == 1
+
+    duplicate = uuid.uuid4()
+    await writer.persist(_run(duplicate))
+    results = await asyncio.gather(
+        writer.persist(_run(duplicate)), writer.persist(_run()), return_exceptions=True
+    )
+    assert isinstance(results[0], Exception) and results[1] is None
+    await writer.close()
+
+    async with sqlite_engine.connect() as conn:
+        assert await conn.scalar(select(func.count()).select_from(Run)) == 12
+        totals = await conn.scalar(
+            select(StatsRollup.total).where(StatsRollup.kind == "run", StatsRollup.granularity == "hour")
+        )
+        assert totals == 12
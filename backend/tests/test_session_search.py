@@ -0,0 +1,38 @@
+"""Tests for the in-process full-text search fallback."""
+import uuid
+from datetime import datetime, timedelta
+from app.models.debug_session import SessionStatus
+from app.services.session_search import InvertedIndex
+
+
+def _index() -> InvertedIndex:
+    index = InvertedIndex()
+    base = datetime(2024, 1, 1)
+    docs = [
+        ("python", "KeyError: 'user_id'", "Dict lookup of a missing key.", "Use dict.get."),
+        ("javascript", "TypeError: Cannot read properties of undefined (reading 'map')", "Array is undefined.", None),
+        ("python", "ValueError: bad value", "Mentions KeyError only in passing.", None),
+    ]
+    for i, (language, error, explanation, fix) in enumerate(docs):
+        index.add(
+            uuid.uuid4(), base + timedelta(minutes=i), language, SessionStatus.COMPLETED,
+            {"error_text": error, "explanation": explanation, "fix_suggestion": fix},
+        )
+    return index
+
+
+def test_search_ranks_error_text_matches_first_and_highlights():
+    hits = _index().search("keyerror")
+
+    assert [h.error_snippet for h in hits] == ["KeyError: 'user_id'", "ValueError: bad value"]
+    assert hits[0].rank > hits[1].rank
+    assert hits[0].highlights["error_text"] == "<mark>KeyError</mark>: 'user_id'"
+
+
+def test_search_requires_all_terms_and_applies_filters():
+    index = _index()
+
+    assert len(index.search("undefined map")) == 1
+    assert index.search("undefined keyerror") == []
+    assert index.search("keyerror", language="javascript") == []
+    assert index.search("keyerror", status=SessionStatus.FAILED) == []
@@ -0,0 +1,20 @@
+"""Startup must stay fast and must not touch the database or load provider SDKs."""
+import os
+
+from benchmarks.bench_startup import measure_import
+
+# Generous for slow CI machines; override with IMPORT_TIME_BUDGET_SEC
+IMPORT_TIME_BUDGET_SEC = float(os.getenv("IMPORT_TIME_BUDGET_SEC", "2.0"))
+
+
+def test_app_imports_without_database_or_sdks():
+    # DATABASE_URL points at a closed port; any connection attempt would fail the import
+    result = measure_import("app.main")
+
+    assert result["loaded"] == []
+
+
+def test_app_import_time_within_budget():
+    best = min(measure_import("app.main")["seconds"] for _ in range(3))
+
+    assert best < IMPORT_TIME_BUDGET_SEC, f"app.main took {best:.2f}s to import (budget {IMPORT_TIME_BUDGET_SEC}s)"
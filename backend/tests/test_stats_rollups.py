@@ -0,0 +1,70 @@
+"""Tests for stats rollup helpers."""
+from datetime import datetime
+
+import pytest
+
+from app.services.stats_rollups import (
+    _percentile_from_histogram,
+    _run_increments,
+    bucket_start,
+    query_stats,
+    record_run,
+    runtime_bucket,
+)
+
+
+def test_bucketing_and_runtime_histogram():
+    at = datetime(2024, 5, 1, 13, 47, 12)
+    assert bucket_start(at, "hour") == datetime(2024, 5, 1, 13)
+    assert bucket_start(at, "day") == datetime(2024, 5, 1)
+    assert runtime_bucket(120) == 250
+    assert runtime_bucket(10 ** 6) == -1
+
+    histogram = {100: 90, 1000: 9, 10000: 1}
+    assert _percentile_from_histogram(histogram, 0.5) == 100
+    assert _percentile_from_histogram(histogram, 0.95) == 1000
+
+
+def test_run_increments_cover_hour_and_day_with_error_type():
+    rows = list(_run_increments("python", "error", 320, "Traceback...\nValueError: bad", datetime(2024, 5, 1, 13, 5)))
+    tables = [model.__tablename__ for model, _, _ in rows]
+
+    assert tables.count("stats_rollups") == 2
+    assert tables.count("stats_runtime_histogram") == 2
+    error_rows = [dict(keys) for model, keys, _ in rows if model.__tablename__ == "stats_error_types"]
+    assert {row["error_type"] for row in error_rows} == {"ValueError"}
+
+
+@pytest.mark.asyncio
+async def test_query_stats_filters_every_section_by_language(db):
+    at = datetime(2024, 5, 1, 13, 5)
+    await record_run(db, "python", "error", 120, "Traceback...\nValueError: bad", at)
+    await record_run(db, "python", "completed", 80, None, at)
+    await record_run(db, "javascript", "error", 900, "TypeError: x is undefined", at)
+    await record_run(db, "javascript", "error", 950, "TypeError: x is undefined", at)
+    await db.commit()
+
+    since, until = datetime(2024, 5, 1), datetime(2024, 5, 2)
+    python = await query_stats(db, "hour", since, until, language="python")
+    assert python["runs"]["total"] == 2
+    assert list(python["runs_by_language"]) == ["python"]
+    assert python["top_error_types"] == [{"kind": "run", "error_type": "ValueError", "count": 1}]
+
+    everything = await query_stats(db, "day", since, until)
+    assert everything["runs"]["total"] == 4
+    assert [row["error_type"] for row in everything["top_error_types"]] == ["TypeError", "ValueError"]
+
+
+@pytest.mark.asyncio
+async def test_stats_route_accepts_timestamps_with_offsets(api_client, db):
+    await record_run(db, "python", "completed", 80, None, datetime(2024, 5, 1, 13, 5))
+    await db.commit()
+
+    response = api_client.get("/api/stats", params={"since": "2024-05-01T00:00:00Z", "until": "2024-05-01T16:00:00+02:00"})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["since"] == "2024-05-01T00:00:00" and body["until"] == "2024-05-01T14:00:00"
+    assert body["runs"]["total"] == 1
+
+    mixed = api_client.get("/api/stats", params={"since": "2024-05-01T00:00:00Z"})
+    assert mixed.status_code == 400  # more than 14 days before now
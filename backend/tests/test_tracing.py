@@ -0,0 +1,76 @@
+"""Tests for tracing spans, context propagation and export."""
+import asyncio
+
+import pytest
+
+from app.services import tracing
+
+
+class ListExporter:
+    def __init__(self):
+        self.spans = []
+
+    def export(self, spans):
+        self.spans.extend(spans)
+
+
+@pytest.fixture
+def exported():
+    exporter = ListExporter()
+    previous = tracing.tracer
+    tracing.configure(tracing.Tracer(tracing.BatchSpanProcessor(exporter, interval_sec=0.01)))
+    yield exporter
+    tracing.tracer.shutdown()
+    tracing.tracer = previous
+
+
+def _in_thread():
+    with tracing.span("docker.create_container"):
+        pass
+
+
+@pytest.mark.asyncio
+async def test_spans_nest_across_awaits_and_threads(exported):
+    with tracing.span("POST create_run") as root:
+        with tracing.span("sandbox.run"):
+            await asyncio.to_thread(_in_thread)
+        with pytest.raises(ValueError):
+            with tracing.span("runs.persist"):
+                raise ValueError("boom")
+    tracing.tracer.shutdown()
+
+    spans = {span.name: span for span in exported.spans}
+    assert set(spans) == {"POST create_run", "sandbox.run", "docker.create_container", "runs.persist"}
+    assert {span.trace_id for span in spans.values()} == {root.trace_id}
+    assert spans["docker.create_container"].parent_id == spans["sandbox.run"].span_id
+    assert spans["runs.persist"].error == "ValueError: boom"
+    assert tracing.current_span() is None
+
+
+def test_sampling_is_decided_at_the_root(exported):
+    tracing.tracer.sample_rate = 0.0
+    with tracing.span("root"):
+        with tracing.span("child"):
+            pass
+    tracing.tracer.shutdown()
+    assert exported.spans == []
+
+
+def test_traceparent_and_otlp_payload():
+    assert tracing.parse_traceparent("00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01") == (
+        "0af7651916cd43dd8448eb211c80319c", "b7ad6b7169203331", True,
+    )
+    assert tracing.parse_traceparent("00-" + "0" * 32 + "-b7ad6b7169203331-01") is None
+    assert tracing.parse_traceparent("garbage") is None
+
+    span = tracing.Tracer().start_span("llm.request", trace_id="a" * 32, parent_id="b" * 16, sampled=True, tokens=12)
+    payload = tracing.OTLPSpanExporter("http://collector", "api").payload([span])
+    otlp = payload["resourceSpans"][0]["scopeSpans"][0]["spans"][0]
+    assert otlp["traceId"] == "a" * 32 and otlp["parentSpanId"] == "b" * 16
+    assert otlp["attributes"] == [{"key": "tokens", "value": {"intValue": "12"}}]
+
+
+def test_disabled_tracer_is_a_no_op():
+    assert not tracing.Tracer().enabled
+    with tracing.Tracer().span("anything") as span:
+        assert span is None